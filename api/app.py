@@ -0,0 +1,41 @@
+# Vercel entry point (see vercel.json): @vercel/python serves the WSGI `app`
+# defined here for every path.
+#
+# Importing the main module is the cold start, so this switches it into
+# serverless mode (SERVERLESS=1): no asset build, background threads or
+# directories at import, numpy and Pillow imported only when a request needs
+# them, and one pooled MySQL connection per instance. The pool is module
+# state, so warm invocations of the same instance reuse that connection
+# (pinged first when it sat idle) instead of reconnecting.
+#
+# Nothing is built here: the hashed assets (static/dist) and the outage
+# snapshot (snapshot/catalog.snap) are committed with the code, see the
+# README's Serverless section.
+#
+# Configuration comes from the environment variables in .env.example, set in
+# the Vercel project. Uploads need a bucket there (UPLOAD_STORAGE=s3://...).
+# `python benchmarks/bench_coldstart.py` measures the import and the first
+# request.
+
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if not os.environ.get('SERVERLESS'):
+    os.environ['SERVERLESS'] = '1'
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# This file is also named app.py. Load the real one under the name `app`
+# explicitly, so neither this module nor `import app` elsewhere can pick up
+# the wrong file.
+_main = sys.modules.get('app')
+if getattr(_main, '__file__', None) != os.path.join(ROOT, 'app.py'):
+    _spec = importlib.util.spec_from_file_location('app', os.path.join(ROOT, 'app.py'))
+    _main = importlib.util.module_from_spec(_spec)
+    sys.modules['app'] = _main
+    _spec.loader.exec_module(_main)
+
+app = _main.app
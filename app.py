@@ -1,32 +1,480 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import (Flask, Response, render_template, request, jsonify, session, url_for, g,
+                   send_from_directory, has_request_context)
 import pymysql
 import os
-from functools import wraps
-from werkzeug.utils import secure_filename
-from datetime import datetime
+import hmac
+import time
+import click
+import mimetypes
+from functools import partial, wraps
+from contextlib import contextmanager
+
+from db import ConnectionPool, PoolTimeout, Replica, ReplicaRouter
+from cache import VERSION_SQL, CatalogCache, IndexManager
+from catalog import (ALL_PARTS_SQL, BUNDLE_ILLNESSES_SQL, HEALTH_TIPS_SQL, MEDICINES_SQL, PART_BY_SLUG_SQL,
+                     PART_DOCTORS_SQL, PART_ILLNESSES_SQL, PARTS_BY_ID_SQL, body_parts_queries, build_body_part,
+                     bundle_queries, health_tips_queries, placeholders, run_queries)
+from search import SearchIndex
+from geo import (DEFAULT_RADIUS_KM, MAX_NEIGHBOURS, MAX_RADIUS_KM, NEARBY_PART_FILTER, NEARBY_SQL, DoctorLocations,
+                 Gazetteer, GeoError, bounding_box, box_wkt, nearest_doctors, parse_point)
+from pagination import Keyset, PageError, list_query, parse_limit
+from catalog_io import (ENTITIES as CATALOG_ENTITIES, FORMATS as IO_FORMATS, CatalogIOError,
+                        ImportFailed, Importer, export_rows, format_rows, read_rows)
+from images import ImageQueueFull, ImageStore, InvalidImage, is_content_id
+from assets import AssetPipeline, compress, pick_encoding
+import counters
+import changes
+import archive
+from migrate import MigrationError, Migrator, explain, plan_problems
+from snapshot import CatalogSnapshot, SnapshotCompiler, SnapshotReader, static_name
+from storage import open_storage
+from contact_queue import ContactError, ContactQueue, QueueFull, RateLimiter, clean_message
+from metrics import (QueryTracker, Registry, StackSampler, begin_request, end_request, observe_request,
+                     server_timing, stream_request)
 
 app = Flask(__name__)
-app.secret_key = 'ai-doctor-secret-key-2024-healthcare'
+app.secret_key = os.environ.get('SECRET_KEY') or 'ai-doctor-secret-key-2024-healthcare'
+
+# Serverless hosts (api/app.py on Vercel, which also sets VERCEL=1) run one
+# request at a time per instance, freeze it between requests and only allow
+# writes under /tmp. There nothing is built or created at import and no
+# background threads are started: the settings below that would start one
+# (IMAGE_WORKERS, COUNTER_RECONCILE_INTERVAL, MESSAGE_ARCHIVE_INTERVAL,
+# PROFILE_BUDGET_MS) are ignored and DB_POOL_SIZE is 1, whatever the
+# environment says.
+SERVERLESS = (os.environ.get('SERVERLESS') or os.environ.get('VERCEL', '')).lower() in ('1', 'true', 'yes')
 
 # File upload config
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
+UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), os.environ.get('UPLOAD_FOLDER', 'uploads'))
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 5 * 1024 * 1024))  # 5MB
+
+# Medicine images are content-addressed in UPLOAD_STORAGE (default
+# uploads/media, or s3://bucket/prefix; see storage.py) and resized on a
+# small background pool, or in the request when IMAGE_WORKERS=0 (see
+# images.py). Directories are created on the first upload.
+image_store = ImageStore(
+    open_storage(os.environ.get('UPLOAD_STORAGE') or os.path.join(UPLOAD_FOLDER, 'media'),
+                 endpoint_url=os.environ.get('UPLOAD_S3_ENDPOINT') or None),
+    max_workers=0 if SERVERLESS else int(os.environ.get('IMAGE_WORKERS', 2)),
+    max_pending=int(os.environ.get('IMAGE_QUEUE_SIZE', 16)),
+)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# ===== STATIC ASSETS =====
+# main.js and style.css are minified, content-hashed and precompressed into
+# static/dist at startup (see assets.py). If that fails the page falls back to
+# the plain /static files.
+asset_pipeline = AssetPipeline(os.path.join(app.root_path, 'static'),
+                               os.path.join(app.root_path, 'static', 'dist'))
+if SERVERLESS:
+    # read-only and cold-start sensitive: use whatever `flask build-assets`
+    # shipped with the deployment
+    asset_pipeline.load()
+else:
+    try:
+        asset_pipeline.build()
+    except Exception:
+        app.logger.exception('Asset build failed, serving unhashed static files')
+
+# Rendered index shell per asset manifest version: {encoding: bytes}
+index_cache = {}
+
+@app.context_processor
+def inject_asset_url():
+    return {'asset_url': asset_pipeline.url}
 
 # ===== DB CONFIG =====
 DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': 'root',       # Change to your MySQL password
-    'db': 'ai_doctor_db',
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', 'root'),       # Change to your MySQL password
+    'db': os.environ.get('DB_NAME', 'ai_doctor_db'),
+    'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 10)),
     'charset': 'utf8mb4',
     'cursorclass': pymysql.cursors.DictCursor
 }
+# A serverless instance serves one request at a time; its one connection
+# stays in the pool between warm invocations.
+DB_POOL_SIZE = 1 if SERVERLESS else int(os.environ.get('DB_POOL_SIZE', 10))
+
+# One bounded pool per worker process; connections are opened on first use,
+# so this is safe to build under `gunicorn --preload`.
+db_pool = ConnectionPool(
+    DB_CONFIG,
+    max_size=DB_POOL_SIZE,
+    timeout=float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+    max_lifetime=int(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+)
+
+# Read replicas (DB_REPLICAS=host[:port],...) share the primary's credentials.
+# Catalog pages, admin lists and exports read from a healthy replica; writes
+# and everything else stay on the primary (see ReplicaRouter in db.py).
+def replica_pools():
+    for address in [a.strip() for a in os.environ.get('DB_REPLICAS', '').split(',') if a.strip()]:
+        host, _, port = address.partition(':')
+        yield Replica(address, ConnectionPool(
+            dict(DB_CONFIG, host=host, port=int(port or 3306)),
+            max_size=DB_POOL_SIZE,
+            timeout=float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+            max_lifetime=int(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+        ))
+
+db_router = ReplicaRouter(
+    db_pool, replica_pools(),
+    max_lag=int(os.environ.get('DB_REPLICA_MAX_LAG', 5)),
+    check_interval=float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 2)),
+    on_change=lambda r: app.logger.warning('Replica %s is %s%s', r.name, 'up' if r.healthy else 'down',
+                                           '' if r.healthy else ': %s' % r.error),
+)
+# After a write, an admin reads from the primary for this long so they see
+# their own change even on a lagging replica.
+DB_STICKY_SECONDS = float(os.environ.get('DB_STICKY_SECONDS', 5))
+
+# ===== METRICS =====
+# Requests are timed per endpoint and status, and connections from get_db()
+# count each request's queries, DB time and rows (see metrics.py). Queries
+# over SLOW_QUERY_MS are logged with their SQL. With PROFILE_BUDGET_MS set,
+# requests are stack-sampled and the slower ones dumped to profiles/.
+metrics_registry = Registry()
+query_tracker = QueryTracker(metrics_registry, slow_query_ms=float(os.environ.get('SLOW_QUERY_MS', 200)))
+PROFILE_BUDGET_MS = 0 if SERVERLESS else float(os.environ.get('PROFILE_BUDGET_MS', 0))
+stack_sampler = StackSampler(os.path.join(os.path.dirname(__file__), 'profiles')) if PROFILE_BUDGET_MS > 0 else None
 
 def get_db():
-    return pymysql.connect(**DB_CONFIG)
+    return query_tracker.connection(db_pool.connection())
+
+def read_db():
+    # Read-only work that may run on a replica
+    if has_request_context() and session.get('primary_until', 0) > time.time():
+        return get_db()
+    return query_tracker.connection(db_router.connection(read_only=True))
+
+@app.after_request
+def stick_to_primary(response):
+    if db_router.replicas and request.method not in ('GET', 'HEAD', 'OPTIONS') \
+            and session.get('admin_logged_in') and response.status_code < 400:
+        session['primary_until'] = time.time() + DB_STICKY_SECONDS
+    return response
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.request_stats = begin_request()
+    if stack_sampler:
+        g.profile_ident = stack_sampler.start()
+
+@app.after_request
+def record_request_metrics(response):
+    stats = g.get('request_stats')
+    if stats is None:
+        return response
+    finish = partial(finish_request_metrics, stats, g.request_started, request.endpoint or 'unmatched',
+                     request.method, request.path, response.status_code, g.pop('profile_ident', None))
+    if response.is_streamed and not response.direct_passthrough:
+        # NDJSON lists, exports and the change feed generate their body after
+        # this hook and teardown have run; account for it when it closes
+        response.response = stream_request(response.response, stats, finish)
+        return response
+    elapsed = finish()
+    response.headers['Server-Timing'] = server_timing(stats, elapsed)
+    if response.status_code >= 500 and not response.is_streamed and response.is_json:
+        # routes turn exceptions into a 500 body, so this is the only trace left
+        app.logger.error('%s %s failed: %s', request.method, request.path,
+                         (response.get_json(silent=True) or {}).get('message'))
+    return response
+
+def finish_request_metrics(stats, started, endpoint, method, path, status, ident):
+    elapsed = time.perf_counter() - started
+    observe_request(metrics_registry, endpoint, method, status, elapsed, stats)
+    if ident is not None:
+        samples = stack_sampler.stop(ident)
+        if elapsed * 1000 > PROFILE_BUDGET_MS and samples:
+            dump = stack_sampler.dump(samples, '%s-%dms' % (endpoint, elapsed * 1000))
+            app.logger.warning('%s took %.0f ms, stacks written to %s', path, elapsed * 1000, dump)
+    return elapsed
+
+@app.teardown_request
+def end_request_metrics(exc):
+    ident = g.pop('profile_ident', None)
+    if ident is not None:
+        stack_sampler.stop(ident)
+    end_request()
+
+# ===== CATALOG CACHE =====
+catalog_cache = CatalogCache(
+    get_db,
+    max_entries=int(os.environ.get('CATALOG_CACHE_SIZE', 256)),
+    ttl=int(os.environ.get('CATALOG_CACHE_TTL', 300)),
+)
+
+@contextmanager
+def catalog_write():
+    # Admin writes to catalog tables go through here so the version bump,
+    # and the change log entry for it, land in the same transaction as the
+    # change itself. Writes that don't call catalog_changed() are logged as
+    # touching the whole catalog.
+    g.catalog_changes = []
+    with get_db() as conn:
+        with conn.cursor() as cursor:
+            yield cursor
+            g.catalog_version = catalog_cache.bump(cursor)
+            changes.record(cursor, g.catalog_version, g.pop('catalog_changes'))
+        conn.commit()
+    catalog_cache.invalidate()
+    if has_request_context() and not SERVERLESS:
+        # CLI commands compile the snapshot themselves before exiting
+        snapshot_compiler.schedule()
+
+def catalog_changed(cursor, entity, row_id, op, before=()):
+    # Call after the write; `before` holds the pages the row was on before
+    # an update or delete (changes.pages() taken ahead of it).
+    g.catalog_changes.append((entity, row_id, op, set(before) | changes.pages(cursor, entity, row_id)))
+
+@contextmanager
+def catalog_read():
+    # Catalog loads may run on a replica, but whatever they build is cached
+    # under the version this worker already knows. A replica that hasn't
+    # replayed that version yet is skipped for the primary. The version read
+    # also pins the transaction's snapshot, so the rest of the load sees at
+    # least that version.
+    wanted = catalog_cache.version()
+    with read_db() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(VERSION_SQL)
+            row = cursor.fetchone()
+            if row and row['version'] >= wanted:
+                yield cursor
+                return
+    with get_db() as conn:
+        with conn.cursor() as cursor:
+            yield cursor
+
+def catalog_response(key, loader):
+    degraded = False
+    try:
+        body, version = catalog_cache.get(key, lambda: load_from_snapshot(key, loader))
+    except CATALOG_DB_ERRORS as e:
+        snap = fallback_snapshot(e)
+        if snap is None:
+            return catalog_unavailable()
+        body, version, degraded = snap.get(key), snap.version, True
+    if body is None:
+        return None
+    resp = app.response_class(body, mimetype='application/json')
+    # same bytes either way, so the same ETag
+    resp.set_etag('catalog-%d-%s' % (version, key))
+    resp.headers['Cache-Control'] = 'no-cache'
+    if degraded:
+        resp.headers['X-Catalog-Snapshot'] = str(version)
+    return resp.make_conditional(request)
+
+# ===== CATALOG SNAPSHOT =====
+# The assembled catalog is compiled into one memory-mapped file (see
+# snapshot.py) a couple of seconds after each admin write and by the
+# compile-snapshot command. Public catalog reads are answered from it when
+# MySQL errors out or no connection frees up within DB_POOL_TIMEOUT, and on
+# a cache miss whenever it is already at the current version. Serverless
+# instances never compile it; they use one shipped with the deployment.
+CATALOG_SNAPSHOT = os.environ.get('CATALOG_SNAPSHOT') or os.path.join(
+    os.path.dirname(__file__), 'snapshot', 'catalog.snap')
+CATALOG_DB_ERRORS = (pymysql.err.MySQLError, PoolTimeout, OSError)
+
+catalog_snapshot = SnapshotReader(
+    CATALOG_SNAPSHOT,
+    on_error=lambda e: app.logger.error('Catalog snapshot unreadable: %s', e),
+)
+snapshot_compiler = SnapshotCompiler(
+    CATALOG_SNAPSHOT, get_db, app.json.dumps,
+    delay=float(os.environ.get('CATALOG_SNAPSHOT_DELAY', 2)),
+    on_error=lambda e: app.logger.error('Catalog snapshot compile failed: %s', e),
+)
+
+@app.before_request
+def check_catalog_snapshot():
+    if not SERVERLESS:
+        snapshot_compiler.ensure_present()
+
+def load_from_snapshot(key, loader):
+    # zero catalog queries when the snapshot already has this version
+    snap = catalog_snapshot.current()
+    if snap is not None and snap.version == catalog_cache.version():
+        return snap.text(key)
+    return loader()
+
+def fallback_snapshot(error):
+    snap = catalog_snapshot.current()
+    if snap is None:
+        app.logger.error('Catalog read failed and there is no snapshot to fall back to: %s', error)
+        return None
+    metrics_registry.inc('catalog_snapshot_fallbacks_total',
+                         help_text='Catalog reads answered from the snapshot after a database error')
+    app.logger.warning('Catalog read failed, serving snapshot version %d: %s', snap.version, error)
+    return snap
+
+def catalog_unavailable():
+    return jsonify({'success': False, 'message': 'The catalog is temporarily unavailable'}), \
+        503, {'Retry-After': '5'}
+
+# ===== IN-MEMORY INDEXES =====
+def symptom_engine():
+    # numpy is loaded with the first symptom check, not on every cold start
+    from symptoms import SymptomEngine
+    return SymptomEngine()
+
+search_manager = IndexManager(SearchIndex, get_db, catalog_cache.version, name='search')
+symptom_manager = IndexManager(symptom_engine, get_db, catalog_cache.version, name='symptoms')
+# Only built if the spatial query fails (or NEARBY_BACKEND=memory); until
+# then its refresh calls are no-ops.
+location_manager = IndexManager(DoctorLocations, get_db, catalog_cache.version, name='locations')
+
+def reindex(kind, doc_id):
+    # A failed patch leaves an index a version behind, which makes its next
+    # use schedule a full rebuild, so it's safe to just log and move on.
+    for manager in (search_manager, symptom_manager, location_manager):
+        try:
+            manager.refresh(kind, doc_id, g.catalog_version)
+        except Exception:
+            app.logger.exception('%s index refresh failed for %s %s', manager.name, kind, doc_id)
+
+# ===== DOCTOR LOCATIONS =====
+# Addresses are geocoded offline against GAZETTEER_PATH (see geo.py). Nearby
+# searches use the SPATIAL index on doctors.location; NEARBY_BACKEND=memory
+# answers them from per-worker KD-trees instead.
+GAZETTEER_PATH = os.environ.get('GAZETTEER_PATH', os.path.join(os.path.dirname(__file__), 'data', 'gazetteer.csv'))
+NEARBY_BACKEND = os.environ.get('NEARBY_BACKEND', 'sql')
+gazetteer = Gazetteer.load(GAZETTEER_PATH) if os.path.exists(GAZETTEER_PATH) else Gazetteer()
+
+def doctor_coordinates(data):
+    # Coordinates sent by the admin win; otherwise the address is looked up.
+    # (None, None) when neither gives a point: an update then keeps the
+    # coordinates the doctor has, which may have been set by hand.
+    if data.get('latitude') not in (None, '') and data.get('longitude') not in (None, ''):
+        return parse_point(data['latitude'], data['longitude'])
+    place = gazetteer.locate(data.get('address') or '')
+    return (place.latitude, place.longitude) if place else (None, None)
+
+BODY_PART_BY_SLUG_SQL = "SELECT id FROM body_parts WHERE slug = %s"
+
+def nearby_from_db(lat, lon, k, radius, slug):
+    with read_db() as conn:
+        with conn.cursor() as cursor:
+            part_id = None
+            if slug:
+                cursor.execute(BODY_PART_BY_SLUG_SQL, (slug,))
+                part = cursor.fetchone()
+                if not part:
+                    return None
+                part_id = part['id']
+            return nearest_doctors(cursor, lat, lon, k, radius, part_id)
+
+def nearby_from_memory(lat, lon, k, radius, slug):
+    index = location_manager.index()
+    part_id = None
+    if slug:
+        part_id = index.part_ids.get(slug)
+        if part_id is None:
+            return None
+    return index.nearest(lat, lon, k, radius, part_id)
+
+# ===== DASHBOARD COUNTERS =====
+# Dashboard numbers come from stat_counters, which the write paths keep
+# current (see counters.py). A background pass fixes any drift, one worker
+# at a time under a MySQL named lock; serverless deployments run
+# `reconcile-counters` from a cron job instead.
+counter_reconciler = counters.Reconciler(
+    get_db,
+    interval=0 if SERVERLESS else int(os.environ.get('COUNTER_RECONCILE_INTERVAL', counters.RECONCILE_INTERVAL)),
+    on_error=lambda e: app.logger.error('Counter reconciliation failed: %s', e),
+)
+
+@app.before_request
+def start_counter_reconciler():
+    counter_reconciler.ensure_started()
+
+# ===== CONTACT QUEUE =====
+# Contact messages are spooled and written in batches by a background thread
+# (see contact_queue.py), or inserted in the request when serverless; each
+# client IP and email address gets a token bucket of CONTACT_RATE_BURST
+# messages refilling at CONTACT_RATE_PER_MIN per minute. The buckets are per
+# worker: with N workers a client may get up to N times that, so size the
+# values for the worker count.
+def contact_batch_written(cursor, rows):
+    # same transaction as the batch INSERT; the admin feed can't name the
+    # new ids, so it tells open panels to reload their message list
+    counters.apply(cursor, {'messages': len(rows), 'messages.unread': len(rows)})
+    changes.record_admin(cursor, 'message', [None], 'insert')
+
+contact_queue = ContactQueue(
+    get_db,
+    os.path.join(os.path.dirname(__file__), 'spool'),
+    max_size=int(os.environ.get('CONTACT_QUEUE_SIZE', 1000)),
+    write_through=SERVERLESS,
+    on_batch=contact_batch_written,
+    on_error=lambda e: app.logger.error('Contact queue flush failed: %s', e),
+    retry_errors=(pymysql.err.OperationalError, pymysql.err.InterfaceError, PoolTimeout, OSError),
+)
+contact_limiter = RateLimiter(
+    rate=float(os.environ.get('CONTACT_RATE_PER_MIN', 2)) / 60.0,
+    burst=int(os.environ.get('CONTACT_RATE_BURST', 5)),
+)
+
+# ===== MESSAGE ARCHIVE =====
+# Read messages older than MESSAGE_RETENTION_DAYS move into monthly gzip
+# segments under ARCHIVE_DIR (see archive.py), either from the
+# archive-messages command (cron) or every MESSAGE_ARCHIVE_INTERVAL seconds
+# in each worker; a MySQL lock lets only one of them run at a time.
+def messages_archived(cursor, deleted):
+    # same transaction as the batch DELETE; archived messages are all read
+    counters.apply(cursor, {'messages': -deleted})
+    changes.record_admin(cursor, 'message', [None], 'delete')
+
+message_archive = archive.MessageArchive(
+    os.environ.get('ARCHIVE_DIR') or os.path.join(os.path.dirname(__file__), 'archive'),
+    get_db,
+    retention_days=int(os.environ.get('MESSAGE_RETENTION_DAYS', 180)),
+    batch_size=int(os.environ.get('MESSAGE_ARCHIVE_BATCH', 500)),
+    interval=0 if SERVERLESS else int(os.environ.get('MESSAGE_ARCHIVE_INTERVAL', 0)),
+    on_batch=messages_archived,
+    on_error=lambda e: app.logger.error('Message archiving failed: %s', e),
+)
+
+@app.before_request
+def start_message_archiver():
+    message_archive.ensure_started()
+
+def image_urls(content_id):
+    if not is_content_id(content_id):
+        return None
+    manifest = image_store.manifest(content_id) or {'variants': []}
+    return {
+        'id': content_id,
+        'original': url_for('serve_media', content_id=content_id, name='original'),
+        'variants': [dict(v, url=url_for('serve_media', content_id=content_id, name=v['name']))
+                     for v in manifest['variants']],
+        'ready': bool(manifest['variants']),
+    }
+
+IMAGES_IN_USE_SQL = "SELECT DISTINCT image_path FROM medicines WHERE image_path IN ({})"
+
+def release_images(content_ids):
+    # Called after the referencing rows are gone (committed). An image set
+    # still used by another medicine is kept; failures are left to gc-images.
+    content_ids = {c for c in content_ids if is_content_id(c)}
+    if not content_ids:
+        return
+    try:
+        with get_db() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(IMAGES_IN_USE_SQL.format(', '.join(['%s'] * len(content_ids))),
+                               tuple(content_ids))
+                still_used = {row['image_path'] for row in cursor.fetchall()}
+        for content_id in content_ids - still_used:
+            image_store.delete(content_id)
+    except Exception:
+        app.logger.exception('Releasing images %s failed', ', '.join(sorted(content_ids)))
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -41,141 +489,273 @@ def admin_required(f):
 
 # ===== PUBLIC API ROUTES =====
 
+def encoded_response(variants, mimetype, etag):
+    # `variants` comes from compress(); serves the best coding the client accepts
+    coding = pick_encoding(request.headers.get('Accept-Encoding'), variants)
+    resp = app.response_class(variants[coding], mimetype=mimetype)
+    if coding != 'identity':
+        resp.headers['Content-Encoding'] = coding
+    resp.vary.add('Accept-Encoding')
+    resp.set_etag('%s-%s' % (etag, coding))
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp.make_conditional(request)
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    if app.debug:
+        asset_pipeline.check()
+    version = asset_pipeline.version
+    variants = index_cache.get(version)
+    if variants is None:
+        variants = compress(render_template('index.html').encode('utf-8'))
+        index_cache.clear()
+        index_cache[version] = variants
+    return encoded_response(variants, 'text/html', 'index-%s' % version)
+
+@app.route('/assets/<path:name>', methods=['GET'])
+def serve_asset(name):
+    found = asset_pipeline.resolve(name, request.headers.get('Accept-Encoding'))
+    if found is None:
+        return jsonify({'success': False, 'message': 'Not found'}), 404
+    directory, filename, coding = found
+    resp = send_from_directory(directory, filename, mimetype=mimetypes.guess_type(name)[0])
+    if coding != 'identity':
+        resp.headers['Content-Encoding'] = coding
+    resp.vary.add('Accept-Encoding')
+    resp.headers['Cache-Control'] = 'public, max-age=%d, immutable' % IMMUTABLE_MAX_AGE
+    return resp
+
+def load_body_parts():
+    with catalog_read() as cursor:
+        parts = run_queries(cursor, body_parts_queries())
+    return app.json.dumps({'success': True, 'data': parts})
+
+def load_body_part(slug):
+    with catalog_read() as cursor:
+        data = build_body_part(cursor, slug)
+    if data is None:
+        return None
+    return app.json.dumps({'success': True, 'data': data})
+
+def load_health_tips():
+    with catalog_read() as cursor:
+        tips = run_queries(cursor, health_tips_queries())
+    return app.json.dumps({'success': True, 'data': tips})
 
 @app.route('/api/body-parts', methods=['GET'])
 def get_body_parts():
     try:
-        conn = get_db()
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM body_parts ORDER BY id")
-            parts = cursor.fetchall()
-        conn.close()
-        return jsonify({'success': True, 'data': parts})
+        return catalog_response('body-parts', load_body_parts)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/body-part/<slug>', methods=['GET'])
 def get_body_part_info(slug):
     try:
-        conn = get_db()
-        with conn.cursor() as cursor:
-            # Get body part
-            cursor.execute("SELECT * FROM body_parts WHERE slug = %s", (slug,))
-            part = cursor.fetchone()
-            if not part:
-                return jsonify({'success': False, 'message': 'Body part not found'}), 404
-
-            # Get illnesses
-            cursor.execute("""
-                SELECT i.*, 
-                    GROUP_CONCAT(DISTINCT m.name SEPARATOR '|') as medicine_names,
-                    GROUP_CONCAT(DISTINCT m.description SEPARATOR '||') as medicine_descs,
-                    GROUP_CONCAT(DISTINCT m.dosage SEPARATOR '||') as medicine_dosages,
-                    GROUP_CONCAT(DISTINCT m.side_effects SEPARATOR '||') as medicine_sides,
-                    GROUP_CONCAT(DISTINCT m.is_otc SEPARATOR '|') as medicine_otc
-                FROM illnesses i 
-                LEFT JOIN medicines m ON m.illness_id = i.id
-                WHERE i.body_part_id = %s AND i.is_active = 1
-                GROUP BY i.id
-                ORDER BY i.id
-            """, (part['id'],))
-            illnesses = cursor.fetchall()
-
-            # Parse medicine data for each illness
-            for ill in illnesses:
-                medicines = []
-                if ill['medicine_names']:
-                    names = ill['medicine_names'].split('|')
-                    descs = ill['medicine_descs'].split('||') if ill['medicine_descs'] else []
-                    dosages = ill['medicine_dosages'].split('||') if ill['medicine_dosages'] else []
-                    sides = ill['medicine_sides'].split('||') if ill['medicine_sides'] else []
-                    otcs = ill['medicine_otc'].split('|') if ill['medicine_otc'] else []
-                    for i, name in enumerate(names):
-                        if name:
-                            medicines.append({
-                                'name': name,
-                                'description': descs[i] if i < len(descs) else '',
-                                'dosage': dosages[i] if i < len(dosages) else '',
-                                'side_effects': sides[i] if i < len(sides) else '',
-                                'is_otc': otcs[i] == '1' if i < len(otcs) else False
-                            })
-                ill['medicines'] = medicines
-                ill['symptoms_list'] = ill['symptoms'].split('|') if ill['symptoms'] else []
-                ill['care_list'] = ill['care_tips'].split('|') if ill['care_tips'] else []
-                # Remove raw fields
-                for k in ['medicine_names','medicine_descs','medicine_dosages','medicine_sides','medicine_otc']:
-                    ill.pop(k, None)
-
-            # Get doctors
-            cursor.execute("""
-                SELECT * FROM doctors 
-                WHERE (body_part_id = %s OR body_part_id IS NULL) AND is_active = 1
-                ORDER BY experience_years DESC LIMIT 3
-            """, (part['id'],))
-            doctors = cursor.fetchall()
-
-        conn.close()
-        return jsonify({
-            'success': True,
-            'data': {
-                'part': part,
-                'illnesses': illnesses,
-                'doctors': doctors
-            }
-        })
+        resp = catalog_response('body-part:' + slug, lambda: load_body_part(slug))
+        if resp is None:
+            return jsonify({'success': False, 'message': 'Body part not found'}), 404
+        return resp
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/health-tips', methods=['GET'])
 def get_health_tips():
     try:
-        conn = get_db()
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT * FROM health_tips WHERE is_active = 1 
-                ORDER BY category, sort_order
-            """)
-            tips = cursor.fetchall()
-        conn.close()
-        # Group by category
-        grouped = {}
-        for tip in tips:
-            cat = tip['category']
-            if cat not in grouped:
-                grouped[cat] = []
-            grouped[cat].append(tip)
-        return jsonify({'success': True, 'data': grouped})
+        return catalog_response('health-tips', load_health_tips)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
-@app.route('/api/contact', methods=['POST'])
-def submit_contact():
+# ===== CATALOG BUNDLE =====
+# Every body part page plus the health tips in one precompressed response,
+# so the front end can keep the catalog locally and render without a round
+# trip. With ?since=<version> only the pages changed after that version are
+# sent (see changes.py); `full` says whether the client should replace its
+# copy or merge into it.
+def load_catalog_bundle(since):
+    if since is None:
+        snap = catalog_snapshot.current()
+        if snap is not None and snap.version == catalog_cache.version():
+            return compress(snap.get('bundle'), fast=True)
+    with catalog_read() as cursor:
+        # the version of the snapshot the bundle is read from, which a
+        # replica may already have moved past the worker's version
+        cursor.execute(VERSION_SQL)
+        version = cursor.fetchone()['version']
+        touched = None if since is None else changes.touched_since(cursor, since, version)
+        if touched is None:
+            bundle = run_queries(cursor, bundle_queries())
+        else:
+            bundle = run_queries(cursor, bundle_queries(*touched))
+    bundle.update(version=version, full=touched is None, since=None if touched is None else since)
+    return compress(app.json.dumps({'success': True, 'data': bundle}).encode('utf-8'), fast=True)
+
+@app.route('/api/catalog', methods=['GET'])
+def get_catalog_bundle():
+    since = request.args.get('since')
+    if since is not None:
+        if not since.isdigit():
+            return jsonify({'success': False, 'message': 'since must be a catalog version'}), 400
+        since = int(since)
+    key = 'bundle' if since is None else 'bundle-since-%d' % since
     try:
-        data = request.get_json()
-        name = data.get('name', '').strip()
-        email = data.get('email', '').strip()
-        message = data.get('message', '').strip()
+        try:
+            variants, version = catalog_cache.get(key, lambda: load_catalog_bundle(since))
+        except CATALOG_DB_ERRORS as e:
+            # the whole catalog from the snapshot; `full` tells the client
+            # to replace its copy rather than merge
+            snap = fallback_snapshot(e)
+            if snap is None:
+                return catalog_unavailable()
+            resp = encoded_response(snapshot_bundle(snap), 'application/json', 'catalog-%d-bundle' % snap.version)
+            resp.headers['X-Catalog-Snapshot'] = str(snap.version)
+            return resp
+        return encoded_response(variants, 'application/json', 'catalog-%d-%s' % (version, key))
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
 
-        if not all([name, email, message]):
-            return jsonify({'success': False, 'message': 'All fields are required'})
+# Compressed snapshot bundle for outages: {snapshot version: variants}
+snapshot_bundle_cache = {}
 
-        conn = get_db()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "INSERT INTO contact_messages (name, email, message) VALUES (%s, %s, %s)",
-                (name, email, message)
-            )
-        conn.commit()
-        conn.close()
+def snapshot_bundle(snap):
+    variants = snapshot_bundle_cache.get(snap.version)
+    if variants is None:
+        variants = compress(snap.get('bundle'), fast=True)
+        snapshot_bundle_cache.clear()
+        snapshot_bundle_cache[snap.version] = variants
+    return variants
+
+@app.route('/api/search', methods=['GET'])
+def search():
+    query = request.args.get('q', '').strip()
+    if len(query) < 2:
+        return jsonify({'success': True, 'data': []})
+    types = set(request.args.get('type', '').split(',')) - {''}
+    limit = request.args.get('limit', 10, type=int)
+    try:
+        results = search_manager.index().search(query[:100], types or None, limit)
+        return jsonify({'success': True, 'data': results})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+class SymptomQueryError(ValueError):
+    pass
+
+def parse_symptom_query(data):
+    """Validate a symptom-check body; returns (symptoms, body_parts, limit)."""
+    if not isinstance(data, dict):
+        raise SymptomQueryError('Expected a JSON object')
+    symptoms, body_parts = data.get('symptoms', []), data.get('body_parts') or []
+    limit = data.get('limit', 10)
+    if not isinstance(symptoms, list) or not all(isinstance(s, str) for s in symptoms):
+        raise SymptomQueryError('symptoms must be a list of strings')
+    if not isinstance(body_parts, list) or not all(isinstance(p, str) for p in body_parts):
+        raise SymptomQueryError('body_parts must be a list of body part slugs')
+    if not isinstance(limit, int) or isinstance(limit, bool):
+        raise SymptomQueryError('limit must be an integer')
+    symptoms = [s.strip() for s in symptoms if s.strip()]
+    if not symptoms:
+        raise SymptomQueryError('At least one symptom is required')
+    return symptoms[:30], body_parts or None, max(1, min(limit, 50))
+
+@app.route('/api/symptom-check', methods=['POST'])
+def symptom_check():
+    try:
+        symptoms, body_parts, limit = parse_symptom_query(request.get_json(silent=True) or {})
+    except SymptomQueryError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    try:
+        result = symptom_manager.index().score(symptoms, body_parts, limit)
+        return jsonify({'success': True, 'data': result['results'], 'unknown': result['unknown']})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/doctors/nearby', methods=['GET'])
+def doctors_nearby():
+    try:
+        lat, lon = parse_point(request.args.get('lat'), request.args.get('lon'))
+    except GeoError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    k = max(1, min(request.args.get('k', 5, type=int), MAX_NEIGHBOURS))
+    radius = max(1.0, min(request.args.get('radius', DEFAULT_RADIUS_KM, type=float), MAX_RADIUS_KM))
+    slug = request.args.get('body_part', '').strip()
+    try:
+        if NEARBY_BACKEND == 'memory':
+            doctors = nearby_from_memory(lat, lon, k, radius, slug)
+        else:
+            try:
+                doctors = nearby_from_db(lat, lon, k, radius, slug)
+            except pymysql.err.MySQLError as e:
+                # e.g. a server without ST_Distance_Sphere or migration 0003
+                # not applied on a replica yet
+                metrics_registry.inc('doctors_nearby_fallbacks_total',
+                                     help_text='Nearby searches answered from memory after a SQL error')
+                app.logger.warning('Nearby doctor query failed, using in-memory index: %s', e)
+                doctors = nearby_from_memory(lat, lon, k, radius, slug)
+        if doctors is None:
+            return jsonify({'success': False, 'message': 'Body part not found'}), 404
+        return jsonify({'success': True, 'data': doctors, 'radius_km': radius})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/contact', methods=['POST'])
+def submit_contact():
+    try:
+        name, email, message = clean_message(request.get_json(silent=True))
+    except ContactError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    wait = contact_limiter.allow('ip:%s' % request.remote_addr, 'email:%s' % email.lower())
+    if wait:
+        return jsonify({'success': False, 'message': 'Too many messages, please try again later'}), \
+            429, {'Retry-After': str(int(wait) + 1)}
+    try:
+        contact_queue.submit(name, email, message)
         return jsonify({'success': True, 'message': 'Message sent successfully!'})
+    except QueueFull as e:
+        return jsonify({'success': False, 'message': str(e)}), 503, {'Retry-After': '30'}
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/uploads/media/<content_id>/<name>', methods=['GET'])
+def serve_media(content_id, name):
+    # Everything under a content id is derived from those bytes, so it never
+    # changes. A variant that isn't generated yet falls back to the original
+    # without the immutable header, so browsers ask again later.
+    if name == 'original':
+        name = image_store.original_name(content_id) or ''
+    key = image_store.key_for(content_id, name)
+    resp = media_response(key) if key else None
+    if resp is not None:
+        resp.headers['Cache-Control'] = 'public, max-age=%d, immutable' % IMMUTABLE_MAX_AGE
+        return resp
+    original = image_store.original_name(content_id)
+    if key and original and name.startswith('w'):
+        resp = media_response(image_store.key_for(content_id, original))
+        if resp is not None:
+            resp.headers['Cache-Control'] = 'no-cache'
+            return resp
+    return jsonify({'success': False, 'message': 'Not found'}), 404
+
+def media_response(key):
+    # local files go out through send_file; a bucket's bytes are relayed, and
+    # the immutable headers let the CDN in front keep them after one fetch
+    path = image_store.storage.local_path(key)
+    if path is not None:
+        return send_from_directory(os.path.dirname(path), os.path.basename(path)) if os.path.isfile(path) else None
+    data = image_store.storage.read(key)
+    if data is None:
+        return None
+    return app.response_class(data, mimetype=mimetypes.guess_type(key)[0] or 'application/octet-stream')
+
+@app.route('/uploads/<filename>', methods=['GET'])
+def serve_upload(filename):
+    # Files uploaded before content addressing keep their timestamped names.
+    return send_from_directory(UPLOAD_FOLDER, filename, max_age=3600)
+
 # ===== ADMIN ROUTES =====
 
+ADMIN_LOGIN_SQL = "SELECT * FROM admin_users WHERE email = %s AND password = %s"
+
 @app.route('/admin/login', methods=['POST'])
 def admin_login():
     data = request.get_json()
@@ -183,14 +763,10 @@ def admin_login():
     password = data.get('password', '')
 
     try:
-        conn = get_db()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT * FROM admin_users WHERE email = %s AND password = %s",
-                (email, password)
-            )
-            admin = cursor.fetchone()
-        conn.close()
+        with get_db() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(ADMIN_LOGIN_SQL, (email, password))
+                admin = cursor.fetchone()
 
         if admin:
             session['admin_logged_in'] = True
@@ -213,62 +789,133 @@ def admin_check():
         return jsonify({'success': True, 'name': session.get('admin_name')})
     return jsonify({'success': False})
 
+# Admin lists page with ?limit=&after=<cursor> on their sort keys, or stream
+# the whole (filtered) table as NDJSON with ?format=ndjson. Every keyset is
+# on columns of the listed table with an index behind it (migrations 0002,
+# 0005); a key on a joined column would sort the whole join for each page.
+ILLNESS_KEYSET = Keyset([('i.body_part_id', 'body_part_id'), ('i.name', 'name'), ('i.id', 'id')])
+DOCTOR_KEYSET = Keyset([('d.name', 'name'), ('d.id', 'id')])
+MEDICINE_KEYSET = Keyset([('m.illness_id', 'illness_id'), ('m.name', 'name'), ('m.id', 'id')])
+MESSAGE_KEYSET = Keyset([('created_at', 'created_at'), ('id', 'id')], descending=True)
+TIP_KEYSET = Keyset([('category', 'category'), ('sort_order', 'sort_order'), ('id', 'id')])
+
+ILLNESS_LIST_SQL = """
+    SELECT i.*, bp.name as body_part_name 
+    FROM illnesses i 
+    JOIN body_parts bp ON bp.id = i.body_part_id"""
+DOCTOR_LIST_SQL = """
+    SELECT d.*, bp.name as body_part_name 
+    FROM doctors d 
+    LEFT JOIN body_parts bp ON bp.id = d.body_part_id"""
+MEDICINE_LIST_SQL = """
+    SELECT m.*, i.name as illness_name 
+    FROM medicines m 
+    JOIN illnesses i ON i.id = m.illness_id"""
+MESSAGE_LIST_SQL = "SELECT * FROM contact_messages"
+TIP_LIST_SQL = "SELECT * FROM health_tips"
+
+def admin_list(select_sql, keyset, filters):
+    try:
+        if request.args.get('format') == 'ndjson':
+            sql, params = list_query(select_sql, keyset, filters, request.args)
+            return Response(stream_ndjson(sql, params), mimetype='application/x-ndjson')
+
+        limit = parse_limit(request.args.get('limit'))
+        sql, params = list_query(select_sql, keyset, filters, request.args, limit)
+        with read_db() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                items = cursor.fetchall()
+        next_cursor = keyset.encode(items[limit - 1]) if len(items) > limit else None
+        return jsonify({'success': True, 'data': items[:limit], 'next': next_cursor})
+    except PageError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+def stream_ndjson(sql, params):
+    # Unbuffered server-side cursor: rows are read off the socket as they
+    # are written out, so memory stays flat however big the table is.
+    try:
+        with read_db() as conn:
+            with conn.cursor(pymysql.cursors.SSDictCursor) as cursor:
+                cursor.execute(sql, params)
+                for row in cursor:
+                    yield app.json.dumps(row) + '\n'
+    except Exception as e:
+        yield app.json.dumps({'error': str(e)}) + '\n'
+
+def stat_totals(stats):
+    # the dashboard cards, from counters.snapshot()
+    return {'illnesses': stats.get('illnesses', 0), 'doctors': stats.get('doctors', 0),
+            'medicines': stats.get('medicines', 0), 'messages': stats.get('messages.unread', 0),
+            'total_messages': stats.get('messages', 0)}
+
+BODY_PART_NAMES_SQL = "SELECT id, name FROM body_parts"
+
 @app.route('/admin/stats', methods=['GET'])
 @admin_required
 def admin_stats():
     try:
-        conn = get_db()
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT COUNT(*) as c FROM illnesses WHERE is_active=1")
-            illnesses = cursor.fetchone()['c']
-            cursor.execute("SELECT COUNT(*) as c FROM doctors WHERE is_active=1")
-            doctors = cursor.fetchone()['c']
-            cursor.execute("SELECT COUNT(*) as c FROM medicines")
-            medicines = cursor.fetchone()['c']
-            cursor.execute("SELECT COUNT(*) as c FROM contact_messages WHERE is_read=0")
-            messages = cursor.fetchone()['c']
-        conn.close()
+        with get_db() as conn:
+            with conn.cursor() as cursor:
+                stats = counters.snapshot(cursor)
+                if not stats:
+                    # first load after install: seed the counters
+                    counters.reconcile(cursor)
+                    conn.commit()
+                    stats = counters.snapshot(cursor)
+                cursor.execute(BODY_PART_NAMES_SQL)
+                part_names = {str(row['id']): row['name'] for row in cursor.fetchall()}
+        by_part = lambda prefix: {part_names.get(k, 'Unassigned'): v
+                                  for k, v in counters.breakdown(stats, prefix).items()}
         return jsonify({'success': True, 'data': {
-            'illnesses': illnesses, 'doctors': doctors,
-            'medicines': medicines, 'messages': messages
+            **stat_totals(stats),
+            'illnesses_by_body_part': by_part('illnesses.body_part'),
+            'illnesses_by_severity': counters.breakdown(stats, 'illnesses.severity'),
+            'doctors_by_body_part': by_part('doctors.body_part'),
         }})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
-# --- Illness CRUD ---
-@app.route('/admin/illnesses', methods=['GET'])
+@app.route('/admin/stats/reconcile', methods=['POST'])
 @admin_required
-def admin_get_illnesses():
+def admin_reconcile_stats():
     try:
-        conn = get_db()
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT i.*, bp.name as body_part_name 
-                FROM illnesses i 
-                JOIN body_parts bp ON bp.id = i.body_part_id
-                ORDER BY bp.name, i.name
-            """)
-            items = cursor.fetchall()
-        conn.close()
-        return jsonify({'success': True, 'data': items})
+        fixes = counter_reconciler.run_once()
+        return jsonify({'success': True, 'data': {
+            name: {'stored': stored, 'actual': actual} for name, (stored, actual) in fixes.items()
+        }})
+    except counters.ReconcileBusy as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+# --- Illness CRUD ---
+@app.route('/admin/illnesses', methods=['GET'])
+@admin_required
+def admin_get_illnesses():
+    return admin_list(ILLNESS_LIST_SQL, ILLNESS_KEYSET, {
+        'body_part_id': ('i.body_part_id', int),
+        'is_active': ('i.is_active', int),
+        'severity': ('i.severity', str),
+    })
+
 @app.route('/admin/illness', methods=['POST'])
 @admin_required
 def admin_add_illness():
     try:
         data = request.get_json()
-        conn = get_db()
-        with conn.cursor() as cursor:
+        with catalog_write() as cursor:
             cursor.execute("""
                 INSERT INTO illnesses (body_part_id, name, description, symptoms, care_tips, severity)
                 VALUES (%s, %s, %s, %s, %s, %s)
             """, (data['body_part_id'], data['name'], data['description'],
                   data['symptoms'], data['care_tips'], data.get('severity', 'mild')))
             illness_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            counters.settle(cursor, 'illness', illness_id)
+            catalog_changed(cursor, 'illness', illness_id, 'insert')
+        reindex('illness', illness_id)
         return jsonify({'success': True, 'id': illness_id, 'message': 'Illness added successfully'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -278,8 +925,9 @@ def admin_add_illness():
 def admin_update_illness(illness_id):
     try:
         data = request.get_json()
-        conn = get_db()
-        with conn.cursor() as cursor:
+        with catalog_write() as cursor:
+            before = counters.measure(cursor, 'illness', illness_id)
+            pages = changes.pages(cursor, 'illness', illness_id)
             cursor.execute("""
                 UPDATE illnesses SET body_part_id=%s, name=%s, description=%s,
                 symptoms=%s, care_tips=%s, severity=%s, is_active=%s
@@ -287,8 +935,9 @@ def admin_update_illness(illness_id):
             """, (data['body_part_id'], data['name'], data['description'],
                   data['symptoms'], data['care_tips'], data.get('severity','mild'),
                   data.get('is_active', 1), illness_id))
-        conn.commit()
-        conn.close()
+            counters.settle(cursor, 'illness', illness_id, before)
+            catalog_changed(cursor, 'illness', illness_id, 'update', pages)
+        reindex('illness', illness_id)
         return jsonify({'success': True, 'message': 'Illness updated successfully'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -297,11 +946,20 @@ def admin_update_illness(illness_id):
 @admin_required
 def admin_delete_illness(illness_id):
     try:
-        conn = get_db()
-        with conn.cursor() as cursor:
+        with catalog_write() as cursor:
+            # medicines go with the illness (ON DELETE CASCADE), and so may their images
+            cursor.execute("SELECT id, image_path FROM medicines WHERE illness_id=%s", (illness_id,))
+            medicines = cursor.fetchall()
+            images = [row['image_path'] for row in medicines]
+            before = counters.measure(cursor, 'illness', illness_id)
+            pages = changes.pages(cursor, 'illness', illness_id)
             cursor.execute("DELETE FROM illnesses WHERE id=%s", (illness_id,))
-        conn.commit()
-        conn.close()
+            counters.settle(cursor, 'illness', illness_id, before)
+            catalog_changed(cursor, 'illness', illness_id, 'delete', pages)
+            for med in medicines:
+                catalog_changed(cursor, 'medicine', med['id'], 'delete', pages)
+        reindex('illness', illness_id)
+        release_images(images)
         return jsonify({'success': True, 'message': 'Illness deleted'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -310,38 +968,32 @@ def admin_delete_illness(illness_id):
 @app.route('/admin/doctors', methods=['GET'])
 @admin_required
 def admin_get_doctors():
-    try:
-        conn = get_db()
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT d.*, bp.name as body_part_name 
-                FROM doctors d 
-                LEFT JOIN body_parts bp ON bp.id = d.body_part_id
-                ORDER BY d.name
-            """)
-            items = cursor.fetchall()
-        conn.close()
-        return jsonify({'success': True, 'data': items})
-    except Exception as e:
-        return jsonify({'success': False, 'message': str(e)}), 500
+    return admin_list(DOCTOR_LIST_SQL, DOCTOR_KEYSET, {
+        'body_part_id': ('d.body_part_id', int),
+        'is_active': ('d.is_active', int),
+    })
 
 @app.route('/admin/doctor', methods=['POST'])
 @admin_required
 def admin_add_doctor():
     try:
         data = request.get_json()
-        conn = get_db()
-        with conn.cursor() as cursor:
+        latitude, longitude = doctor_coordinates(data)
+        with catalog_write() as cursor:
             cursor.execute("""
-                INSERT INTO doctors (body_part_id, name, specialization, hospital, phone, email, address, experience_years)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                INSERT INTO doctors (body_part_id, name, specialization, hospital, phone, email, address, experience_years,
+                                     latitude, longitude)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """, (data.get('body_part_id'), data['name'], data['specialization'],
                   data.get('hospital',''), data.get('phone',''), data.get('email',''),
-                  data.get('address',''), data.get('experience_years', 0)))
+                  data.get('address',''), data.get('experience_years', 0), latitude, longitude))
             doctor_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            counters.settle(cursor, 'doctor', doctor_id)
+            catalog_changed(cursor, 'doctor', doctor_id, 'insert')
+        reindex('doctor', doctor_id)
         return jsonify({'success': True, 'id': doctor_id, 'message': 'Doctor added successfully'})
+    except GeoError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -350,19 +1002,25 @@ def admin_add_doctor():
 def admin_update_doctor(doctor_id):
     try:
         data = request.get_json()
-        conn = get_db()
-        with conn.cursor() as cursor:
+        latitude, longitude = doctor_coordinates(data)
+        with catalog_write() as cursor:
+            before = counters.measure(cursor, 'doctor', doctor_id)
+            pages = changes.pages(cursor, 'doctor', doctor_id)
             cursor.execute("""
                 UPDATE doctors SET body_part_id=%s, name=%s, specialization=%s, hospital=%s,
-                phone=%s, email=%s, address=%s, experience_years=%s, is_active=%s
+                phone=%s, email=%s, address=%s, experience_years=%s, is_active=%s,
+                latitude=COALESCE(%s, latitude), longitude=COALESCE(%s, longitude)
                 WHERE id=%s
             """, (data.get('body_part_id'), data['name'], data['specialization'],
                   data.get('hospital',''), data.get('phone',''), data.get('email',''),
                   data.get('address',''), data.get('experience_years',0),
-                  data.get('is_active',1), doctor_id))
-        conn.commit()
-        conn.close()
+                  data.get('is_active',1), latitude, longitude, doctor_id))
+            counters.settle(cursor, 'doctor', doctor_id, before)
+            catalog_changed(cursor, 'doctor', doctor_id, 'update', pages)
+        reindex('doctor', doctor_id)
         return jsonify({'success': True, 'message': 'Doctor updated successfully'})
+    except GeoError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -370,11 +1028,13 @@ def admin_update_doctor(doctor_id):
 @admin_required
 def admin_delete_doctor(doctor_id):
     try:
-        conn = get_db()
-        with conn.cursor() as cursor:
+        with catalog_write() as cursor:
+            before = counters.measure(cursor, 'doctor', doctor_id)
+            pages = changes.pages(cursor, 'doctor', doctor_id)
             cursor.execute("DELETE FROM doctors WHERE id=%s", (doctor_id,))
-        conn.commit()
-        conn.close()
+            counters.settle(cursor, 'doctor', doctor_id, before)
+            catalog_changed(cursor, 'doctor', doctor_id, 'delete', pages)
+        reindex('doctor', doctor_id)
         return jsonify({'success': True, 'message': 'Doctor deleted'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -383,36 +1043,26 @@ def admin_delete_doctor(doctor_id):
 @app.route('/admin/medicines', methods=['GET'])
 @admin_required
 def admin_get_medicines():
-    try:
-        conn = get_db()
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT m.*, i.name as illness_name 
-                FROM medicines m 
-                JOIN illnesses i ON i.id = m.illness_id
-                ORDER BY i.name, m.name
-            """)
-            items = cursor.fetchall()
-        conn.close()
-        return jsonify({'success': True, 'data': items})
-    except Exception as e:
-        return jsonify({'success': False, 'message': str(e)}), 500
+    return admin_list(MEDICINE_LIST_SQL, MEDICINE_KEYSET, {
+        'illness_id': ('m.illness_id', int),
+        'is_otc': ('m.is_otc', int),
+    })
 
 @app.route('/admin/medicine', methods=['POST'])
 @admin_required
 def admin_add_medicine():
     try:
         data = request.get_json()
-        conn = get_db()
-        with conn.cursor() as cursor:
+        with catalog_write() as cursor:
             cursor.execute("""
                 INSERT INTO medicines (illness_id, name, description, dosage, side_effects, is_otc)
                 VALUES (%s, %s, %s, %s, %s, %s)
             """, (data['illness_id'], data['name'], data['description'],
                   data.get('dosage',''), data.get('side_effects',''), data.get('is_otc', 0)))
             med_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            counters.settle(cursor, 'medicine', med_id)
+            catalog_changed(cursor, 'medicine', med_id, 'insert')
+        reindex('medicine', med_id)
         return jsonify({'success': True, 'id': med_id, 'message': 'Medicine added successfully'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -421,11 +1071,16 @@ def admin_add_medicine():
 @admin_required
 def admin_delete_medicine(med_id):
     try:
-        conn = get_db()
-        with conn.cursor() as cursor:
+        with catalog_write() as cursor:
+            cursor.execute("SELECT image_path FROM medicines WHERE id=%s", (med_id,))
+            images = [row['image_path'] for row in cursor.fetchall()]
+            before = counters.measure(cursor, 'medicine', med_id)
+            pages = changes.pages(cursor, 'medicine', med_id)
             cursor.execute("DELETE FROM medicines WHERE id=%s", (med_id,))
-        conn.commit()
-        conn.close()
+            counters.settle(cursor, 'medicine', med_id, before)
+            catalog_changed(cursor, 'medicine', med_id, 'delete', pages)
+        reindex('medicine', med_id)
+        release_images(images)
         return jsonify({'success': True, 'message': 'Medicine deleted'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -437,17 +1092,26 @@ def admin_upload_medicine_image(med_id):
         if 'image' not in request.files:
             return jsonify({'success': False, 'message': 'No file uploaded'})
         file = request.files['image']
-        if file and allowed_file(file.filename):
-            filename = secure_filename(f"med_{med_id}_{int(datetime.now().timestamp())}.{file.filename.rsplit('.',1)[1]}")
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            conn = get_db()
+        if not (file and allowed_file(file.filename)):
+            return jsonify({'success': False, 'message': 'Invalid file type'})
+        with get_db() as conn:
             with conn.cursor() as cursor:
-                cursor.execute("UPDATE medicines SET image_path=%s WHERE id=%s", (filename, med_id))
-            conn.commit()
-            conn.close()
-            return jsonify({'success': True, 'filename': filename})
-        return jsonify({'success': False, 'message': 'Invalid file type'})
+                cursor.execute("SELECT id FROM medicines WHERE id=%s", (med_id,))
+                if not cursor.fetchone():
+                    return jsonify({'success': False, 'message': 'Medicine not found'}), 404
+        try:
+            content_id = image_store.store(file.read())
+        except InvalidImage as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except ImageQueueFull as e:
+            return jsonify({'success': False, 'message': str(e)}), 503, {'Retry-After': '5'}
+        with catalog_write() as cursor:
+            cursor.execute("SELECT image_path FROM medicines WHERE id=%s", (med_id,))
+            previous = [row['image_path'] for row in cursor.fetchall() if row['image_path'] != content_id]
+            cursor.execute("UPDATE medicines SET image_path=%s WHERE id=%s", (content_id, med_id))
+            catalog_changed(cursor, 'medicine', med_id, 'update')
+        release_images(previous)
+        return jsonify({'success': True, 'filename': content_id, 'image': image_urls(content_id)})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -455,57 +1119,211 @@ def admin_upload_medicine_image(med_id):
 @app.route('/admin/messages', methods=['GET'])
 @admin_required
 def admin_get_messages():
-    try:
-        conn = get_db()
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM contact_messages ORDER BY created_at DESC")
-            items = cursor.fetchall()
-        conn.close()
-        return jsonify({'success': True, 'data': items})
-    except Exception as e:
-        return jsonify({'success': False, 'message': str(e)}), 500
+    return admin_list(MESSAGE_LIST_SQL, MESSAGE_KEYSET, {
+        'is_read': ('is_read', int),
+    })
 
 @app.route('/admin/message/<int:msg_id>/read', methods=['POST'])
 @admin_required
 def admin_mark_read(msg_id):
     try:
-        conn = get_db()
-        with conn.cursor() as cursor:
-            cursor.execute("UPDATE contact_messages SET is_read=1 WHERE id=%s", (msg_id,))
-        conn.commit()
-        conn.close()
+        with get_db() as conn:
+            with conn.cursor() as cursor:
+                # only an unread -> read transition moves the counter
+                cursor.execute("UPDATE contact_messages SET is_read=1 WHERE id=%s AND is_read=0", (msg_id,))
+                if cursor.rowcount:
+                    counters.apply(cursor, {'messages.unread': -1})
+                    changes.record_admin(cursor, 'message', [msg_id], 'update')
+            conn.commit()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
-# --- Health Tips CRUD ---
-@app.route('/admin/tips', methods=['GET'])
+@app.route('/admin/messages/archive', methods=['GET'])
 @admin_required
-def admin_get_tips():
+def admin_search_archive():
+    # only segments whose date range, id range and sender filter can match
+    # are opened, newest month first
+    try:
+        since = archive.parse_day(request.args['from']) if request.args.get('from') else None
+        until = archive.parse_day(request.args['to'], end=True) if request.args.get('to') else None
+        limit = min(max(int(request.args.get('limit', archive.SEARCH_LIMIT)), 1), archive.MAX_SEARCH_LIMIT)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'from/to must be YYYY-MM-DD and limit a number'}), 400
+    try:
+        found, scanned, more = message_archive.search(
+            query=request.args.get('q'), email=request.args.get('email'), since=since, until=until, limit=limit)
+        return jsonify({'success': True, 'data': found, 'segments_scanned': scanned, 'more': more,
+                        'archive': message_archive.stats()})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/admin/messages/archive/<int:msg_id>', methods=['GET'])
+@admin_required
+def admin_archived_message(msg_id):
     try:
-        conn = get_db()
+        message = message_archive.get(msg_id)
+        if not message:
+            return jsonify({'success': False, 'message': 'Archived message not found'}), 404
+        return jsonify({'success': True, 'data': message})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+# --- Change feed ---
+# Row-level changes for the admin tables, read from the catalog change log
+# (see changes.py). /admin/changes?since=<seq> answers once; the stream
+# pushes the same payloads as Server-Sent Events. Here a stream holds a
+# worker thread for its whole life, which under gunicorn's default sync
+# workers blocks the site, so it's only served with ADMIN_STREAM_WSGI set
+# (threaded or gevent workers); otherwise it answers 204 and the panel polls.
+# asgi.py serves the stream on the event loop. Either way it ends after
+# ADMIN_STREAM_SECONDS and the browser reconnects with Last-Event-ID
+# (re-checking the session on the way).
+ADMIN_STREAM_WSGI = os.environ.get('ADMIN_STREAM_WSGI', '').lower() in ('1', 'true', 'yes')
+ADMIN_STREAM_SECONDS = int(os.environ.get('ADMIN_STREAM_SECONDS', 300))
+ADMIN_STREAM_POLL = float(os.environ.get('ADMIN_STREAM_POLL', 1.0))
+ADMIN_STREAM_KEEPALIVE = 15
+
+# entity -> the admin list query and keyset its rows are shown with
+FEED_TABLES = {
+    'illness': (ILLNESS_LIST_SQL, ILLNESS_KEYSET),
+    'doctor': (DOCTOR_LIST_SQL, DOCTOR_KEYSET),
+    'medicine': (MEDICINE_LIST_SQL, MEDICINE_KEYSET),
+    'tip': (TIP_LIST_SQL, TIP_KEYSET),
+    'message': (MESSAGE_LIST_SQL, MESSAGE_KEYSET),
+}
+
+def admin_feed(since):
+    """{'seq', 'changes', 'more', 'reset'[, 'stats']} for changes after `since`.
+
+    A changed row comes with its current admin list row and the id of the row
+    before it in list order, None if it comes first ('upsert'), or as a
+    'delete' when it's gone. 'reload' means the panel should refetch the
+    table ('catalog': every catalog table), and `reset` everything.
+    """
+    with get_db() as conn:
         with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM health_tips ORDER BY category, sort_order")
-            items = cursor.fetchall()
-        conn.close()
-        return jsonify({'success': True, 'data': items})
+            if since is None:
+                cursor.execute("SELECT MAX(id) AS last FROM catalog_changes")
+                return {'seq': cursor.fetchone()['last'] or 0, 'changes': [], 'more': False, 'reset': False}
+            found, seq, more = changes.feed(cursor, since)
+            if found is None:
+                return {'seq': seq, 'changes': [], 'more': False, 'reset': True}
+
+            wanted = {}
+            for entity, row_id, op in found:
+                if entity in FEED_TABLES and row_id is not None:
+                    wanted.setdefault(entity, []).append(row_id)
+            rows = {}
+            for entity, ids in wanted.items():
+                select_sql, keyset = FEED_TABLES[entity]
+                id_column = keyset.columns[-1][0]
+                cursor.execute(select_sql + " WHERE " + id_column + " IN (" + ', '.join(['%s'] * len(ids)) + ")",
+                               ids)
+                rows.update(((entity, row['id']), row) for row in cursor.fetchall())
+
+            events = []
+            for entity, row_id, op in found:
+                if entity not in FEED_TABLES or row_id is None:
+                    events.append({'entity': entity, 'op': 'reload'})
+                elif (entity, row_id) in rows:
+                    select_sql, keyset = FEED_TABLES[entity]
+                    row = rows[entity, row_id]
+                    events.append({'entity': entity, 'id': row_id, 'op': 'upsert', 'row': row,
+                                   'prev': preceding_id(cursor, select_sql, keyset, row)})
+                else:
+                    events.append({'entity': entity, 'id': row_id, 'op': 'delete'})
+            payload = {'seq': seq, 'changes': events, 'more': more, 'reset': False}
+            if events:
+                payload['stats'] = stat_totals(counters.snapshot(cursor))
+    return payload
+
+def preceding_id(cursor, select_sql, keyset, row):
+    clause, params = keyset.after(keyset.values(row), reverse=True)
+    cursor.execute(select_sql + " WHERE " + clause + " ORDER BY " + keyset.order_by(reverse=True) + " LIMIT 1",
+                   params)
+    found = cursor.fetchone()
+    return found['id'] if found else None
+
+def feed_since(value):
+    if value is None or value == '':
+        return None
+    if not value.isdigit():
+        raise ValueError('since must be a change sequence number')
+    return int(value)
+
+@app.route('/admin/changes', methods=['GET'])
+@admin_required
+def admin_changes():
+    try:
+        since = feed_since(request.args.get('since'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    try:
+        return jsonify({'success': True, 'data': admin_feed(since)})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/admin/changes/stream', methods=['GET'])
+@admin_required
+def admin_changes_stream():
+    if not ADMIN_STREAM_WSGI:
+        return '', 204
+    try:
+        since = feed_since(request.headers.get('Last-Event-ID') or request.args.get('since'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    def events(since):
+        deadline = time.monotonic() + ADMIN_STREAM_SECONDS
+        quiet_since = time.monotonic()
+        yield 'retry: 2000\n\n'
+        try:
+            if since is None:
+                since = admin_feed(None)['seq']
+                yield 'id: %d\nevent: ready\ndata: {}\n\n' % since
+            while time.monotonic() < deadline:
+                payload = admin_feed(since)
+                if payload['changes'] or payload['reset']:
+                    since = payload['seq']
+                    quiet_since = time.monotonic()
+                    yield 'id: %d\nevent: changes\ndata: %s\n\n' % (since, app.json.dumps(payload))
+                    if payload['more']:
+                        continue
+                elif time.monotonic() - quiet_since >= ADMIN_STREAM_KEEPALIVE:
+                    quiet_since = time.monotonic()
+                    yield ': keepalive\n\n'
+                time.sleep(ADMIN_STREAM_POLL)
+        except Exception as e:
+            # the browser reconnects from the last id it saw
+            app.logger.warning('Admin change stream failed: %s', e)
+
+    resp = Response(events(since), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+# --- Health Tips CRUD ---
+@app.route('/admin/tips', methods=['GET'])
+@admin_required
+def admin_get_tips():
+    return admin_list(TIP_LIST_SQL, TIP_KEYSET, {
+        'category': ('category', str),
+        'is_active': ('is_active', int),
+    })
+
 @app.route('/admin/tip', methods=['POST'])
 @admin_required
 def admin_add_tip():
     try:
         data = request.get_json()
-        conn = get_db()
-        with conn.cursor() as cursor:
+        with catalog_write() as cursor:
             cursor.execute("""
                 INSERT INTO health_tips (category, title, description, icon, sort_order)
                 VALUES (%s, %s, %s, %s, %s)
             """, (data.get('category','home_care'), data['title'], data['description'],
                   data.get('icon','💡'), data.get('sort_order', 0)))
-        conn.commit()
-        conn.close()
+            catalog_changed(cursor, 'tip', cursor.lastrowid, 'insert')
         return jsonify({'success': True, 'message': 'Health tip added'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -514,37 +1332,417 @@ def admin_add_tip():
 @admin_required
 def admin_delete_tip(tip_id):
     try:
-        conn = get_db()
-        with conn.cursor() as cursor:
+        with catalog_write() as cursor:
             cursor.execute("DELETE FROM health_tips WHERE id=%s", (tip_id,))
-        conn.commit()
-        conn.close()
+            catalog_changed(cursor, 'tip', tip_id, 'delete')
         return jsonify({'success': True, 'message': 'Tip deleted'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+# --- Bulk import / export ---
+def import_catalog(entity, rows, dry_run=False):
+    if dry_run:
+        # Validate and resolve everything, write nothing
+        with get_db() as conn:
+            with conn.cursor() as cursor:
+                return Importer(cursor, entity, locate=gazetteer.locate).run(rows, dry_run=True)
+    with catalog_write() as cursor:
+        report = Importer(cursor, entity, locate=gazetteer.locate).run(rows)
+        # a bulk load can touch any counter; recount in the same transaction
+        counters.reconcile(cursor)
+    return report
+
+@app.route('/admin/import', methods=['POST'])
+@admin_required
+def admin_import():
+    entity = request.args.get('entity', '')
+    fmt = request.args.get('format', 'csv')
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    try:
+        report = import_catalog(entity, read_rows(stream, fmt), dry_run)
+        return jsonify({'success': True, 'data': report})
+    except ImportFailed as e:
+        return jsonify({'success': False, 'message': str(e), 'data': e.report}), 400
+    except CatalogIOError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+def stream_export(entity, fmt):
+    with read_db() as conn:
+        for chunk in format_rows(export_rows(conn, entity), entity, fmt, dumps=app.json.dumps):
+            yield chunk
+
+@app.route('/admin/export', methods=['GET'])
+@admin_required
+def admin_export():
+    entity = request.args.get('entity', '')
+    fmt = request.args.get('format', 'csv')
+    if entity not in CATALOG_ENTITIES or fmt not in IO_FORMATS:
+        return jsonify({'success': False, 'message': 'Unknown entity or format'}), 400
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    resp = Response(stream_export(entity, fmt), mimetype=mimetype)
+    resp.headers['Content-Disposition'] = 'attachment; filename=%s.%s' % (entity, fmt)
+    return resp
+
+@app.cli.command('import-catalog')
+@click.argument('entity', type=click.Choice(sorted(CATALOG_ENTITIES)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(IO_FORMATS), help='Defaults to the file extension.')
+@click.option('--dry-run', is_flag=True, help='Validate and resolve rows without writing.')
+def import_catalog_command(entity, path, fmt, dry_run):
+    """Bulk-load illnesses, medicines or doctors from CSV/JSONL."""
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, 'rb') as f:
+        try:
+            report = import_catalog(entity, read_rows(f, fmt), dry_run)
+        except ImportFailed as e:
+            for err in e.report['errors']:
+                click.echo('row %(row)d: %(message)s' % err, err=True)
+            raise click.ClickException(str(e))
+        except CatalogIOError as e:
+            raise click.ClickException(str(e))
+    click.echo('%(entity)s: %(rows)d rows, %(inserted)d inserted, %(updated)d updated' % report
+               + (' (dry run)' if dry_run else ''))
+    if not dry_run:
+        compile_snapshot_after_cli()
+
+@app.cli.command('export-catalog')
+@click.argument('entity', type=click.Choice(sorted(CATALOG_ENTITIES)))
+@click.option('--format', 'fmt', type=click.Choice(IO_FORMATS), default='csv')
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-')
+def export_catalog_command(entity, fmt, output):
+    """Stream illnesses, medicines or doctors out as CSV/JSONL."""
+    for chunk in stream_export(entity, fmt):
+        output.write(chunk)
+
+@app.cli.command('reconcile-counters')
+def reconcile_counters_command():
+    """Recount dashboard counters and fix any that drifted."""
+    try:
+        fixes = counter_reconciler.run_once()
+    except counters.ReconcileBusy as e:
+        raise click.ClickException(str(e))
+    for name, (stored, actual) in sorted(fixes.items()):
+        click.echo('%s: %s -> %d' % (name, stored, actual))
+    click.echo('%d counter(s) corrected' % len(fixes))
+
+@app.cli.command('archive-messages')
+@click.option('--days', type=int, help='Archive read messages older than this (default MESSAGE_RETENTION_DAYS).')
+@click.option('--dry-run', is_flag=True, help='Count the messages that would move without moving them.')
+@click.option('--max-batches', type=int, help='Stop after this many batches.')
+def archive_messages_command(days, dry_run, max_batches):
+    """Move old read contact messages into the compressed archive."""
+    if days is not None:
+        message_archive.retention_days = days
+    try:
+        result = message_archive.run(dry_run=dry_run, max_batches=max_batches)
+    except archive.ArchiveBusy as e:
+        raise click.ClickException(str(e))
+    if dry_run:
+        click.echo('%d message(s) read before %s would be archived' % (result['archived'], result['cutoff']))
+    else:
+        click.echo('Archived %d message(s) read before %s in %d batch(es)' % (
+            result['archived'], result['cutoff'], result['batches']))
+
+# ===== SCHEMA MIGRATIONS =====
+
+@app.cli.command('migrate')
+@click.option('--target', type=int, help='Stop after this migration version.')
+@click.option('--dry-run', is_flag=True, help='List pending migrations without applying them.')
+def migrate_command(target, dry_run):
+    """Apply pending migrations from migrations/."""
+    migrator = Migrator(get_db, log=click.echo)
+    try:
+        done = migrator.migrate(target, dry_run)
+    except MigrationError as e:
+        raise click.ClickException(str(e))
+    if dry_run:
+        for m in done:
+            click.echo('pending: %04d_%s' % (m.version, m.name))
+    click.echo('%d migration(s) %s' % (len(done), 'pending' if dry_run else 'applied'))
+
+@app.cli.command('migration-status')
+def migration_status_command():
+    """Show which migrations have been applied."""
+    for m, row, changed in Migrator(get_db).status():
+        state = 'applied %s' % row['applied_at'] if row else 'pending'
+        click.echo('%04d_%-40s %s%s' % (m.version, m.name, state, '  (file changed since)' if changed else ''))
+
+def plan_checks():
+    # Every read query in this file and in the modules it drives (catalog
+    # pages, counters, change log, search/symptom/location index builds),
+    # with representative parameters. Admin lists are checked as first pages
+    # and as later pages (keyset `after` clause). Not listed: INSERTs, and
+    # UPDATEs/DELETEs, which all go by primary key. Optional flags: 'sorts'
+    # allows a filesort, 'scans' a full scan (whole-table reads off the
+    # request path), 'small' both.
+    import search as search_module
+    import symptoms
+    from geo import LOCATIONS_SQL
+    checks = [
+        ('body part illnesses', PART_ILLNESSES_SQL, (1,)),
+        ('body part doctors', PART_DOCTORS_SQL, (1,)),
+        ('health tips', HEALTH_TIPS_SQL, ()),
+        ('catalog version', "SELECT version FROM catalog_version WHERE id = 1", ()),
+        ('catalog changes since', changes.SINCE_SQL, (1, 50)),
+        ('admin change feed', changes.FEED_SQL, (1, changes.FEED_LIMIT)),
+        ('messages to archive', archive.SELECT_SQL, ('2030-01-01 00:00:00', archive.BATCH_SIZE)),
+        # sorts the doctors inside the box by distance, but must find them
+        # through idx_doctors_location
+        ('doctors nearby', NEARBY_SQL.format(part=NEARBY_PART_FILTER),
+         (72.57, 23.02, box_wkt(bounding_box(23.02, 72.57, 20)), 1, 5), 'sorts'),
+        ('body part by slug', BODY_PART_BY_SLUG_SQL, ('head',)),
+        ('admin login', ADMIN_LOGIN_SQL, ('admin@example.com', 'x')),
+        ('active illnesses', ACTIVE_ILLNESSES_SQL, ()),
+        ('illness medicine images', "SELECT id, image_path FROM medicines WHERE illness_id=%s", (1,)),
+        ('images still in use', IMAGES_IN_USE_SQL.format('%s, %s'), ('0' * 64, 'f' * 64)),
+        ('referenced images', IMAGE_PATHS_SQL, ()),
+        ('doctors to geocode', GEOCODE_PENDING_SQL.format(' AND latitude IS NULL'), (0, 500)),
+        ('last change', "SELECT MAX(id) AS last FROM catalog_changes", ()),
+        # body_parts is the fixed list of clickable regions (a dozen rows, see
+        # schema.sql); reading all of it and sorting in memory is cheaper
+        # than any index
+        ('body part names', BODY_PART_NAMES_SQL, (), 'small'),
+        ('admin body parts', BODY_PARTS_SQL, (), 'small'),
+        ('catalog body parts', ALL_PARTS_SQL, (), 'small'),
+        ('catalog body parts by id', PARTS_BY_ID_SQL.format(placeholders(2)), (1, 2), 'small'),
+        ('catalog body part by slug', PART_BY_SLUG_SQL, ('head',)),
+        ('catalog medicines', MEDICINES_SQL.format(placeholders(3)), (1, 2, 3)),
+        ('catalog bundle illnesses', BUNDLE_ILLNESSES_SQL.format(placeholders(3)), (1, 2, 3)),
+        ('changed row pages', changes.PAGE_SQL['illness'], (1,)),
+        ('changed medicine pages', changes.PAGE_SQL['medicine'], (1,)),
+        ('changed doctor pages', changes.PAGE_SQL['doctor'], (1,)),
+        ('change log range', "SELECT MIN(id) AS first, MAX(id) AS last FROM catalog_changes", ()),
+        # rebuilt from the whole catalog after a change, on a background thread
+        ('search index illnesses', search_module.ILLNESS_SQL, (), 'scans'),
+        ('search index medicines', search_module.MEDICINE_SQL, (), 'scans'),
+        ('search index doctors', search_module.DOCTOR_SQL, (), 'scans'),
+        ('symptom index', symptoms.ILLNESS_SQL, (), 'scans'),
+        ('doctor locations', LOCATIONS_SQL, (), 'scans'),
+    ]
+    # reconcile() counts every row by design; GROUP BY without ORDER BY
+    # doesn't sort in MySQL 8, so only the scans are allowed
+    for prefix, sql in sorted(counters.RECOUNT_SQL.items()):
+        checks.append(('recount ' + prefix, sql, (), 'scans'))
+    for entity, (select_sql, keyset) in sorted(FEED_TABLES.items()):
+        checks.append(('admin feed %s rows' % entity,
+                       select_sql + " WHERE " + keyset.columns[-1][0] + " IN (%s, %s)", (1, 2)))
+    lists = [
+        ('admin illnesses', ILLNESS_LIST_SQL, ILLNESS_KEYSET, {}, [1, 'M', 1]),
+        ('admin illnesses by part', ILLNESS_LIST_SQL, ILLNESS_KEYSET,
+         {'body_part_id': ('i.body_part_id', int)}, [1, 'M', 1]),
+        ('admin medicines', MEDICINE_LIST_SQL, MEDICINE_KEYSET, {}, [1, 'M', 1]),
+        ('admin medicines by illness', MEDICINE_LIST_SQL, MEDICINE_KEYSET,
+         {'illness_id': ('m.illness_id', int)}, [1, 'M', 1]),
+        ('admin doctors', DOCTOR_LIST_SQL, DOCTOR_KEYSET, {}, ['Dr', 1]),
+        ('admin messages', MESSAGE_LIST_SQL, MESSAGE_KEYSET, {}, ['2030-01-01 00:00:00', 1]),
+        ('admin unread messages', MESSAGE_LIST_SQL, MESSAGE_KEYSET,
+         {'is_read': ('is_read', int)}, ['2030-01-01 00:00:00', 1]),
+        ('admin tips', TIP_LIST_SQL, TIP_KEYSET, {}, ['home_care', 0, 1]),
+    ]
+    for label, select_sql, keyset, filters, after in lists:
+        args = {name: '0' for name in filters}
+        sql, params = list_query(select_sql, keyset, filters, args, 50)
+        checks.append((label, sql, tuple(params)))
+        sql, params = list_query(select_sql, keyset, filters, dict(args, after=keyset.encode(
+            {key: value for (_, key), value in zip(keyset.columns, after)})), 50)
+        checks.append((label + ' (later page)', sql, tuple(params)))
+    return checks
+
+@app.cli.command('explain-check')
+@click.option('--verbose', '-v', is_flag=True, help='Print every EXPLAIN row.')
+def explain_check_command(verbose):
+    """EXPLAIN the hot queries; fail on full scans or filesorts.
+
+    Run it against a database with realistic row counts: on near-empty
+    tables MySQL may prefer a scan even when a usable index exists.
+    """
+    failed = 0
+    with get_db() as conn:
+        with conn.cursor() as cursor:
+            for label, sql, params, *flags in plan_checks():
+                rows = explain(cursor, sql, params)
+                problems = plan_problems(rows, allow_filesort='sorts' in flags or 'small' in flags,
+                                         allow_scan='scans' in flags or 'small' in flags)
+                failed += bool(problems)
+                click.echo('%-4s %s%s' % ('FAIL' if problems else 'ok', label,
+                                          ': ' + '; '.join(problems) if problems else ''))
+                if verbose:
+                    for row in rows:
+                        click.echo('     %(table)s type=%(type)s key=%(key)s rows=%(rows)s %(Extra)s' % row)
+    if failed:
+        raise click.ClickException('%d query plan(s) need attention' % failed)
+
+GEOCODE_PENDING_SQL = "SELECT id, address FROM doctors WHERE id > %s{} ORDER BY id LIMIT %s"
+
+@app.cli.command('geocode-doctors')
+@click.option('--gazetteer', 'path', default=GAZETTEER_PATH, show_default=True,
+              help='Gazetteer CSV, or a GeoNames dump (.txt).')
+@click.option('--all', 'redo', is_flag=True, help='Also redo doctors that already have coordinates.')
+@click.option('--batch', type=int, default=500, show_default=True)
+def geocode_doctors_command(path, redo, batch):
+    """Fill doctor coordinates from their addresses, offline."""
+    places = Gazetteer.load(path)
+    click.echo('Loaded %d places from %s' % (len(places), path))
+    pending = GEOCODE_PENDING_SQL.format('' if redo else ' AND latitude IS NULL')
+    last_id, located, missed = 0, 0, 0
+    while True:
+        with get_db() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(pending, (last_id, batch))
+                rows = cursor.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        updates = []
+        for row in rows:
+            place = places.locate(row['address'] or '')
+            if place:
+                located += 1
+                updates.append((place.latitude, place.longitude, row['id']))
+            else:
+                missed += 1
+                if redo:
+                    updates.append((None, None, row['id']))
+        if updates:
+            with catalog_write() as cursor:
+                cursor.executemany("UPDATE doctors SET latitude = %s, longitude = %s WHERE id = %s", updates)
+    click.echo('%d doctor(s) located, %d address(es) not matched' % (located, missed))
+    if located or redo:
+        compile_snapshot_after_cli()
+
+@app.cli.command('compile-snapshot')
+@click.option('--static', 'static_dir', type=click.Path(file_okay=False),
+              help='Also write every payload as a JSON file under this directory.')
+def compile_snapshot_command(static_dir):
+    """Compile the public catalog into the memory-mapped snapshot file."""
+    result = snapshot_compiler.compile(force=True)
+    click.echo('Catalog version %(version)d: %(records)d payloads, %(bytes)d bytes' % result)
+    click.echo('Wrote %s' % CATALOG_SNAPSHOT)
+    if static_dir:
+        written = 0
+        for key, body in CatalogSnapshot.open(CATALOG_SNAPSHOT).items():
+            name = static_name(key)
+            if name is None:
+                continue
+            path = os.path.join(static_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(body)
+            written += 1
+        click.echo('Exported %d file(s) to %s' % (written, static_dir))
+
+def compile_snapshot_after_cli():
+    # catalog_write() only schedules background compiles inside requests
+    try:
+        result = snapshot_compiler.compile()
+        if result:
+            click.echo('Catalog snapshot updated to version %(version)d' % result)
+    except Exception as e:
+        click.echo('Catalog snapshot not updated: %s' % e, err=True)
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Minify, hash and precompress main.js and style.css into static/dist."""
+    for name, hashed in sorted(asset_pipeline.build().items()):
+        click.echo('%s -> %s' % (name, hashed))
+
+IMAGE_PATHS_SQL = "SELECT DISTINCT image_path FROM medicines WHERE image_path IS NOT NULL"
+
+@app.cli.command('gc-images')
+@click.option('--grace', type=int, default=3600, show_default=True,
+              help='Keep image sets touched within this many seconds.')
+def gc_images_command(grace):
+    """Delete stored medicine images no medicine refers to any more."""
+    with get_db() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(IMAGE_PATHS_SQL)
+            referenced = {row['image_path'] for row in cursor.fetchall()}
+    removed = image_store.sweep(referenced, grace)
+    click.echo('Removed %d orphaned image set(s)' % len(removed))
+
+BODY_PARTS_SQL = "SELECT * FROM body_parts ORDER BY name"
+
 @app.route('/admin/body-parts', methods=['GET'])
 @admin_required
 def admin_body_parts():
     try:
-        conn = get_db()
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM body_parts ORDER BY name")
-            parts = cursor.fetchall()
-        conn.close()
+        with get_db() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(BODY_PARTS_SQL)
+                parts = cursor.fetchall()
         return jsonify({'success': True, 'data': parts})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/admin/db-pool', methods=['GET'])
+@admin_required
+def admin_db_pool():
+    return jsonify({'success': True, 'data': dict(db_pool.stats(), replicas=db_router.stats())})
+
+@app.route('/admin/catalog-snapshot', methods=['GET'])
+@admin_required
+def admin_catalog_snapshot():
+    return jsonify({'success': True, 'data': dict(catalog_snapshot.stats(), last_compile=snapshot_compiler.last_result)})
+
+@app.route('/admin/contact-queue', methods=['GET'])
+@admin_required
+def admin_contact_queue():
+    return jsonify({'success': True, 'data': contact_queue.stats()})
+
+@app.route('/admin/metrics', methods=['GET'])
+def admin_metrics():
+    # Scrapers can't log in, so METRICS_TOKEN also grants access as a bearer token.
+    token = os.environ.get('METRICS_TOKEN')
+    authorized = session.get('admin_logged_in') or (
+        token and hmac.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token))
+    if not authorized:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    pool = db_pool.stats()
+    for state in ('in_use', 'idle', 'max_size'):
+        metrics_registry.set('db_pool_connections', pool[state], help_text='Pool connections by state', state=state)
+    for event in ('created', 'closed', 'checkouts', 'waits', 'timeouts', 'recycled', 'reconnects', 'errors'):
+        metrics_registry.set('db_pool_events_total', pool.get(event, 0), kind='counter',
+                             help_text='Connection pool events', event=event)
+    for replica in db_router.stats():
+        metrics_registry.set('db_replica_healthy', int(replica['healthy']),
+                             help_text='1 while a replica is serving reads', replica=replica['name'])
+        if replica['lag'] is not None:
+            metrics_registry.set('db_replica_lag_seconds', replica['lag'],
+                                 help_text='Replication lag at the last health check', replica=replica['name'])
+    cache = catalog_cache.stats()
+    metrics_registry.set('catalog_cache_entries', cache['entries'], help_text='Cached catalog responses')
+    for result in ('hits', 'misses'):
+        metrics_registry.set('catalog_cache_lookups_total', cache[result], kind='counter',
+                             help_text='Catalog cache lookups', result=result)
+    queue = contact_queue.stats()
+    metrics_registry.set('contact_queue_pending', queue['pending'], help_text='Contact messages waiting to be written')
+    for outcome in ('written', 'rejected', 'recovered', 'failures', 'dead_lettered'):
+        metrics_registry.set('contact_queue_messages_total', queue[outcome], kind='counter',
+                             help_text='Contact queue activity', outcome=outcome)
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/slow-queries', methods=['GET'])
+@admin_required
+def admin_slow_queries():
+    return jsonify({'success': True, 'data': {
+        'threshold_ms': query_tracker.slow_query_seconds * 1000,
+        'queries': list(reversed(query_tracker.slow_queries)),
+    }})
+
+ACTIVE_ILLNESSES_SQL = "SELECT id, name FROM illnesses WHERE is_active=1 ORDER BY name"
+
 @app.route('/admin/illnesses-list', methods=['GET'])
 @admin_required
 def admin_illnesses_list():
     try:
-        conn = get_db()
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT id, name FROM illnesses WHERE is_active=1 ORDER BY name")
-            items = cursor.fetchall()
-        conn.close()
+        with get_db() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(ACTIVE_ILLNESSES_SQL)
+                items = cursor.fetchall()
         return jsonify({'success': True, 'data': items})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -0,0 +1,359 @@
+# Retention and cold storage for contact messages.
+#
+# Read messages older than the retention age move out of contact_messages
+# into gzip-compressed JSONL segments, one per month of created_at
+# (archive/messages-2024-03.jsonl.gz). index.json describes every segment:
+# row count, id and date range, and a Bloom filter of sender addresses, so a
+# search opens only the segments that can hold a match. Each filter is sized
+# at BLOOM_BITS_PER_ENTRY bits per row for twice the segment's rows; when a
+# month outgrows it, the filter is rebuilt from the segment at the new size.
+#
+# Rows move oldest first, BATCH_SIZE at a time, each batch in its own short
+# transaction, so the DELETE never holds row locks for long. A batch is
+# appended to each segment as one new gzip member (concatenated members are
+# still one valid gzip file). Around the append the index records the batch:
+# 'writing' with the segment sizes before it, then 'written' with the ids to
+# delete. A run that was interrupted is finished by the next one: a
+# 'writing' batch is cut off the segments again and stays in the table, a
+# 'written' one is deleted from it. A MySQL named lock keeps two processes
+# from archiving at once; the archive directory should live on the one host
+# that runs it.
+
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+RETENTION_DAYS = 180
+BATCH_SIZE = 500
+BATCH_PAUSE = 0.1
+LOCK_NAME = 'ai_doctor_message_archive'
+BLOOM_BITS_PER_ENTRY = 10  # ~1% false positives with 7 hashes
+BLOOM_HASHES = 7
+BLOOM_MIN_BYTES = 64
+SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 500
+
+# Served by idx_contact_messages_unread (is_read, created_at); InnoDB appends
+# the primary key, so the ORDER BY needs no sort.
+SELECT_SQL = """
+    SELECT id, name, email, message, is_read, created_at FROM contact_messages
+    WHERE is_read = 1 AND created_at < %s
+    ORDER BY created_at, id LIMIT %s"""
+
+COUNT_SQL = "SELECT COUNT(*) AS n FROM contact_messages WHERE is_read = 1 AND created_at < %s"
+
+
+class ArchiveBusy(Exception):
+    pass
+
+
+class Bloom:
+    """Bloom filter over lowercased strings."""
+
+    def __init__(self, bits, hashes=BLOOM_HASHES):
+        self.bits = bytearray(bits)
+        self.hashes = hashes
+
+    @classmethod
+    def sized(cls, entries):
+        """An empty filter for `entries` values at BLOOM_BITS_PER_ENTRY bits each."""
+        return cls(max(BLOOM_MIN_BYTES, -(-entries * BLOOM_BITS_PER_ENTRY // 8)))
+
+    @property
+    def capacity(self):
+        return len(self.bits) * 8 // BLOOM_BITS_PER_ENTRY
+
+    def _positions(self, value):
+        digest = hashlib.sha256(value.strip().lower().encode('utf-8')).digest()
+        size = len(self.bits) * 8
+        for i in range(self.hashes):
+            yield int.from_bytes(digest[i * 4:i * 4 + 4], 'big') % size
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.bits[pos // 8] |= 1 << (pos % 8)
+
+    def __contains__(self, value):
+        return all(self.bits[pos // 8] & (1 << (pos % 8)) for pos in self._positions(value))
+
+    def encode(self):
+        return base64.b64encode(bytes(self.bits)).decode('ascii')
+
+    @classmethod
+    def decode(cls, text, hashes=BLOOM_HASHES):
+        return cls(base64.b64decode(text), hashes)
+
+    @classmethod
+    def from_entry(cls, entry):
+        # filters written before they were sized per segment used 4 hashes
+        return cls.decode(entry['emails'], entry.get('email_hashes', 4))
+
+
+def parse_day(value, end=False):
+    """'YYYY-MM-DD' -> the first (or, with `end`, last) second of that day."""
+    day = datetime.strptime(value, '%Y-%m-%d')
+    return (day + timedelta(days=1, seconds=-1) if end else day).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def to_record(row):
+    created = row['created_at']
+    return {'id': row['id'], 'name': row['name'], 'email': row['email'], 'message': row['message'],
+            'is_read': bool(row['is_read']),
+            'created_at': created.strftime('%Y-%m-%d %H:%M:%S') if hasattr(created, 'strftime') else str(created)}
+
+
+class MessageArchive:
+    def __init__(self, directory, get_db, retention_days=RETENTION_DAYS, batch_size=BATCH_SIZE,
+                 pause=BATCH_PAUSE, interval=0, on_batch=None, on_error=None):
+        self.directory = directory
+        self.get_db = get_db
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.pause = pause
+        self.interval = interval
+        # on_batch(cursor, deleted) runs in the transaction that deletes a batch
+        self.on_batch = on_batch
+        self.on_error = on_error
+        self.last_run = None
+        self.last_result = None
+        self._run_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    # ----- files -----
+
+    def segment_path(self, month):
+        return os.path.join(self.directory, 'messages-%s.jsonl.gz' % month)
+
+    def _index_path(self):
+        return os.path.join(self.directory, 'index.json')
+
+    def load_index(self):
+        try:
+            with open(self._index_path(), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'segments': {}, 'pending': None}
+
+    def _save_index(self, index):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self._index_path() + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._index_path())
+
+    def _size(self, month):
+        try:
+            return os.path.getsize(self.segment_path(month))
+        except FileNotFoundError:
+            return 0
+
+    def _append(self, index, month, records):
+        data = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records).encode('utf-8')
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.segment_path(month)
+        with open(path, 'ab') as f:
+            f.write(gzip.compress(data, 6, mtime=0))
+            f.flush()
+            os.fsync(f.fileno())
+        entry = index['segments'].get(month) or {
+            'rows': 0, 'first_id': records[0]['id'], 'last_id': records[0]['id'],
+            'first_at': records[0]['created_at'], 'last_at': records[0]['created_at']}
+        rows = entry['rows'] + len(records)
+        emails, added = Bloom.from_entry(entry) if entry['rows'] else None, records
+        if emails is None or emails.capacity < rows:
+            # (re)size for twice the rows, so a growing month is rebuilt rarely;
+            # the segment on disk already includes this batch
+            emails = Bloom.sized(2 * rows)
+            if entry['rows']:
+                added = self.read_segment(month)
+        for r in added:
+            emails.add(r['email'])
+        entry.update(
+            rows=rows,
+            first_id=min(entry['first_id'], *(r['id'] for r in records)),
+            last_id=max(entry['last_id'], *(r['id'] for r in records)),
+            first_at=min(entry['first_at'], *(r['created_at'] for r in records)),
+            last_at=max(entry['last_at'], *(r['created_at'] for r in records)),
+            bytes=os.path.getsize(path), emails=emails.encode(), email_hashes=emails.hashes)
+        index['segments'][month] = entry
+
+    def read_segment(self, month):
+        try:
+            with gzip.open(self.segment_path(month), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+        except FileNotFoundError:
+            return
+        except (EOFError, gzip.BadGzipFile, ValueError):
+            # the tail of a batch still being written (or cut off by a
+            # crash, until the next run truncates it)
+            return
+
+    # ----- archiving -----
+
+    def run(self, now=None, dry_run=False, max_batches=None):
+        """Move read messages past the retention age into the archive.
+
+        Returns {'archived', 'batches', 'cutoff'}; with dry_run, 'archived'
+        is how many would move and nothing is touched.
+        """
+        cutoff = ((now or datetime.now()) - timedelta(days=self.retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+        with self._run_lock, self.get_db() as conn:
+            with conn.cursor() as cursor:
+                if dry_run:
+                    cursor.execute(COUNT_SQL, (cutoff,))
+                    return {'archived': cursor.fetchone()['n'], 'batches': 0, 'cutoff': cutoff}
+                cursor.execute("SELECT GET_LOCK(%s, 0) AS locked", (LOCK_NAME,))
+                if not cursor.fetchone()['locked']:
+                    raise ArchiveBusy('Another process is archiving messages')
+                try:
+                    index = self.load_index()
+                    archived = self._recover(conn, cursor, index)
+                    batches = 0
+                    while max_batches is None or batches < max_batches:
+                        cursor.execute(SELECT_SQL, (cutoff, self.batch_size))
+                        rows = cursor.fetchall()
+                        if not rows:
+                            break
+                        archived += self._move(conn, cursor, index, rows)
+                        batches += 1
+                        if self.pause:
+                            time.sleep(self.pause)
+                finally:
+                    conn.rollback()
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        self.last_run = time.time()
+        self.last_result = {'archived': archived, 'batches': batches, 'cutoff': cutoff}
+        return self.last_result
+
+    def _move(self, conn, cursor, index, rows):
+        records = [to_record(row) for row in rows]
+        by_month = {}
+        for r in records:
+            by_month.setdefault(r['created_at'][:7], []).append(r)
+        index['pending'] = {'state': 'writing', 'ids': [r['id'] for r in records],
+                            'sizes': {month: self._size(month) for month in by_month}}
+        self._save_index(index)
+        for month, batch in sorted(by_month.items()):
+            self._append(index, month, batch)
+        index['pending']['state'] = 'written'
+        self._save_index(index)
+        return self._finish(conn, cursor, index)
+
+    def _finish(self, conn, cursor, index):
+        ids = index['pending']['ids']
+        cursor.execute("DELETE FROM contact_messages WHERE is_read = 1 AND id IN ("
+                       + ', '.join(['%s'] * len(ids)) + ")", ids)
+        deleted = cursor.rowcount
+        if self.on_batch and deleted:
+            self.on_batch(cursor, deleted)
+        conn.commit()
+        index['pending'] = None
+        self._save_index(index)
+        return deleted
+
+    def _recover(self, conn, cursor, index):
+        pending = index.get('pending')
+        if not pending:
+            return 0
+        if pending['state'] == 'written':
+            return self._finish(conn, cursor, index)
+        # the append may be partial; its rows are still in the table
+        for month, size in pending['sizes'].items():
+            path = self.segment_path(month)
+            if not size:
+                if os.path.exists(path):
+                    os.remove(path)
+            elif self._size(month) > size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+        index['pending'] = None
+        self._save_index(index)
+        return 0
+
+    # ----- search -----
+
+    def search(self, query=None, email=None, since=None, until=None, message_id=None, limit=SEARCH_LIMIT):
+        """Archived messages matching every filter given, newest first.
+
+        Returns (messages, months scanned, more). `since`/`until` are
+        'YYYY-MM-DD HH:MM:SS' strings (see parse_day). Segments are read
+        newest month first and the scan stops once `limit` is reached.
+        """
+        index = self.load_index()
+        query = (query or '').strip().lower()
+        email = (email or '').strip().lower()
+        found, scanned = [], []
+        for month in sorted(index['segments'], reverse=True):
+            entry = index['segments'][month]
+            if since and entry['last_at'] < since or until and entry['first_at'] > until:
+                continue
+            if message_id is not None and not entry['first_id'] <= message_id <= entry['last_id']:
+                continue
+            if email and email not in Bloom.from_entry(entry):
+                continue
+            scanned.append(month)
+            matches = []
+            for r in self.read_segment(month):
+                if message_id is not None and r['id'] != message_id:
+                    continue
+                if email and r['email'].lower() != email:
+                    continue
+                if since and r['created_at'] < since or until and r['created_at'] > until:
+                    continue
+                if query and query not in ('%s\n%s\n%s' % (r['name'], r['email'], r['message'])).lower():
+                    continue
+                matches.append(r)
+            matches.sort(key=lambda r: (r['created_at'], r['id']), reverse=True)
+            found.extend(matches)
+            if len(found) > limit:
+                break
+        return found[:limit], scanned, len(found) > limit
+
+    def get(self, message_id):
+        found, _, _ = self.search(message_id=message_id, limit=1)
+        return found[0] if found else None
+
+    def stats(self):
+        index = self.load_index()
+        segments = index['segments']
+        return {
+            'segments': len(segments),
+            'rows': sum(e['rows'] for e in segments.values()),
+            'bytes': sum(e.get('bytes', 0) for e in segments.values()),
+            'oldest': min(segments) if segments else None,
+            'newest': max(segments) if segments else None,
+            'pending': bool(index.get('pending')),
+            'retention_days': self.retention_days,
+            'last_run': self.last_run,
+            'last_result': self.last_result,
+        }
+
+    # ----- background runs -----
+
+    def ensure_started(self):
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._loop, name='message-archiver', daemon=True).start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run()
+            except ArchiveBusy:
+                pass
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
@@ -0,0 +1,558 @@
+# ASGI entry point: async public API in front of the unchanged Flask app.
+#
+#     uvicorn asgi:application --workers 4 --port 8000
+#
+# The read-heavy public routes (/api/body-parts, /api/body-part/<slug>,
+# /api/health-tips, /api/search, /api/symptom-check, /api/contact) are
+# served here on the event loop, with aiomysql connection pools. A slow
+# client or slow query then holds a coroutine, not a worker thread. Every
+# other path, including the whole admin panel, goes to the Flask app through
+# a2wsgi's thread pool and behaves as under gunicorn.
+#
+# The async routes share the Flask app's process state: the catalog cache
+# (so admin writes invalidate both), the search and symptom indexes, the
+# contact queue and rate limiter, the replica health checks and the metrics
+# registry. Catalog payloads are built by the same query generators in
+# catalog.py, so both paths serve byte-identical bodies. The async routes
+# bypass Flask's before_request hooks, so the background work those start
+# (snapshot compile, counter reconciler, message archiver) starts at
+# lifespan startup instead.
+#
+# The admin change stream (/admin/changes/stream) is served here too: between
+# polls of the change log it waits on the event loop, so an open admin panel
+# doesn't hold one of the Flask threads.
+#
+# Each async route has its own limit on requests in flight in this worker
+# and a time budget. A request that can't get a slot within QUEUE_TIMEOUT
+# gets a 503, and one that runs past its budget gets a 504.
+
+import asyncio
+import json
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs
+
+import aiomysql
+import pymysql
+from a2wsgi import WSGIMiddleware
+
+from flask import session
+
+from app import (ADMIN_STREAM_KEEPALIVE, ADMIN_STREAM_POLL, ADMIN_STREAM_SECONDS, CATALOG_DB_ERRORS, DB_CONFIG,
+                 SERVERLESS, SymptomQueryError, admin_feed, app as flask_app, catalog_cache, catalog_snapshot,
+                 contact_limiter, contact_queue, counter_reconciler, db_router, fallback_snapshot, feed_since,
+                 message_archive, metrics_registry, parse_symptom_query, query_tracker, search_manager,
+                 snapshot_compiler, symptom_manager)
+from cache import VERSION_SQL
+from catalog import body_part_queries, body_parts_queries, health_tips_queries
+from contact_queue import ContactError, QueueFull, clean_message
+from metrics import begin_request, end_request, observe_request, server_timing
+
+QUEUE_TIMEOUT = 1.0
+# Seconds a catalog load may spend on MySQL before the snapshot answers
+CATALOG_DB_TIMEOUT = float(os.environ.get('CATALOG_DB_TIMEOUT', 2.0))
+MAX_BODY = 64 * 1024
+WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 10))
+
+# Flask endpoint -> (requests in flight per worker, seconds before a 504).
+# Override with ASYNC_ROUTE_LIMITS="get_body_part_info=100:5,search=50:2".
+ROUTE_LIMITS = {
+    'get_body_parts': (200, 5.0),
+    'get_body_part_info': (100, 5.0),
+    'get_health_tips': (200, 5.0),
+    'search': (100, 2.0),
+    'symptom_check': (50, 5.0),
+    'submit_contact': (50, 5.0),
+}
+
+
+def route_limits(spec):
+    limits = dict(ROUTE_LIMITS)
+    for item in [i.strip() for i in spec.split(',') if i.strip()]:
+        endpoint, _, value = item.partition('=')
+        concurrency, _, timeout = value.partition(':')
+        default = limits.get(endpoint.strip(), (50, 5.0))
+        limits[endpoint.strip()] = (int(concurrency or default[0]), float(timeout or default[1]))
+    return limits
+
+
+# ----- database -----
+
+class AsyncDB:
+    """aiomysql pools for the primary and each replica, created on first use
+    inside the running event loop."""
+
+    def __init__(self, config, router, max_size=10, timeout=5.0, max_lifetime=1800):
+        self.config = {k: v for k, v in config.items() if k != 'cursorclass'}
+        self.router = router
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self._pools = {}
+        self._lock = None
+
+    async def _pool(self, name, config):
+        pool = self._pools.get(name)
+        if pool is not None:
+            return pool
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if name not in self._pools:
+                self._pools[name] = await aiomysql.create_pool(
+                    minsize=0, maxsize=self.max_size, pool_recycle=self.max_lifetime,
+                    autocommit=False, cursorclass=aiomysql.DictCursor,
+                    **dict(self.config, host=config.get('host', 'localhost'), port=config.get('port', 3306)))
+        return self._pools[name]
+
+    async def _acquire(self, name, config):
+        pool = await self._pool(name, config)
+        return pool, await asyncio.wait_for(pool.acquire(), self.timeout)
+
+    @asynccontextmanager
+    async def connection(self, read_only=False):
+        self.router.ensure_started()
+        replica = self.router.pick() if read_only else None
+        started = time.perf_counter()
+        pool = conn = None
+        if replica is not None:
+            try:
+                pool, conn = await self._acquire(replica.name, replica.pool.config)
+            except (OSError, pymysql.err.OperationalError, asyncio.TimeoutError):
+                pool = conn = None  # the health check takes it out; use the primary now
+        if conn is None:
+            pool, conn = await self._acquire('primary', self.config)
+        query_tracker.record_acquire(time.perf_counter() - started)
+        clean = False
+        try:
+            yield conn
+            # end the read snapshot before the next borrower
+            await conn.rollback()
+            clean = True
+        finally:
+            if not clean:
+                # possibly cancelled mid-query: never reuse it
+                conn.close()
+            pool.release(conn)
+
+    async def close(self):
+        for pool in self._pools.values():
+            pool.close()
+            await pool.wait_closed()
+        self._pools = {}
+
+
+async def fetch(cursor, sql, params=None):
+    started = time.perf_counter()
+    try:
+        await cursor.execute(sql, params or None)
+        rows = list(await cursor.fetchall())
+    finally:
+        query_tracker.record(sql, time.perf_counter() - started)
+    query_tracker.add_rows(len(rows))
+    return rows
+
+
+async def run_queries(cursor, queries):
+    # async twin of catalog.run_queries
+    try:
+        query = next(queries)
+        while True:
+            query = queries.send(await fetch(cursor, *query))
+    except StopIteration as done:
+        return done.value
+
+
+db = AsyncDB(
+    DB_CONFIG, db_router,
+    max_size=int(os.environ.get('DB_POOL_SIZE', 10)),
+    timeout=float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+    max_lifetime=int(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+)
+
+
+# ----- catalog -----
+
+async def catalog_version():
+    if catalog_cache.stale():
+        async with db.connection() as conn:
+            async with conn.cursor() as cursor:
+                rows = await fetch(cursor, VERSION_SQL)
+        return catalog_cache.observe(rows[0]['version'] if rows else 0)
+    return catalog_cache.version()
+
+
+async def catalog_load(make_queries):
+    # Same rule as catalog_read() in app.py: only use a replica that has
+    # replayed the version this worker caches under.
+    wanted = await catalog_version()
+    async with db.connection(read_only=True) as conn:
+        async with conn.cursor() as cursor:
+            rows = await fetch(cursor, VERSION_SQL)
+            if rows and rows[0]['version'] >= wanted:
+                return await run_queries(cursor, make_queries())
+    async with db.connection() as conn:
+        async with conn.cursor() as cursor:
+            return await run_queries(cursor, make_queries())
+
+
+async def catalog_body(key, make_queries):
+    version = await catalog_version()
+    body = catalog_cache.lookup(key, version)
+    if body is None:
+        snap = catalog_snapshot.current()
+        if snap is not None and snap.version == version:
+            body = snap.text(key)
+        else:
+            data = await catalog_load(make_queries)
+            body = None if data is None else flask_app.json.dumps({'success': True, 'data': data})
+        if body is None:
+            return None, version
+        catalog_cache.store(key, version, body)
+    return body, version
+
+
+async def catalog_response(request, key, make_queries):
+    headers = {'Cache-Control': 'no-cache'}
+    try:
+        body, version = await asyncio.wait_for(catalog_body(key, make_queries), CATALOG_DB_TIMEOUT)
+    except CATALOG_DB_ERRORS + (asyncio.TimeoutError,) as e:
+        snap = fallback_snapshot(str(e) or 'timed out after %.1fs' % CATALOG_DB_TIMEOUT)
+        if snap is None:
+            return json_response({'success': False, 'message': 'The catalog is temporarily unavailable'},
+                                 503, {'Retry-After': '5'})
+        body, version = snap.text(key), snap.version
+        headers['X-Catalog-Snapshot'] = str(version)
+    if body is None:
+        return None
+    etag = 'catalog-%d-%s' % (version, key)
+    headers['ETag'] = '"%s"' % etag
+    if etag_matches(request.header('if-none-match'), etag):
+        return 304, b'', headers
+    return 200, body.encode('utf-8'), dict(headers, **{'Content-Type': 'application/json'})
+
+
+def etag_matches(header, etag):
+    # If-None-Match uses the weak comparison
+    for tag in (header or '').split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == '*' or tag.strip('"') == etag:
+            return True
+    return False
+
+
+# ----- handlers -----
+
+class Request:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.body = body
+        self.args = {k: v[0] for k, v in parse_qs(scope.get('query_string', b'').decode('latin-1'),
+                                                   keep_blank_values=True).items()}
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope['headers']}
+
+    def header(self, name):
+        return self.headers.get(name)
+
+    def int_arg(self, name, default):
+        try:
+            return int(self.args.get(name, default))
+        except ValueError:
+            return default
+
+    def json(self):
+        # like Flask's get_json(silent=True)
+        content_type = self.header('content-type') or ''
+        mimetype = content_type.split(';')[0].strip()
+        if mimetype != 'application/json' and not mimetype.endswith('+json'):
+            return None
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+    @property
+    def remote_addr(self):
+        client = self.scope.get('client')
+        return client[0] if client else None
+
+
+def json_response(data, status=200, headers=None):
+    return status, flask_app.json.dumps(data).encode('utf-8'), \
+        dict(headers or {}, **{'Content-Type': 'application/json'})
+
+
+async def get_body_parts(request):
+    return await catalog_response(request, 'body-parts', body_parts_queries)
+
+
+async def get_body_part_info(request, slug):
+    resp = await catalog_response(request, 'body-part:' + slug, lambda: body_part_queries(slug))
+    if resp is None:
+        return json_response({'success': False, 'message': 'Body part not found'}, 404)
+    return resp
+
+
+async def get_health_tips(request):
+    return await catalog_response(request, 'health-tips', health_tips_queries)
+
+
+async def search(request):
+    query = request.args.get('q', '').strip()
+    if len(query) < 2:
+        return json_response({'success': True, 'data': []})
+    types = set(request.args.get('type', '').split(',')) - {''}
+    limit = request.int_arg('limit', 10)
+    # in-memory lookups; a thread keeps a stale-index version check off the loop
+    results = await asyncio.to_thread(
+        lambda: search_manager.index().search(query[:100], types or None, limit))
+    return json_response({'success': True, 'data': results})
+
+
+async def symptom_check(request):
+    try:
+        symptoms, body_parts, limit = parse_symptom_query(request.json() or {})
+    except SymptomQueryError as e:
+        return json_response({'success': False, 'message': str(e)}, 400)
+    result = await asyncio.to_thread(
+        lambda: symptom_manager.index().score(symptoms, body_parts, limit))
+    return json_response({'success': True, 'data': result['results'], 'unknown': result['unknown']})
+
+
+async def submit_contact(request):
+    try:
+        name, email, message = clean_message(request.json())
+    except ContactError as e:
+        return json_response({'success': False, 'message': str(e)}, 400)
+    wait = contact_limiter.allow('ip:%s' % request.remote_addr, 'email:%s' % email.lower())
+    if wait:
+        return json_response({'success': False, 'message': 'Too many messages, please try again later'},
+                             429, {'Retry-After': str(int(wait) + 1)})
+    try:
+        # appends to the spool file (or inserts, when write-through) and may
+        # wait on the writer thread's lock: keep it off the event loop
+        await asyncio.to_thread(contact_queue.submit, name, email, message)
+        return json_response({'success': True, 'message': 'Message sent successfully!'})
+    except QueueFull as e:
+        return json_response({'success': False, 'message': str(e)}, 503, {'Retry-After': '30'})
+
+
+# ----- admin change stream -----
+
+def admin_session(cookie):
+    # Flask's session cookie, read the way admin_required does
+    with flask_app.test_request_context('/', headers={'Cookie': cookie} if cookie else {}):
+        return bool(session.get('admin_logged_in'))
+
+
+async def admin_events(since):
+    # async twin of the generator in app.admin_changes_stream
+    deadline = time.monotonic() + ADMIN_STREAM_SECONDS
+    quiet_since = time.monotonic()
+    yield 'retry: 2000\n\n'
+    try:
+        if since is None:
+            since = (await asyncio.to_thread(admin_feed, None))['seq']
+            yield 'id: %d\nevent: ready\ndata: {}\n\n' % since
+        while time.monotonic() < deadline:
+            payload = await asyncio.to_thread(admin_feed, since)
+            if payload['changes'] or payload['reset']:
+                since = payload['seq']
+                quiet_since = time.monotonic()
+                yield 'id: %d\nevent: changes\ndata: %s\n\n' % (since, flask_app.json.dumps(payload))
+                if payload['more']:
+                    continue
+            elif time.monotonic() - quiet_since >= ADMIN_STREAM_KEEPALIVE:
+                quiet_since = time.monotonic()
+                yield ': keepalive\n\n'
+            await asyncio.sleep(ADMIN_STREAM_POLL)
+    except Exception as e:
+        # the browser reconnects from the last id it saw
+        flask_app.logger.warning('Admin change stream failed: %s', e)
+
+
+async def admin_stream(scope, receive, send):
+    # recorded like Application.handle, but only once the stream has ended
+    stats = begin_request()
+    started = time.perf_counter()
+    status = 200
+    try:
+        status = await admin_stream_body(scope, receive, send)
+    finally:
+        observe_request(metrics_registry, 'admin_changes_stream', 'GET', status,
+                        time.perf_counter() - started, stats)
+        end_request()
+
+
+async def admin_stream_body(scope, receive, send):
+    request = Request(scope, b'')
+    if not await asyncio.to_thread(admin_session, request.header('cookie')):
+        await send_response(send, *json_response({'success': False, 'message': 'Unauthorized'}, 401))
+        return 401
+    try:
+        since = feed_since(request.header('last-event-id') or request.args.get('since'))
+    except ValueError as e:
+        await send_response(send, *json_response({'success': False, 'message': str(e)}, 400))
+        return 400
+
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'text/event-stream; charset=utf-8'), (b'cache-control', b'no-cache'),
+                            (b'x-accel-buffering', b'no')]})
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    events = admin_events(since)
+    try:
+        while True:
+            # stop as soon as the client goes, not at the next event
+            step = asyncio.ensure_future(events.__anext__())
+            await asyncio.wait((step, disconnected), return_when=asyncio.FIRST_COMPLETED)
+            if not step.done():
+                step.cancel()
+                return 200
+            try:
+                chunk = step.result()
+            except StopAsyncIteration:
+                break
+            await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    except OSError:
+        pass  # client went away mid-send
+    finally:
+        disconnected.cancel()
+    return 200
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+class Route:
+    def __init__(self, method, pattern, handler, concurrency, timeout):
+        self.method = method
+        self.pattern = re.compile(pattern)
+        self.handler = handler
+        self.endpoint = handler.__name__
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.slots = asyncio.Semaphore(concurrency)
+
+
+def build_routes(limits):
+    table = [
+        ('GET', r'^/api/body-parts$', get_body_parts),
+        ('GET', r'^/api/body-part/(?P<slug>[^/]+)$', get_body_part_info),
+        ('GET', r'^/api/health-tips$', get_health_tips),
+        ('GET', r'^/api/search$', search),
+        ('POST', r'^/api/symptom-check$', symptom_check),
+        ('POST', r'^/api/contact$', submit_contact),
+    ]
+    return [Route(method, pattern, handler, *limits[handler.__name__]) for method, pattern, handler in table]
+
+
+# ----- ASGI application -----
+
+class Application:
+    def __init__(self, wsgi_app, routes):
+        self.wsgi = WSGIMiddleware(wsgi_app, workers=WSGI_THREADS)
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http':
+            if scope['path'] == '/admin/changes/stream' and scope['method'] == 'GET':
+                return await admin_stream(scope, receive, send)
+            method = 'GET' if scope['method'] == 'HEAD' else scope['method']
+            for route in self.routes:
+                match = route.pattern.match(scope['path'])
+                if match and route.method == method:
+                    return await self.handle(route, match.groupdict(), scope, receive, send)
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # the async routes skip Flask's before_request hooks, so a
+                # worker that only serves them would never start these
+                if not SERVERLESS:
+                    snapshot_compiler.ensure_present()
+                counter_reconciler.ensure_started()
+                message_archive.ensure_started()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await db.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle(self, route, params, scope, receive, send):
+        stats = begin_request()
+        started = time.perf_counter()
+        try:
+            status, body, headers = await self.dispatch(route, params, scope, receive)
+        except Exception as e:
+            # mirrors the Flask routes' catch-all, logged like record_request_metrics does
+            flask_app.logger.error('%s %s failed: %s', scope['method'], scope['path'], e)
+            status, body, headers = json_response({'success': False, 'message': str(e)}, 500)
+        elapsed = time.perf_counter() - started
+        observe_request(metrics_registry, route.endpoint, scope['method'], status, elapsed, stats)
+        headers['Server-Timing'] = server_timing(stats, elapsed)
+        end_request()
+        if scope['method'] == 'HEAD':
+            headers['Content-Length'] = str(len(body))
+            body = b''
+        await send_response(send, status, body, headers)
+
+    async def dispatch(self, route, params, scope, receive):
+        try:
+            body = await asyncio.wait_for(read_body(receive), route.timeout)
+        except BodyTooLarge:
+            return json_response({'success': False, 'message': 'Request body too large'}, 413)
+        except asyncio.TimeoutError:
+            return json_response({'success': False, 'message': 'Request body timed out'}, 408)
+        try:
+            await asyncio.wait_for(route.slots.acquire(), QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return json_response({'success': False, 'message': 'Server busy, please try again'},
+                                 503, {'Retry-After': '1'})
+        try:
+            return await asyncio.wait_for(route.handler(Request(scope, body), **params), route.timeout)
+        except asyncio.TimeoutError:
+            return json_response({'success': False, 'message': 'Request timed out'}, 504)
+        finally:
+            route.slots.release()
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+async def read_body(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY:
+            raise BodyTooLarge()
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def send_response(send, status, body, headers):
+    if 'Content-Length' not in headers:
+        headers['Content-Length'] = str(len(body))
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers.items()]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+application = Application(flask_app, build_routes(route_limits(os.environ.get('ASYNC_ROUTE_LIMITS', ''))))
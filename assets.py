@@ -0,0 +1,330 @@
+# Hashed, minified and precompressed static assets.
+#
+# At startup (or with `flask build-assets`) each source file under static/ is
+# minified, named after the hash of its content (main.3f2a9c1b7d4e.js) and
+# written to static/dist together with .gz and .br siblings. A
+# manifest.json maps source names to hashed names. A hashed URL always serves
+# the same bytes, so it can be cached as immutable; a changed file gets a new
+# name, which the page picks up through the manifest.
+#
+# The minifiers only drop comments and redundant whitespace. They never rename
+# or reorder anything, so their output behaves exactly like the source.
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip siblings are written
+    brotli = None
+
+ASSETS = ('css/style.css', 'js/main.js')
+MIN_COMPRESS_SIZE = 512
+
+_hashed_re = re.compile(r'^(css|js)/[\w-]+\.[0-9a-f]{12}\.(css|js)$')
+
+
+# ----- minifiers -----
+
+_css_string_re = re.compile(r'''("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')''')
+_css_comment_re = re.compile(r'/\*.*?\*/', re.S)
+
+
+def minify_css(text):
+    parts = _css_string_re.split(_css_comment_re.sub('', text))
+    out = []
+    for i, part in enumerate(parts):
+        if i % 2:  # quoted string, keep as is
+            out.append(part)
+            continue
+        part = re.sub(r'\s+', ' ', part)
+        part = re.sub(r' ?([{};,>]) ?', r'\1', part)
+        part = re.sub(r': ', ':', part)
+        part = part.replace(';}', '}')
+        out.append(part)
+    return ''.join(out).strip()
+
+
+_ident_chars = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$')
+# A '/' after one of these (or at the start) begins a regex literal, not a division.
+_regex_prefix = set('(,=:[!&|?{};+-*%<>~^')
+
+
+def minify_js(text):
+    """Strip comments and collapse whitespace outside strings, template
+    literals and regex literals. Line breaks are kept (one per run) so
+    automatic semicolon insertion behaves as in the source."""
+    out = []
+    i, n = 0, len(text)
+    pending = ''      # whitespace seen since the last emitted token: '', ' ' or '\n'
+    templates = []    # brace depth for each open `${` in a template literal
+    last = ''         # last significant character emitted
+
+    def emit(chunk):
+        nonlocal pending, last
+        if pending and out:
+            if pending == '\n' or (last in _ident_chars and chunk[0] in _ident_chars) \
+                    or (last in '+-' and chunk[0] == last):
+                out.append(pending)
+        pending = ''
+        out.append(chunk)
+        last = chunk[-1]
+
+    def scan_template(i):
+        # from just after a backtick (or a closing `}` of ${...}) to the
+        # closing backtick or the next ${
+        start = i
+        while i < n:
+            c = text[i]
+            if c == '\\':
+                i += 2
+                continue
+            if c == '`':
+                return i + 1, text[start:i + 1], False
+            if c == '$' and text[i + 1:i + 2] == '{':
+                return i + 2, text[start:i + 2], True
+            i += 1
+        raise ValueError('Unterminated template literal')
+
+    while i < n:
+        c = text[i]
+        if c in ' \t\r\n':
+            if c == '\n':
+                pending = '\n'
+            elif not pending:
+                pending = ' '
+            i += 1
+        elif c == '/' and text[i + 1:i + 2] == '/':
+            j = text.find('\n', i)
+            i = n if j < 0 else j
+        elif c == '/' and text[i + 1:i + 2] == '*':
+            j = text.find('*/', i + 2)
+            if j < 0:
+                raise ValueError('Unterminated comment')
+            if not pending:
+                pending = ' '
+            i = j + 2
+        elif c in '\'"':
+            j = i + 1
+            while j < n and text[j] != c:
+                if text[j] == '\n':
+                    raise ValueError('Unterminated string literal')
+                j += 2 if text[j] == '\\' else 1
+            emit(text[i:j + 1])
+            i = j + 1
+        elif c == '/' and (not last or last in _regex_prefix or _ends_with_keyword(out)):
+            j, in_class = i + 1, False
+            while j < n:
+                ch = text[j]
+                if ch == '\\':
+                    j += 2
+                    continue
+                if ch == '[':
+                    in_class = True
+                elif ch == ']':
+                    in_class = False
+                elif ch == '/' and not in_class:
+                    break
+                elif ch == '\n':
+                    raise ValueError('Unterminated regex literal')
+                j += 1
+            j += 1
+            while j < n and text[j] in _ident_chars:
+                j += 1  # flags
+            emit(text[i:j])
+            i = j
+        elif c == '`':
+            i, chunk, opened = scan_template(i + 1)
+            emit('`' + chunk)
+            if opened:
+                templates.append(0)
+        elif c == '{' and templates:
+            templates[-1] += 1
+            emit(c)
+            i += 1
+        elif c == '}' and templates and templates[-1] == 0:
+            templates.pop()
+            i, chunk, opened = scan_template(i + 1)
+            pending = ''
+            out.append('}' + chunk)
+            last = chunk[-1] if chunk else '}'
+            if opened:
+                templates.append(0)
+        else:
+            if c == '}' and templates:
+                templates[-1] -= 1
+            j = i + 1
+            if c in _ident_chars:
+                while j < n and text[j] in _ident_chars:
+                    j += 1
+            emit(text[i:j])
+            i = j
+    return ''.join(out).strip() + '\n'
+
+
+def _ends_with_keyword(out):
+    tail = out[-1] if out else ''
+    return tail in ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'yield')
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+# ----- encoding negotiation -----
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def accepted_encodings(header):
+    """Parse Accept-Encoding into a set of codings with a non-zero q."""
+    accepted, rejected = set(), set()
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            (accepted if q > 0 else rejected).add(coding)
+    if '*' in accepted:
+        accepted.update(coding for coding, _ in ENCODINGS)
+    return accepted - rejected
+
+
+def compress(data, fast=False):
+    """Return {encoding: bytes} for identity plus every available coding.
+
+    `fast` trades a few percent of size for far less CPU (gzip 6, brotli 5),
+    for payloads built at request time rather than once per deploy.
+    """
+    variants = {'identity': data}
+    if len(data) >= MIN_COMPRESS_SIZE:
+        variants['gzip'] = gzip.compress(data, 6 if fast else 9, mtime=0)
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=5 if fast else 11)
+    return variants
+
+
+def pick_encoding(header, available):
+    accepted = accepted_encodings(header)
+    for coding, _ in ENCODINGS:
+        if coding in accepted and coding in available:
+            return coding
+    return 'identity'
+
+
+# ----- pipeline -----
+
+class AssetPipeline:
+    def __init__(self, static_dir, out_dir, assets=ASSETS):
+        self.static_dir = static_dir
+        self.out_dir = out_dir
+        self.assets = assets
+        self.manifest = {}
+        self.version = None
+        self._mtimes = None
+        self._lock = threading.Lock()
+
+    def _source_mtimes(self):
+        return tuple(os.path.getmtime(os.path.join(self.static_dir, name)) for name in self.assets)
+
+    def build(self):
+        """Minify, hash and compress every asset; returns the manifest.
+
+        Output names depend only on content, so running this again (or in
+        several workers at once) rewrites identical files.
+        """
+        with self._lock:
+            mtimes = self._source_mtimes()
+            manifest = {}
+            for name in self.assets:
+                with open(os.path.join(self.static_dir, name), encoding='utf-8') as f:
+                    source = f.read()
+                base, ext = os.path.splitext(name)
+                data = MINIFIERS.get(ext, lambda s: s)(source).encode('utf-8')
+                hashed = '%s.%s%s' % (base, hashlib.sha256(data).hexdigest()[:12], ext)
+                path = os.path.join(self.out_dir, hashed)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    for coding, blob in compress(data).items():
+                        _write_atomic(path + dict(ENCODINGS).get(coding, ''), blob)
+                manifest[name] = hashed
+            raw = json.dumps(manifest, sort_keys=True).encode('utf-8')
+            _write_atomic(os.path.join(self.out_dir, 'sources.json'),
+                          json.dumps(self._source_hashes(), sort_keys=True).encode('utf-8'))
+            _write_atomic(os.path.join(self.out_dir, 'manifest.json'), raw)
+            self.manifest = manifest
+            self.version = hashlib.sha256(raw).hexdigest()[:12]
+            self._mtimes = mtimes
+            return manifest
+
+    def _source_hashes(self):
+        hashes = {}
+        for name in self.assets:
+            with open(os.path.join(self.static_dir, name), 'rb') as f:
+                hashes[name] = hashlib.sha256(f.read()).hexdigest()[:12]
+        return hashes
+
+    def load(self):
+        """Use the manifest of an earlier build without building.
+
+        For read-only deployments. Without one, or when a source was edited
+        after that build (a committed static/dist left stale), pages link
+        the plain /static files.
+        """
+        try:
+            with open(os.path.join(self.out_dir, 'manifest.json'), 'rb') as f:
+                raw = f.read()
+            with open(os.path.join(self.out_dir, 'sources.json'), 'rb') as f:
+                sources = json.loads(f.read())
+        except FileNotFoundError:
+            return {}
+        if sources != self._source_hashes():
+            return {}
+        self.manifest = json.loads(raw)
+        self.version = hashlib.sha256(raw).hexdigest()[:12]
+        return self.manifest
+
+    def check(self):
+        # Development only: rebuild when a source file was edited.
+        if self._source_mtimes() != self._mtimes:
+            self.build()
+
+    def url(self, name):
+        hashed = self.manifest.get(name)
+        return '/assets/' + hashed if hashed else '/static/' + name
+
+    def resolve(self, hashed, accept_encoding):
+        """Return (directory, filename, encoding) for a hashed asset name.
+
+        Files from earlier builds are still served, so a page rendered before
+        a deploy can finish loading. Returns None for anything else.
+        """
+        if not _hashed_re.match(hashed):
+            return None
+        path = os.path.join(self.out_dir, hashed)
+        if not os.path.isfile(path):
+            return None
+        available = {coding for coding, suffix in ENCODINGS if os.path.exists(path + suffix)}
+        coding = pick_encoding(accept_encoding, available)
+        suffix = dict(ENCODINGS).get(coding, '')
+        return os.path.dirname(path), os.path.basename(path) + suffix, coding
+
+    def stats(self):
+        return {'version': self.version, 'assets': dict(self.manifest)}
+
+
+def _write_atomic(path, data):
+    tmp = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
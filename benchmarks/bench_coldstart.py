@@ -0,0 +1,120 @@
+"""Measure the serverless cold start: importing api/app.py plus the first request.
+
+Each run starts a fresh interpreter under `python -X importtime`, imports
+the Vercel entry point and sends one request through the Flask test client,
+the way a new function instance handles its first invocation:
+
+    python benchmarks/bench_coldstart.py --runs 10
+    python benchmarks/bench_coldstart.py --path /api/health-tips --max-import-ms 400
+
+Reports median and worst import time and first-request latency, then the
+modules app.py imports directly, ranked by cumulative import time from
+-X importtime, so a new heavy dependency shows up by name. Results go to a
+JSON file next to the load test results. With --max-import-ms the script
+exits 1 when the median import exceeds that budget, for CI. Requests that
+need MySQL use the DB_* environment variables as the app does.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from loadtest import RESULTS_DIR, git_commit  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter; prints one JSON line.
+CHILD = '''
+import importlib.util, json, sys, time
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location('vercel_entry', %(entry)r)
+entry = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(entry)
+imported = time.perf_counter()
+resp = entry.app.test_client().get(%(path)r)
+done = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'first_request_ms': (done - imported) * 1000,
+                  'status': resp.status_code}))
+'''
+
+
+def parse_importtime(stderr):
+    """{module: cumulative microseconds} for the top-level imports."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.startswith('  '):
+            continue  # nested: counted in its parent's cumulative time
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def run_once(path, env):
+    code = CHILD % {'entry': os.path.join(ROOT, 'api', 'app.py'), 'path': path}
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        raise SystemExit('Cold start run failed:\n' + proc.stderr[-2000:])
+    result = json.loads(lines[-1])
+    result['modules'] = parse_importtime(proc.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='Fresh interpreters to start')
+    parser.add_argument('--path', default='/', help='Path of the first request')
+    parser.add_argument('--top', type=int, default=15, help='Slowest top-level imports to list')
+    parser.add_argument('--max-import-ms', type=float, help='Exit 1 if the median import takes longer')
+    parser.add_argument('--out', help='Result file (default: benchmarks/results/<time>-coldstart-<commit>.json)')
+    args = parser.parse_args()
+
+    env = dict(os.environ, SERVERLESS='1', PYTHONDONTWRITEBYTECODE='1')
+    runs = [run_once(args.path, env) for _ in range(args.runs)]
+    imports = [r['import_ms'] for r in runs]
+    firsts = [r['first_request_ms'] for r in runs]
+    modules = {}
+    for r in runs:
+        for name, us in r['modules'].items():
+            modules.setdefault(name, []).append(us / 1000.0)
+    ranked = sorted(((statistics.median(v), name) for name, v in modules.items()), reverse=True)[:args.top]
+
+    print('%d runs, first request GET %s -> %s' % (len(runs), args.path,
+                                                    ' '.join(sorted({str(r['status']) for r in runs}))))
+    print('%-16s %10s %10s' % ('', 'median ms', 'max ms'))
+    print('%-16s %10.1f %10.1f' % ('import', statistics.median(imports), max(imports)))
+    print('%-16s %10.1f %10.1f' % ('first request', statistics.median(firsts), max(firsts)))
+    print('\nTop-level imports by cumulative time (median ms):')
+    for ms, name in ranked:
+        print('  %8.1f  %s' % (ms, name))
+
+    commit, dirty = git_commit()
+    out = args.out or os.path.join(RESULTS_DIR, '%s-coldstart-%s.json' % (
+        datetime.now().strftime('%Y%m%d-%H%M%S'), (commit or 'nogit')[:10]))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump({'commit': commit, 'dirty': dirty, 'python': platform.python_version(),
+                   'started': datetime.now().isoformat(timespec='seconds'),
+                   'settings': {k: v for k, v in vars(args).items() if k != 'out'},
+                   'import_ms': {'median': round(statistics.median(imports), 1), 'max': round(max(imports), 1)},
+                   'first_request_ms': {'median': round(statistics.median(firsts), 1), 'max': round(max(firsts), 1)},
+                   'modules_ms': {name: round(ms, 1) for ms, name in ranked},
+                   'runs': [{k: v for k, v in r.items() if k != 'modules'} for r in runs]}, f, indent=2)
+    print('Saved %s' % out)
+
+    if args.max_import_ms is not None and statistics.median(imports) > args.max_import_ms:
+        print('Median import %.1f ms is over the %.0f ms budget' % (statistics.median(imports), args.max_import_ms))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Compare the old GROUP_CONCAT string-splitting path with catalog.hydrate_illnesses.
+
+Runs entirely in memory: a replay cursor hands back the rows MySQL would
+return for each strategy, so the numbers measure Python-side assembly cost
+plus result transfer, not server time.
+
+    python benchmarks/bench_hydration.py --illnesses 500 --medicines 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from catalog import hydrate_illnesses  # noqa: E402
+
+GROUP_CONCAT_MAX_LEN = 1024
+
+
+def make_catalog(n_illnesses, n_medicines, seed=42):
+    rnd = random.Random(seed)
+    dosages = ['500mg twice daily', '200mg as needed', '1 tablet daily', '10ml three times daily']
+    illnesses = []
+    for i in range(1, n_illnesses + 1):
+        illnesses.append({
+            'id': i, 'body_part_id': 1, 'name': 'Illness %d' % i,
+            'description': 'Description of illness %d' % i,
+            'symptoms': '|'.join('Symptom %d' % rnd.randint(1, 400) for _ in range(5)),
+            'care_tips': '|'.join('Care tip %d' % rnd.randint(1, 200) for _ in range(4)),
+            'severity': rnd.choice(['mild', 'moderate', 'severe']), 'is_active': 1,
+        })
+    medicines = []
+    for m in range(1, n_medicines + 1):
+        medicines.append({
+            'id': m, 'illness_id': rnd.randint(1, n_illnesses), 'name': 'Medicine %d' % m,
+            'description': 'Medicine %d description. ' % m * rnd.randint(1, 6),
+            'dosage': rnd.choice(dosages),
+            'side_effects': 'Nausea, dizziness, headache. ' * rnd.randint(1, 8),
+            'image_path': None, 'is_otc': rnd.randint(0, 1),
+        })
+    return illnesses, medicines
+
+
+def group_concat(values, sep):
+    # MySQL semantics: DISTINCT per column, then truncate to group_concat_max_len
+    seen = []
+    for v in values:
+        if v is not None and v not in seen:
+            seen.append(v)
+    if not seen:
+        return None
+    return sep.join(seen)[:GROUP_CONCAT_MAX_LEN]
+
+
+def legacy_rows(illnesses, medicines):
+    by_ill = {}
+    for m in medicines:
+        by_ill.setdefault(m['illness_id'], []).append(m)
+    rows = []
+    for ill in illnesses:
+        meds = by_ill.get(ill['id'], [])
+        row = dict(ill)
+        row['medicine_names'] = group_concat([m['name'] for m in meds], '|')
+        row['medicine_descs'] = group_concat([m['description'] for m in meds], '||')
+        row['medicine_dosages'] = group_concat([m['dosage'] for m in meds], '||')
+        row['medicine_sides'] = group_concat([m['side_effects'] for m in meds], '||')
+        row['medicine_otc'] = group_concat([str(m['is_otc']) for m in meds], '|')
+        rows.append(row)
+    return rows
+
+
+def legacy_parse(illnesses):
+    # Verbatim copy of the pre-hydration parsing loop from app.py
+    for ill in illnesses:
+        medicines = []
+        if ill['medicine_names']:
+            names = ill['medicine_names'].split('|')
+            descs = ill['medicine_descs'].split('||') if ill['medicine_descs'] else []
+            dosages = ill['medicine_dosages'].split('||') if ill['medicine_dosages'] else []
+            sides = ill['medicine_sides'].split('||') if ill['medicine_sides'] else []
+            otcs = ill['medicine_otc'].split('|') if ill['medicine_otc'] else []
+            for i, name in enumerate(names):
+                if name:
+                    medicines.append({
+                        'name': name,
+                        'description': descs[i] if i < len(descs) else '',
+                        'dosage': dosages[i] if i < len(dosages) else '',
+                        'side_effects': sides[i] if i < len(sides) else '',
+                        'is_otc': otcs[i] == '1' if i < len(otcs) else False
+                    })
+        ill['medicines'] = medicines
+        ill['symptoms_list'] = ill['symptoms'].split('|') if ill['symptoms'] else []
+        ill['care_list'] = ill['care_tips'].split('|') if ill['care_tips'] else []
+        for k in ['medicine_names', 'medicine_descs', 'medicine_dosages', 'medicine_sides', 'medicine_otc']:
+            ill.pop(k, None)
+    return illnesses
+
+
+class ReplayCursor:
+    def __init__(self, medicines):
+        self.by_ill = {}
+        for m in medicines:
+            self.by_ill.setdefault(m['illness_id'], []).append(m)
+        self.rows = []
+        self.queries = 0
+
+    def execute(self, sql, params=()):
+        self.queries += 1
+        self.rows = [dict(m) for ill_id in params for m in self.by_ill.get(ill_id, [])]
+
+    def fetchall(self):
+        return self.rows
+
+
+def count_wrong(illnesses, medicines):
+    truth = {}
+    for m in medicines:
+        truth.setdefault(m['illness_id'], []).append(
+            (m['name'], m['description'], m['dosage'], m['side_effects'], bool(m['is_otc'])))
+    wrong = 0
+    for ill in illnesses:
+        got = sorted((m['name'], m['description'], m['dosage'], m['side_effects'], m['is_otc'])
+                     for m in ill['medicines'])
+        if got != sorted(truth.get(ill['id'], [])):
+            wrong += 1
+    return wrong
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--illnesses', type=int, default=500)
+    parser.add_argument('--medicines', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    illnesses, medicines = make_catalog(args.illnesses, args.medicines)
+    packed = legacy_rows(illnesses, medicines)
+    cursor = ReplayCursor(medicines)
+
+    legacy_time, legacy = best_of(lambda: legacy_parse([dict(r) for r in packed]), args.repeat)
+    hydrate_time, hydrated = best_of(
+        lambda: hydrate_illnesses(cursor, [dict(i) for i in illnesses]), args.repeat)
+
+    print('catalog: %d illnesses, %d medicines' % (args.illnesses, args.medicines))
+    print('%-22s %10s %16s' % ('path', 'best ms', 'wrong illnesses'))
+    print('%-22s %10.2f %16d' % ('group_concat split', legacy_time * 1000, count_wrong(legacy, medicines)))
+    print('%-22s %10.2f %16d' % ('batched hydration', hydrate_time * 1000, count_wrong(hydrated, medicines)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""Compare servers under many concurrent keep-alive clients.
+
+Opens --connections persistent HTTP/1.1 connections per target and sends
+requests back to back on each, cycling through the public catalog routes.
+Optional --slow-clients hold extra connections open by trickling their
+request headers a byte at a time, the way a phone on a bad network does.
+Under gunicorn's sync workers each of those pins a worker; under the ASGI
+entry point it only parks a coroutine.
+
+    gunicorn -w 4 -b 127.0.0.1:8000 app:app
+    uvicorn asgi:application --workers 4 --port 8001
+    python benchmarks/bench_keepalive.py --connections 500 --slow-clients 50 \\
+        --target sync=http://127.0.0.1:8000 --target async=http://127.0.0.1:8001
+
+Targets run one after another with the same settings. For each it reports
+requests/sec, p50/p95/p99 latency, errors and reconnects, and writes
+everything to a JSON file next to the load test results. Raise the open
+file limit first (ulimit -n 4096) for a few thousand connections.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from loadtest import RESULTS_DIR, git_commit, percentile  # noqa: E402
+
+PATHS = ['/api/body-parts', '/api/body-part/head', '/api/body-part/chest', '/api/health-tips',
+         '/api/search?q=pain', '/api/body-part/stomach', '/api/search?q=fever']
+
+
+class Target:
+    def __init__(self, name, url):
+        parts = urlsplit(url)
+        self.name = name
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.base = parts.path.rstrip('/')
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.reconnects = 0
+        self.recording = False
+
+    def add(self, status, elapsed):
+        if self.recording:
+            self.latencies.append(elapsed)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def error(self):
+        if self.recording:
+            self.errors += 1
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    keep_alive = headers.get('connection', '').lower() != 'close'
+    return status, keep_alive
+
+
+def request_bytes(target, path):
+    return ('GET %s%s HTTP/1.1\r\nHost: %s:%d\r\nAccept: application/json\r\n'
+            'Accept-Encoding: identity\r\n\r\n' % (target.base, path, target.host, target.port)).encode()
+
+
+async def client(target, stats, offset, stop_at, timeout):
+    i = offset
+    reader = writer = None
+    while time.monotonic() < stop_at:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(target.host, target.port), timeout)
+            started = time.perf_counter()
+            writer.write(request_bytes(target, PATHS[i % len(PATHS)]))
+            status, keep_alive = await asyncio.wait_for(read_response(reader), timeout)
+            stats.add(status, time.perf_counter() - started)
+            i += 1
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+            stats.error()
+            keep_alive = False
+            await asyncio.sleep(0.05)
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+            stats.reconnects += 1
+    if writer is not None:
+        writer.close()
+
+
+async def slow_client(target, stop_at, interval):
+    """Holds a connection by sending one header byte every `interval` seconds."""
+    while time.monotonic() < stop_at:
+        try:
+            reader, writer = await asyncio.open_connection(target.host, target.port)
+            for byte in request_bytes(target, PATHS[0]):
+                if time.monotonic() >= stop_at:
+                    break
+                writer.write(bytes([byte]))
+                await writer.drain()
+                await asyncio.sleep(interval)
+            writer.close()
+        except OSError:
+            await asyncio.sleep(interval)
+
+
+async def run_target(target, args):
+    stats = Stats()
+    now = time.monotonic()
+    stop_at = now + args.warmup + args.duration
+    tasks = [asyncio.create_task(slow_client(target, stop_at, args.slow_interval))
+             for _ in range(args.slow_clients)]
+    # stagger so the connections don't all send their first request together
+    for n in range(args.connections):
+        tasks.append(asyncio.create_task(client(target, stats, n, stop_at, args.timeout)))
+        if n % 50 == 49:
+            await asyncio.sleep(0.01)
+    await asyncio.sleep(max(0.0, now + args.warmup - time.monotonic()))
+    stats.recording = True
+    measured = time.monotonic()
+    await asyncio.sleep(max(0.0, stop_at - time.monotonic()))
+    stats.recording = False
+    measured = time.monotonic() - measured
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    lat = sorted(v * 1000 for v in stats.latencies)
+    ok = sum(n for status, n in stats.statuses.items() if status < 400)
+    return {
+        'url': target.url,
+        'requests': len(lat),
+        'rps': round(ok / measured, 1) if measured else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(lat, 0.50), 2) if lat else None,
+            'p95': round(percentile(lat, 0.95), 2) if lat else None,
+            'p99': round(percentile(lat, 0.99), 2) if lat else None,
+            'max': round(lat[-1], 2) if lat else None,
+        },
+        'statuses': {str(k): v for k, v in sorted(stats.statuses.items())},
+        'errors': stats.errors,
+        'reconnects': stats.reconnects,
+    }
+
+
+def print_report(results):
+    print('%-10s %10s %9s %9s %9s %9s %8s %10s  %s' % ('target', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms',
+                                                         'max ms', 'errors', 'reconnects', 'statuses'))
+    for name, r in results.items():
+        lat = r['latency_ms']
+        print('%-10s %10.1f %9s %9s %9s %9s %8d %10d  %s' % (
+            name, r['rps'], lat['p50'], lat['p95'], lat['p99'], lat['max'], r['errors'], r['reconnects'],
+            ' '.join('%s:%d' % item for item in r['statuses'].items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                        help='Server to test; repeat to compare (e.g. sync=http://127.0.0.1:8000)')
+    parser.add_argument('--connections', type=int, default=500, help='Keep-alive connections per target')
+    parser.add_argument('--slow-clients', type=int, default=0,
+                        help='Extra connections that trickle their request headers')
+    parser.add_argument('--slow-interval', type=float, default=1.0, help='Seconds between slow client bytes')
+    parser.add_argument('--duration', type=float, default=30, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds to run before measuring')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+    parser.add_argument('--out', help='Result file (default: benchmarks/results/<time>-keepalive-<commit>.json)')
+    args = parser.parse_args()
+
+    targets = []
+    for spec in args.target:
+        name, sep, url = spec.partition('=')
+        if not sep:
+            name, url = 'target%d' % (len(targets) + 1), spec
+        targets.append(Target(name, url))
+
+    results = {}
+    for target in targets:
+        print('Running %s (%s): %d connections, %d slow clients, %.0fs' % (
+            target.name, target.url, args.connections, args.slow_clients, args.duration))
+        results[target.name] = asyncio.run(run_target(target, args))
+    print_report(results)
+
+    commit, dirty = git_commit()
+    out = args.out or os.path.join(RESULTS_DIR, '%s-keepalive-%s.json' % (
+        datetime.now().strftime('%Y%m%d-%H%M%S'), (commit or 'nogit')[:10]))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump({'commit': commit, 'dirty': dirty, 'python': platform.python_version(),
+                   'started': datetime.now().isoformat(timespec='seconds'),
+                   'settings': {k: v for k, v in vars(args).items() if k not in ('out', 'target')},
+                   'targets': results}, f, indent=2)
+    print('Saved %s' % out)
+
+
+if __name__ == '__main__':
+    main()
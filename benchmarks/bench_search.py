@@ -0,0 +1,79 @@
+"""Measure /api/search index latency on a synthetic catalog.
+
+Builds a SearchIndex directly (no MySQL) with the requested number of
+illnesses, medicines and doctors, then times a mix of prefix and misspelled
+queries.
+
+    python benchmarks/bench_search.py --rows 50000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from search import SearchIndex  # noqa: E402
+
+SYLLABLES = [c + v for c in 'bcdfghklmnprstvz' for v in ['a', 'e', 'i', 'o', 'u', 'ar', 'en', 'is', 'ol', 'um']]
+SPECIALIZATIONS = ['Neurologist', 'Cardiologist', 'Orthopedic Surgeon', 'Gastroenterologist',
+                   'Pulmonologist', 'Rheumatologist', 'Podiatrist', 'Vascular Surgeon']
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+
+    def word():
+        return ''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4)))
+
+    n_ill, n_med = int(args.rows * 0.4), int(args.rows * 0.5)
+    n_doc = args.rows - n_ill - n_med
+    index = SearchIndex()
+    start = time.perf_counter()
+    for i in range(n_ill):
+        index.add_illness({'id': i, 'name': word() + ' ' + word(), 'severity': 'mild',
+                           'symptoms': '|'.join(word() for _ in range(4)), 'body_part': 'head'})
+    for i in range(n_med):
+        index.add_medicine({'id': i, 'name': word(), 'is_otc': 1,
+                            'illness_id': i % max(n_ill, 1), 'illness_name': ''})
+    for i in range(n_doc):
+        index.add_doctor({'id': i, 'name': 'Dr ' + word().title() + ' ' + word().title(),
+                          'specialization': rnd.choice(SPECIALIZATIONS)})
+    build = time.perf_counter() - start
+
+    queries = []
+    for _ in range(args.queries):
+        w = word()
+        if rnd.random() < 0.3 and len(w) > 4:
+            i = rnd.randrange(len(w))
+            w = w[:i] + w[i + 1:]  # drop a letter
+        else:
+            w = w[:rnd.randint(2, len(w))]
+        queries.append(w)
+
+    latencies = []
+    for q in queries:
+        t = time.perf_counter()
+        index.search(q)
+        latencies.append(time.perf_counter() - t)
+    latencies.sort()
+
+    print('rows: %d (build %.2fs)' % (args.rows, build))
+    print('queries: %d  p50 %.2fms  p95 %.2fms  p99 %.2fms  max %.2fms' % (
+        len(latencies), percentile(latencies, 0.5) * 1e3, percentile(latencies, 0.95) * 1e3,
+        percentile(latencies, 0.99) * 1e3, latencies[-1] * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Measure /api/symptom-check scoring latency on a synthetic catalog.
+
+    python benchmarks/bench_symptoms.py --illnesses 100000 --vocabulary 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from symptoms import SymptomEngine  # noqa: E402
+
+BODY_PARTS = ['head', 'neck', 'shoulders', 'chest', 'stomach', 'arms', 'back', 'knees', 'legs', 'feet']
+
+
+class ListCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql, params=()):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--illnesses', type=int, default=100000)
+    parser.add_argument('--vocabulary', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    vocab = ['symptom %d' % i for i in range(args.vocabulary)]
+    # Zipf-ish popularity so a few symptoms (fever, pain) are very common
+    weights = [1.0 / (i + 1) for i in range(args.vocabulary)]
+    rows = []
+    for i in range(args.illnesses):
+        picks = set(rnd.choices(vocab, weights=weights, k=rnd.randint(3, 8)))
+        part = rnd.randrange(len(BODY_PARTS))
+        rows.append({'id': i, 'name': 'Illness %d' % i, 'symptoms': '|'.join(picks),
+                     'severity': rnd.choice(['mild', 'moderate', 'severe']),
+                     'body_part_id': part + 1, 'body_part': BODY_PARTS[part]})
+
+    engine = SymptomEngine()
+    start = time.perf_counter()
+    engine.build(ListCursor(rows))
+    engine.score(['symptom 0'])
+    build = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(args.queries):
+        query = rnd.choices(vocab, weights=weights, k=rnd.randint(1, 6))
+        parts = rnd.sample(BODY_PARTS, 2) if rnd.random() < 0.3 else None
+        t = time.perf_counter()
+        engine.score(query, parts)
+        latencies.append(time.perf_counter() - t)
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e3
+
+    print('illnesses: %d, vocabulary: %d (build + compile %.2fs)' % (args.illnesses, args.vocabulary, build))
+    print('queries: %d  p50 %.2fms  p95 %.2fms  p99 %.2fms' % (len(latencies), pct(0.5), pct(0.95), pct(0.99)))
+
+
+if __name__ == '__main__':
+    main()
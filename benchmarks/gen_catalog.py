@@ -0,0 +1,215 @@
+"""Fill the database with a synthetic catalog at production scale.
+
+Rows follow schema.sql: illnesses spread over the seeded body parts with
+pipe-separated symptoms and care tips, medicines attached to those illnesses,
+doctors per body part, health tips and a backlog of contact messages. The
+same --seed always produces the same rows, so runs on different commits load
+identical data. Doctors are spread around the cities of data/gazetteer.csv,
+weighted by population, with coordinates, so the database needs migrations
+0003 and 0004 (flask --app app migrate). Dashboard counters are recounted and
+the catalog version bumped afterwards, so running workers drop their caches
+and clients holding a catalog bundle fetch it in full again.
+
+    python benchmarks/gen_catalog.py --illnesses 100000 --medicines 1000000 --messages 1000000
+
+Connects with DB_HOST, DB_USER, DB_PASSWORD and DB_NAME (defaults match
+app.py). --reset first deletes every illness, medicine, doctor, tip and
+message, including the seed rows.
+"""
+import argparse
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pymysql
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import changes  # noqa: E402
+import counters  # noqa: E402
+from geo import Gazetteer  # noqa: E402
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'gazetteer.csv')
+
+SYLLABLES = [c + v for c in 'bcdfghklmnprstvz' for v in ['a', 'e', 'i', 'o', 'u', 'ar', 'en', 'is', 'ol', 'um']]
+SPECIALIZATIONS = ['Neurologist', 'Cardiologist', 'Orthopedic Surgeon', 'Gastroenterologist',
+                   'Pulmonologist', 'Rheumatologist', 'Podiatrist', 'Vascular Surgeon',
+                   'Dermatologist', 'General Physician']
+SEVERITIES = ['mild'] * 5 + ['moderate'] * 3 + ['severe'] * 2
+DOSAGES = ['500mg twice daily', '200mg as needed', '1 tablet daily', '10ml three times daily',
+           '2 puffs every 4 hours', 'Apply thinly twice a day']
+TIP_CATEGORIES = ['home_care', 'medicine_safety', 'nutrition', 'fitness', 'mental_health']
+TIP_ICONS = ['💡', '💧', '🏃', '😴', '🥗', '💊', '🧘']
+
+
+class Generator:
+    def __init__(self, seed, symptom_vocabulary, cities):
+        self.rnd = random.Random(seed)
+        self.symptoms = [self.words(2) for _ in range(symptom_vocabulary)]
+        self.cities = cities
+        self.city_weights = list(itertools.accumulate(c.population for c in cities))
+
+    def word(self):
+        return ''.join(self.rnd.choice(SYLLABLES) for _ in range(self.rnd.randint(2, 4)))
+
+    def words(self, n):
+        return ' '.join(self.word() for _ in range(n)).capitalize()
+
+    def sentence(self, low, high):
+        return self.words(self.rnd.randint(low, high)) + '.'
+
+    def symptom(self):
+        # a few symptoms are very common, most are rare
+        i = min(int(self.rnd.paretovariate(1.2)) - 1, len(self.symptoms) - 1)
+        return self.symptoms[i if self.rnd.random() < 0.5 else self.rnd.randrange(len(self.symptoms))]
+
+    def illness(self, row_id, body_part_ids):
+        return (row_id, self.rnd.choice(body_part_ids), '%s %s' % (self.words(2), row_id),
+                ' '.join(self.sentence(6, 14) for _ in range(self.rnd.randint(1, 3))),
+                '|'.join(dict.fromkeys(self.symptom() for _ in range(self.rnd.randint(3, 8)))),
+                '|'.join(self.sentence(3, 8) for _ in range(self.rnd.randint(2, 5))),
+                self.rnd.choice(SEVERITIES), 1 if self.rnd.random() < 0.97 else 0)
+
+    def medicine(self, row_id, illness_ids):
+        return (row_id, self.rnd.randint(*illness_ids), '%s %d' % (self.word().capitalize(), row_id),
+                self.sentence(5, 20), self.rnd.choice(DOSAGES),
+                ', '.join(self.words(1).lower() for _ in range(self.rnd.randint(1, 6))),
+                self.rnd.randint(0, 1))
+
+    def doctor(self, row_id, body_part_ids):
+        first, last = self.word().capitalize(), self.word().capitalize()
+        city = self.rnd.choices(self.cities, cum_weights=self.city_weights)[0]
+        # practices scatter a few km around the city centre
+        lat = max(-90.0, min(90.0, city.latitude + self.rnd.gauss(0, 0.06)))
+        lon = city.longitude + self.rnd.gauss(0, 0.06) / max(math.cos(math.radians(lat)), 0.1)
+        lon = (lon + 180) % 360 - 180
+        return (row_id, self.rnd.choice(body_part_ids + [None]), 'Dr. %s %s' % (first, last),
+                self.rnd.choice(SPECIALIZATIONS), '%s Hospital' % self.words(1),
+                '+1-555-%04d' % self.rnd.randrange(10000), '%s.%s@example.com' % (first.lower(), row_id),
+                '%d %s Street, %s' % (self.rnd.randint(1, 999), self.words(1), city.name),
+                self.rnd.randint(1, 40), 1 if self.rnd.random() < 0.95 else 0,
+                round(lat, 6), round(lon, 6))
+
+    def tip(self, row_id):
+        return (row_id, self.rnd.choice(TIP_CATEGORIES), self.words(3), self.sentence(10, 30),
+                self.rnd.choice(TIP_ICONS), 1 if self.rnd.random() < 0.9 else 0, self.rnd.randint(0, 100))
+
+    def message(self, row_id, now):
+        # spread over two years; most of the older ones have been read
+        age = timedelta(seconds=self.rnd.randrange(2 * 365 * 24 * 3600))
+        name = self.words(2)
+        return (row_id, name, '%s%d@example.com' % (name.split()[0].lower(), row_id),
+                ' '.join(self.sentence(5, 25) for _ in range(self.rnd.randint(1, 4))),
+                0 if age.days < 14 and self.rnd.random() < 0.8 else int(self.rnd.random() < 0.9),
+                (now - age).strftime('%Y-%m-%d %H:%M:%S'))
+
+
+TABLES = [
+    # (name, columns, count arg)
+    ('illnesses', 'id, body_part_id, name, description, symptoms, care_tips, severity, is_active', 'illnesses'),
+    ('medicines', 'id, illness_id, name, description, dosage, side_effects, is_otc', 'medicines'),
+    ('doctors', 'id, body_part_id, name, specialization, hospital, phone, email, address, '
+                'experience_years, is_active, latitude, longitude', 'doctors'),
+    ('health_tips', 'id, category, title, description, icon, is_active, sort_order', 'tips'),
+    ('contact_messages', 'id, name, email, message, is_read, created_at', 'messages'),
+]
+
+
+def insert(conn, table, columns, rows, batch):
+    # pymysql rewrites executemany on INSERT ... VALUES into multi-row statements
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (table, columns, ', '.join(['%s'] * len(columns.split(','))))
+    done, chunk, started = 0, [], time.perf_counter()
+    with conn.cursor() as cursor:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == batch:
+                cursor.executemany(sql, chunk)
+                conn.commit()
+                done += len(chunk)
+                chunk = []
+                if done % (batch * 50) == 0:
+                    print('  %s: %d rows (%.0f rows/s)' % (table, done, done / (time.perf_counter() - started)))
+        if chunk:
+            cursor.executemany(sql, chunk)
+            conn.commit()
+            done += len(chunk)
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--illnesses', type=int, default=100000)
+    parser.add_argument('--medicines', type=int, default=1000000)
+    parser.add_argument('--doctors', type=int, default=20000)
+    parser.add_argument('--tips', type=int, default=500)
+    parser.add_argument('--messages', type=int, default=1000000)
+    parser.add_argument('--symptoms', type=int, default=5000, help='Size of the symptom vocabulary')
+    parser.add_argument('--batch', type=int, default=2000, help='Rows per INSERT')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='Delete existing catalog rows first')
+    args = parser.parse_args()
+
+    conn = pymysql.connect(
+        host=os.environ.get('DB_HOST', 'localhost'), user=os.environ.get('DB_USER', 'root'),
+        password=os.environ.get('DB_PASSWORD', 'root'), db=os.environ.get('DB_NAME', 'ai_doctor_db'),
+        charset='utf8mb4', cursorclass=pymysql.cursors.DictCursor)
+    cities = sorted({id(p): p for ps in Gazetteer.load(GAZETTEER_PATH).places.values() for p in ps}.values(),
+                    key=lambda p: (p.name, p.region))
+    gen = Generator(args.seed, args.symptoms, cities)
+    now = datetime.now().replace(microsecond=0)
+
+    with conn.cursor() as cursor:
+        if args.reset:
+            for table in ('medicines', 'illnesses', 'doctors', 'health_tips', 'contact_messages'):
+                print('Clearing %s' % table)
+                cursor.execute('DELETE FROM %s' % table)
+            conn.commit()
+        cursor.execute('SELECT id FROM body_parts ORDER BY id')
+        body_part_ids = [row['id'] for row in cursor.fetchall()]
+        if not body_part_ids:
+            sys.exit('No body parts found; load schema.sql first')
+        # explicit ids continue after existing rows so medicines can point at
+        # the illnesses generated here
+        first_ids = {}
+        for table, _, _ in TABLES:
+            cursor.execute('SELECT COALESCE(MAX(id), 0) + 1 AS next_id FROM %s' % table)
+            first_ids[table] = cursor.fetchone()['next_id']
+
+    first_illness = first_ids['illnesses']
+    illness_range = (first_illness, first_illness + args.illnesses - 1)
+    if args.medicines and not args.illnesses:
+        sys.exit('--medicines needs --illnesses > 0')
+    makers = {
+        'illnesses': lambda i: gen.illness(i, body_part_ids),
+        'medicines': lambda i: gen.medicine(i, illness_range),
+        'doctors': lambda i: gen.doctor(i, body_part_ids),
+        'health_tips': gen.tip,
+        'contact_messages': lambda i: gen.message(i, now),
+    }
+
+    started = time.perf_counter()
+    for table, columns, count_arg in TABLES:
+        count, first = getattr(args, count_arg), first_ids[table]
+        if not count:
+            continue
+        print('Generating %d %s' % (count, table))
+        rows = (makers[table](i) for i in range(first, first + count))
+        insert(conn, table, columns, rows, args.batch)
+
+    print('Recounting dashboard counters')
+    with conn.cursor() as cursor:
+        counters.reconcile(cursor)
+        cursor.execute('UPDATE catalog_version SET version = version + 1 WHERE id = 1')
+        cursor.execute('SELECT version FROM catalog_version WHERE id = 1')
+        changes.record(cursor, cursor.fetchone()['version'], [])
+    conn.commit()
+    conn.close()
+    print('Done in %.1fs' % (time.perf_counter() - started))
+
+
+if __name__ == '__main__':
+    main()
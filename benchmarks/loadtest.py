@@ -0,0 +1,556 @@
+"""Drive every public and admin route at a fixed concurrency and record latency.
+
+Each worker thread logs in as admin and then picks weighted scenarios
+(body part page, search, admin list pages, CRUD cycles...) until the run
+ends. Per route it reports throughput, p50/p95/p99 latency, status codes
+and the number of SQL statements per request, read from the Server-Timing
+header the app sets. Results go to a JSON file tagged with the git commit.
+Pass a previous file to --compare to see what moved.
+
+    # in-process: Flask test client against the database in app.py's DB_CONFIG
+    python benchmarks/loadtest.py --concurrency 8 --duration 30
+
+    # over HTTP against a running server (e.g. gunicorn -w 4 app:app)
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --concurrency 32 --writes
+
+    python benchmarks/loadtest.py --compare benchmarks/results/old.json
+
+In-process runs have no network or server overhead, and all threads share
+one interpreter, so use them to compare commits, not to size servers.
+--writes adds the admin CRUD routes, image uploads and contact submissions.
+Every row it creates is deleted again, but each submission adds a row to
+contact_messages. Over HTTP, the contact route answers 429 once
+CONTACT_RATE_BURST is used up. Streamed responses (exports, NDJSON lists)
+send their headers before they query, so they report 0 queries.
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+
+from images import is_content_id  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+_queries_re = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct))]
+
+
+# ----- clients -----
+
+class InProcessClient:
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        resp = self.client.open(path, method=method, data=body, headers=headers or {})
+        data = resp.get_data()
+        return resp.status_code, resp.headers.get('Server-Timing', ''), data
+
+
+class HttpClient:
+    """One keep-alive connection per worker; carries the session cookie."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port
+        self.https = parts.scheme == 'https'
+        self.cookie = None
+        self.conn = None
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self.conn = cls(self.host, self.port, timeout=60)
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        for attempt in (1, 2):
+            if self.conn is None:
+                self._connect()
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                resp = self.conn.getresponse()
+                data = resp.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # the server closed an idle keep-alive connection
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+        cookie = resp.getheader('Set-Cookie')
+        if cookie and cookie.startswith('session='):
+            self.cookie = cookie.split(';', 1)[0]
+        return resp.status, resp.getheader('Server-Timing') or '', data
+
+
+def json_body(data):
+    return json.dumps(data).encode('utf-8'), {'Content-Type': 'application/json'}
+
+
+def multipart_body(field, filename, content, content_type):
+    boundary = uuid.uuid4().hex
+    body = b''.join([
+        ('--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\n'
+         'Content-Type: %s\r\n\r\n' % (boundary, field, filename, content_type)).encode('utf-8'),
+        content, ('\r\n--%s--\r\n' % boundary).encode('utf-8'),
+    ])
+    return body, {'Content-Type': 'multipart/form-data; boundary=%s' % boundary}
+
+
+def png_bytes(rnd):
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    buf = io.BytesIO()
+    Image.new('RGB', (64, 64), tuple(rnd.randrange(256) for _ in range(3))).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+# ----- workload -----
+
+class Catalog:
+    """Ids, slugs and words sampled from the running app before the test."""
+
+    def __init__(self, client, admin_email, admin_password):
+        self.client = client
+        login(client, admin_email, admin_password)
+        self.slugs = [p['slug'] for p in self.get('/api/body-parts')]
+        self.body_part_ids = [p['id'] for p in self.get('/api/body-parts')]
+        self.symptoms, self.prefixes, self.media = set(), set(), set()
+        for slug in self.slugs:
+            for ill in self.get('/api/body-part/' + slug).get('illnesses', []):
+                self.symptoms.update(ill.get('symptoms_list') or [])
+                self.prefixes.add(ill['name'][:4].lower())
+                for med in ill.get('medicines', []):
+                    if is_content_id(med.get('image_path')):
+                        self.media.add(med['image_path'])
+        self.symptoms, self.prefixes, self.media = sorted(self.symptoms), sorted(self.prefixes), sorted(self.media)
+        self.illness_ids = [r['id'] for r in self.get('/admin/illnesses?limit=500')]
+        doctors = self.get('/admin/doctors?limit=500')
+        self.doctor_ids = [r['id'] for r in doctors]
+        # nearby searches start around located doctors (anywhere if none are)
+        self.locations = [(r['latitude'], r['longitude']) for r in doctors
+                          if r.get('latitude') is not None] or [(0.0, 0.0)]
+        self.medicine_ids = [r['id'] for r in self.get('/admin/medicines?limit=500')]
+        self.stats = self.get('/admin/stats')
+        _, _, html = client.request('GET', '/')
+        self.assets = sorted(set(re.findall(r'/assets/[\w./-]+', html.decode('utf-8', 'replace'))))
+
+    def get(self, path):
+        status, _, data = self.client.request('GET', path)
+        if status != 200:
+            sys.exit('Discovery request %s failed with %d: %s' % (path, status, data[:200]))
+        return json.loads(data)['data']
+
+
+def login(client, email, password):
+    body, headers = json_body({'email': email, 'password': password})
+    status, _, data = client.request('POST', '/admin/login', body, headers)
+    if status != 200 or not json.loads(data).get('success'):
+        sys.exit('Admin login failed: %s' % data[:200])
+
+
+class Worker:
+    def __init__(self, client, catalog, rnd, recorder):
+        self.client = client
+        self.catalog = catalog
+        self.rnd = rnd
+        self.recorder = recorder
+        self.bundle_version = None
+        self.change_seq = None
+
+    def call(self, route, method, path, body=None, headers=None):
+        started = time.perf_counter()
+        try:
+            status, timing, data = self.client.request(method, path, body, headers)
+        except Exception:
+            self.recorder(route, time.perf_counter() - started, 'error', None)
+            return None
+        m = _queries_re.search(timing)
+        self.recorder(route, time.perf_counter() - started, status, int(m.group(1)) if m else None)
+        if 200 <= status < 300 and data[:1] == b'{':
+            return json.loads(data)
+        return None
+
+    def send_json(self, route, method, path, data):
+        body, headers = json_body(data)
+        return self.call(route, method, path, body, headers)
+
+    # public
+    def home(self):
+        self.call('GET /', 'GET', '/', headers={'Accept-Encoding': 'br, gzip'})
+
+    def asset(self):
+        if self.catalog.assets:
+            self.call('GET /assets/<name>', 'GET', self.rnd.choice(self.catalog.assets),
+                      headers={'Accept-Encoding': 'br, gzip'})
+
+    def media(self):
+        if self.catalog.media:
+            self.call('GET /uploads/media/<id>/<name>', 'GET',
+                      '/uploads/media/%s/original' % self.rnd.choice(self.catalog.media))
+
+    def body_parts(self):
+        self.call('GET /api/body-parts', 'GET', '/api/body-parts')
+
+    def body_part(self):
+        self.call('GET /api/body-part/<slug>', 'GET', '/api/body-part/' + self.rnd.choice(self.catalog.slugs))
+
+    def health_tips(self):
+        self.call('GET /api/health-tips', 'GET', '/api/health-tips')
+
+    def catalog_bundle(self):
+        # mostly returning visitors bringing their copy up to date; the
+        # first call (uncompressed, to read the version) and one in ten
+        # after it are full downloads
+        if self.bundle_version is None:
+            data = self.call('GET /api/catalog', 'GET', '/api/catalog')
+        elif self.rnd.random() < 0.1:
+            data = self.call('GET /api/catalog', 'GET', '/api/catalog', headers={'Accept-Encoding': 'br, gzip'})
+        else:
+            data = self.call('GET /api/catalog?since', 'GET', '/api/catalog?since=%d' % self.bundle_version)
+        if data:
+            self.bundle_version = data['data']['version']
+
+    def search(self):
+        if self.catalog.prefixes:
+            prefix = self.rnd.choice(self.catalog.prefixes)[:self.rnd.randint(2, 4)]
+            self.call('GET /api/search', 'GET', '/api/search?' + urlencode({'q': prefix}))
+
+    def symptom_check(self):
+        if self.catalog.symptoms:
+            picked = self.rnd.sample(self.catalog.symptoms, min(len(self.catalog.symptoms), self.rnd.randint(1, 4)))
+            self.send_json('POST /api/symptom-check', 'POST', '/api/symptom-check', {'symptoms': picked})
+
+    def doctors_nearby(self):
+        lat, lon = self.rnd.choice(self.catalog.locations)
+        params = {'lat': round(lat + self.rnd.uniform(-0.2, 0.2), 4), 'lon': round(lon + self.rnd.uniform(-0.2, 0.2), 4),
+                  'k': self.rnd.choice([3, 5, 10])}
+        if self.rnd.random() < 0.7:
+            params['body_part'] = self.rnd.choice(self.catalog.slugs)
+        self.call('GET /api/doctors/nearby', 'GET', '/api/doctors/nearby?' + urlencode(params))
+
+    def contact(self):
+        n = self.rnd.randrange(10 ** 9)
+        self.send_json('POST /api/contact', 'POST', '/api/contact', {
+            'name': 'Load Test %d' % n, 'email': 'loadtest%d@example.com' % n,
+            'message': 'Synthetic message from benchmarks/loadtest.py'})
+
+    # admin reads
+    def admin_check(self):
+        self.call('GET /admin/check', 'GET', '/admin/check')
+
+    def admin_stats(self):
+        self.call('GET /admin/stats', 'GET', '/admin/stats')
+
+    def admin_list(self, name, filters=None):
+        route = 'GET /admin/%s' % name
+        query = dict(filters or {}, limit=50)
+        page = self.call(route, 'GET', '/admin/%s?%s' % (name, urlencode(query)))
+        if page and page.get('next') and self.rnd.random() < 0.5:
+            query['after'] = page['next']
+            self.call(route, 'GET', '/admin/%s?%s' % (name, urlencode(query)))
+
+    def admin_illnesses(self):
+        filters = {'body_part_id': self.rnd.choice(self.catalog.body_part_ids)} if self.rnd.random() < 0.5 else {}
+        self.admin_list('illnesses', filters)
+
+    def admin_doctors(self):
+        self.admin_list('doctors', {'is_active': 1})
+
+    def admin_medicines(self):
+        filters = {'illness_id': self.rnd.choice(self.catalog.illness_ids)} \
+            if self.catalog.illness_ids and self.rnd.random() < 0.5 else {}
+        self.admin_list('medicines', filters)
+
+    def admin_messages(self):
+        self.admin_list('messages', {'is_read': 0} if self.rnd.random() < 0.5 else {})
+
+    def admin_tips(self):
+        self.admin_list('tips')
+
+    def admin_changes(self):
+        # an open admin panel catching up on the change feed
+        path = '/admin/changes' if self.change_seq is None else '/admin/changes?since=%d' % self.change_seq
+        data = self.call('GET /admin/changes', 'GET', path)
+        if data:
+            self.change_seq = data['data']['seq']
+
+    def admin_small_reads(self):
+        path = self.rnd.choice(['/admin/body-parts', '/admin/illnesses-list', '/admin/db-pool',
+                                '/admin/contact-queue', '/admin/slow-queries', '/admin/metrics'])
+        self.call('GET ' + path, 'GET', path)
+
+    def admin_export(self):
+        self.call('GET /admin/export', 'GET', '/admin/export?entity=doctors&format=csv')
+
+    def admin_import_dry_run(self):
+        row = {'body_part': self.rnd.choice(self.catalog.slugs), 'name': 'Load test illness',
+               'description': 'Synthetic', 'symptoms': 'Headache', 'care_tips': 'Rest'}
+        self.call('POST /admin/import', 'POST', '/admin/import?entity=illnesses&format=jsonl&dry_run=1',
+                  json.dumps(row).encode('utf-8'), {'Content-Type': 'application/x-ndjson'})
+
+    # admin writes
+    def illness_cycle(self):
+        data = {'body_part_id': self.rnd.choice(self.catalog.body_part_ids), 'name': 'Load test illness',
+                'description': 'Synthetic', 'symptoms': 'Headache|Fever', 'care_tips': 'Rest|Fluids'}
+        created = self.send_json('POST /admin/illness', 'POST', '/admin/illness', data)
+        if not created:
+            return
+        path = '/admin/illness/%d' % created['id']
+        self.send_json('PUT /admin/illness/<id>', 'PUT', path, dict(data, severity='moderate'))
+        self.call('DELETE /admin/illness/<id>', 'DELETE', path)
+
+    def doctor_cycle(self):
+        data = {'body_part_id': self.rnd.choice(self.catalog.body_part_ids), 'name': 'Dr. Load Test',
+                'specialization': 'General Physician'}
+        created = self.send_json('POST /admin/doctor', 'POST', '/admin/doctor', data)
+        if not created:
+            return
+        path = '/admin/doctor/%d' % created['id']
+        self.send_json('PUT /admin/doctor/<id>', 'PUT', path, dict(data, experience_years=5))
+        self.call('DELETE /admin/doctor/<id>', 'DELETE', path)
+
+    def medicine_cycle(self):
+        if not self.catalog.illness_ids:
+            return
+        created = self.send_json('POST /admin/medicine', 'POST', '/admin/medicine', {
+            'illness_id': self.rnd.choice(self.catalog.illness_ids), 'name': 'Load test medicine',
+            'description': 'Synthetic'})
+        if not created:
+            return
+        image = png_bytes(self.rnd)
+        if image:
+            body, headers = multipart_body('image', 'loadtest.png', image, 'image/png')
+            self.call('POST /admin/medicine/upload-image/<id>', 'POST',
+                      '/admin/medicine/upload-image/%d' % created['id'], body, headers)
+        self.call('DELETE /admin/medicine/<id>', 'DELETE', '/admin/medicine/%d' % created['id'])
+
+    def tip_cycle(self):
+        # sort_order -1 puts it first in its category, so one short page finds it
+        self.send_json('POST /admin/tip', 'POST', '/admin/tip', {
+            'category': 'home_care', 'title': 'Load test tip', 'description': 'Synthetic', 'sort_order': -1})
+        tips = self.call('GET /admin/tips', 'GET', '/admin/tips?category=home_care&limit=20')
+        for tip in (tips or {}).get('data', []):
+            if tip['title'] == 'Load test tip':
+                self.call('DELETE /admin/tip/<id>', 'DELETE', '/admin/tip/%d' % tip['id'])
+                break
+
+    def mark_read(self):
+        page = self.call('GET /admin/messages', 'GET', '/admin/messages?is_read=0&limit=20')
+        if page and page['data']:
+            self.call('POST /admin/message/<id>/read', 'POST',
+                      '/admin/message/%d/read' % self.rnd.choice(page['data'])['id'])
+
+    def reconcile(self):
+        self.call('POST /admin/stats/reconcile', 'POST', '/admin/stats/reconcile')
+
+
+READ_MIX = [
+    # (scenario, weight): roughly what the site sees, public pages first
+    ('body_part', 30), ('body_parts', 10), ('health_tips', 10), ('search', 20), ('symptom_check', 8),
+    ('doctors_nearby', 6), ('catalog_bundle', 4),
+    ('home', 5), ('asset', 5), ('media', 2),
+    ('admin_check', 2), ('admin_stats', 2), ('admin_illnesses', 2), ('admin_doctors', 1),
+    ('admin_medicines', 1), ('admin_messages', 1), ('admin_tips', 1), ('admin_small_reads', 1),
+    ('admin_changes', 2),
+    ('admin_export', 0.2), ('admin_import_dry_run', 0.3),
+]
+WRITE_MIX = [
+    ('contact', 3), ('illness_cycle', 1), ('doctor_cycle', 1), ('medicine_cycle', 1),
+    ('tip_cycle', 0.5), ('mark_read', 1), ('reconcile', 0.05),
+]
+
+
+# ----- run -----
+
+class Recorder:
+    def __init__(self, record_after):
+        self.record_after = record_after
+        self.samples = []    # (route, seconds, status, queries); list.append is atomic
+
+    def __call__(self, route, seconds, status, queries):
+        if time.perf_counter() >= self.record_after:
+            self.samples.append((route, seconds, status, queries))
+
+
+def summarize(samples, elapsed):
+    routes = {}
+    for route, seconds, status, queries in samples:
+        r = routes.setdefault(route, {'latencies': [], 'statuses': {}, 'queries': []})
+        r['latencies'].append(seconds)
+        r['statuses'][str(status)] = r['statuses'].get(str(status), 0) + 1
+        if queries is not None:
+            r['queries'].append(queries)
+
+    def latency(values):
+        values = sorted(values)
+        return {'p50': percentile(values, 0.5) * 1e3, 'p95': percentile(values, 0.95) * 1e3,
+                'p99': percentile(values, 0.99) * 1e3, 'max': values[-1] * 1e3,
+                'mean': sum(values) / len(values) * 1e3}
+
+    def errors(statuses):
+        return sum(n for s, n in statuses.items() if s == 'error' or s >= '500')
+
+    result = {}
+    for route, r in sorted(routes.items()):
+        result[route] = {
+            'requests': len(r['latencies']), 'rps': len(r['latencies']) / elapsed,
+            'errors': errors(r['statuses']), 'statuses': r['statuses'],
+            'latency_ms': latency(r['latencies']),
+            'db_queries': {'mean': sum(r['queries']) / len(r['queries']), 'max': max(r['queries'])}
+            if r['queries'] else None,
+        }
+    all_latencies = [s[1] for s in samples]
+    totals = {'requests': len(samples), 'rps': len(samples) / elapsed,
+              'errors': sum(r['errors'] for r in result.values()),
+              'latency_ms': latency(all_latencies) if all_latencies else None}
+    return totals, result
+
+
+def git_commit():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                             cwd=ROOT, text=True).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def print_report(totals, routes):
+    print('%-42s %8s %8s %8s %8s %8s %6s %7s' % ('route', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms',
+                                                  'max ms', 'errors', 'queries'))
+    for route, r in routes.items():
+        lat = r['latency_ms']
+        queries = '%.1f' % r['db_queries']['mean'] if r['db_queries'] else '-'
+        print('%-42s %8.1f %8.2f %8.2f %8.2f %8.1f %6d %7s' % (
+            route[:42], r['rps'], lat['p50'], lat['p95'], lat['p99'], lat['max'], r['errors'], queries))
+    if totals['latency_ms']:
+        lat = totals['latency_ms']
+        print('\ntotal: %d requests, %.1f req/s, p50 %.2fms p95 %.2fms p99 %.2fms, %d errors' % (
+            totals['requests'], totals['rps'], lat['p50'], lat['p95'], lat['p99'], totals['errors']))
+
+
+def compare(old_path, new):
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    print('\nvs %s (%s)' % (old_path, (old['meta'].get('commit') or '?')[:10]))
+    print('%-42s %18s %20s %14s' % ('route', 'req/s', 'p95 ms', 'queries'))
+    for route, r in new['routes'].items():
+        before = old['routes'].get(route)
+        if not before:
+            print('%-42s %18s' % (route[:42], 'new'))
+            continue
+        p95_old, p95_new = before['latency_ms']['p95'], r['latency_ms']['p95']
+        q_old = before['db_queries']['mean'] if before['db_queries'] else None
+        q_new = r['db_queries']['mean'] if r['db_queries'] else None
+        print('%-42s %8.1f -> %7.1f %8.2f -> %7.2f%s %5s -> %5s' % (
+            route[:42], before['rps'], r['rps'], p95_old, p95_new,
+            ' !' if p95_old and p95_new > p95_old * 1.2 else '  ',
+            '-' if q_old is None else '%.1f' % q_old, '-' if q_new is None else '%.1f' % q_new))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Base URL of a running server (default: in-process test client)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds to run before measuring')
+    parser.add_argument('--writes', action='store_true', help='Include admin writes and contact submissions')
+    parser.add_argument('--only', help='Regex; run only scenarios whose name matches')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--admin-email', default='admin@gmail.com')
+    parser.add_argument('--admin-password', default='admin123')
+    parser.add_argument('--out', help='Result file (default: benchmarks/results/<time>-<commit>.json)')
+    parser.add_argument('--compare', help='Earlier result file to compare against')
+    args = parser.parse_args()
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+    else:
+        # the rate limiter would otherwise reject nearly every contact submission
+        os.environ.setdefault('CONTACT_RATE_BURST', '1000000000')
+        from app import app as flask_app
+        make_client = lambda: InProcessClient(flask_app)
+
+    catalog = Catalog(make_client(), args.admin_email, args.admin_password)
+    mix = READ_MIX + (WRITE_MIX if args.writes else [])
+    if args.only:
+        mix = [(name, w) for name, w in mix if re.search(args.only, name)]
+    if not mix:
+        sys.exit('No scenarios selected')
+    names, weights = [m[0] for m in mix], [m[1] for m in mix]
+
+    started = time.perf_counter()
+    recorder = Recorder(started + args.warmup)
+    deadline = started + args.warmup + args.duration
+
+    def run(worker_seed):
+        client = make_client()
+        login(client, args.admin_email, args.admin_password)
+        rnd = random.Random(worker_seed)
+        worker = Worker(client, catalog, rnd, recorder)
+        while time.perf_counter() < deadline:
+            getattr(worker, rnd.choices(names, weights)[0])()
+
+    print('%d workers, %.0fs warmup + %.0fs measured against %s' % (
+        args.concurrency, args.warmup, args.duration, args.url or 'in-process app'))
+    threads = [threading.Thread(target=run, args=(args.seed * 1000 + i,), daemon=True)
+               for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - recorder.record_after
+
+    totals, routes = summarize(recorder.samples, elapsed)
+    commit, dirty = git_commit()
+    result = {
+        'meta': {
+            'commit': commit, 'dirty': dirty, 'started_at': datetime.now().isoformat(timespec='seconds'),
+            'target': args.url or 'in-process', 'concurrency': args.concurrency,
+            'duration': args.duration, 'warmup': args.warmup, 'writes': args.writes,
+            'only': args.only, 'seed': args.seed, 'python': platform.python_version(),
+        },
+        'catalog': catalog.stats,
+        'totals': totals,
+        'routes': routes,
+    }
+    print_report(totals, routes)
+
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, '%s-%s.json' % (
+            datetime.now().strftime('%Y%m%d-%H%M%S'), (commit or 'nogit')[:10]))
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+    print('\nResults written to %s' % out)
+    if args.compare:
+        compare(args.compare, result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict
+
+VERSION_SQL = "SELECT version FROM catalog_version WHERE id = 1"
+
+
+class CatalogCache:
+    """In-process cache of assembled catalog payloads.
+
+    Every entry is tagged with the catalog version it was built from. The
+    version lives in the `catalog_version` row in MySQL and is bumped by each
+    admin write inside the writer's transaction, so every worker sees the
+    change on its next version check (at most once per `check_interval`).
+    """
+
+    def __init__(self, get_db, max_entries=256, ttl=300, check_interval=1.0):
+        self.get_db = get_db
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def version(self):
+        if not self.stale():
+            return self._version
+        with self.get_db() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(VERSION_SQL)
+                row = cursor.fetchone()
+        return self.observe(row['version'] if row else 0)
+
+    def stale(self):
+        """True when the version is due for a re-check."""
+        return self._version is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    def observe(self, version):
+        """Record a freshly read catalog version (from version() or an async reader)."""
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+            self._version = version
+            self._checked_at = time.monotonic()
+        return version
+
+    def get(self, key, loader):
+        """Return (body, version) for `key`, building it with `loader()` on a miss.
+
+        `loader` returns the serialized payload, or None when there is nothing
+        to serve (None is not cached).
+        """
+        version = self.version()
+        body = self.lookup(key, version)
+        if body is not None:
+            return body, version
+        body = loader()
+        if body is None:
+            return None, version
+        self.store(key, version, body)
+        return body, version
+
+    def lookup(self, key, version):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        return None
+
+    def store(self, key, version, body):
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = (version, time.monotonic() + self.ttl, body)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def bump(self, cursor):
+        # Runs inside the caller's transaction so the bump commits (or rolls
+        # back) together with the write it describes, and returns the new
+        # version. Call invalidate() once the transaction has committed.
+        cursor.execute("UPDATE catalog_version SET version = version + 1 WHERE id = 1")
+        cursor.execute(VERSION_SQL)
+        return cursor.fetchone()['version']
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._checked_at = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {'version': self._version, 'entries': len(self._entries),
+                    'hits': self.hits, 'misses': self.misses}
+
+
+class IndexManager:
+    """Owns one per-worker in-memory index and keeps it in step with the catalog.
+
+    `factory()` returns an empty index with `build(cursor)` and
+    `refresh(cursor, kind, doc_id)` methods. Writes made in this worker are
+    patched in place. If the catalog version moves because of another worker,
+    a fresh index is built in a background thread and swapped in, and the
+    old one keeps serving until then.
+    """
+
+    def __init__(self, factory, get_db, current_version, name='index'):
+        self.factory = factory
+        self.get_db = get_db
+        self.current_version = current_version
+        self.name = name
+        self._lock = threading.Lock()
+        self._built = threading.Condition(self._lock)
+        self._index = None
+        self._version = None
+        self._building = False
+
+    def _build(self):
+        try:
+            version = self.current_version()
+            index = self.factory()
+            with self.get_db() as conn:
+                with conn.cursor() as cursor:
+                    index.build(cursor)
+            with self._lock:
+                self._index, self._version = index, version
+            return index
+        finally:
+            with self._lock:
+                self._building = False
+                self._built.notify_all()
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._build, name=self.name + '-rebuild', daemon=True).start()
+
+    def index(self):
+        if self._index is None:
+            with self._lock:
+                while self._building:
+                    self._built.wait()
+                if self._index is None:
+                    self._building = True
+            if self._index is None:
+                return self._build()
+        if self.current_version() != self._version:
+            self._rebuild_in_background()
+        return self._index
+
+    def refresh(self, kind, doc_id, version):
+        # `version` is the catalog version our own write produced. If the
+        # index was exactly one step behind, patching it brings it current;
+        # otherwise someone else wrote too and a rebuild will catch up.
+        with self._lock:
+            index = self._index
+            in_step = index is not None and self._version == version - 1
+        if not in_step:
+            return
+        with self.get_db() as conn:
+            with conn.cursor() as cursor:
+                index.refresh(cursor, kind, doc_id)
+        with self._lock:
+            if self._index is index and self._version == version - 1:
+                self._version = version
+
+    def stats(self):
+        index = self._index
+        data = index.stats() if index is not None else {}
+        return dict(data, version=self._version, building=self._building)
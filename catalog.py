@@ -0,0 +1,177 @@
+# Assembles the nested body-part payload (part -> illnesses -> medicines, plus
+# doctors) from flat rows. Medicines are fetched for all illnesses at once with
+# `illness_id IN (...)` batches instead of being packed into GROUP_CONCAT
+# strings, so long text is never truncated and columns can't drift apart.
+
+MEDICINE_BATCH_SIZE = 1000
+
+MEDICINE_COLUMNS = 'id, illness_id, name, description, dosage, side_effects, image_path, is_otc'
+
+# Served by idx_illnesses_part_active (migrations/0002); InnoDB appends the
+# primary key to secondary indexes, so ORDER BY id needs no sort.
+PART_ILLNESSES_SQL = """
+    SELECT * FROM illnesses
+    WHERE body_part_id = %s AND is_active = 1
+    ORDER BY id"""
+
+# The top three doctors for a part, general practitioners (no body part)
+# included. Written as two index range scans on idx_doctors_part_active_exp,
+# each already ordered by experience, so only the at most six merged rows
+# are sorted; `(body_part_id = %s OR body_part_id IS NULL)` would sort every
+# matching doctor.
+PART_DOCTORS_SQL = """
+    (SELECT * FROM doctors WHERE body_part_id = %s AND is_active = 1
+     ORDER BY experience_years DESC LIMIT 3)
+    UNION ALL
+    (SELECT * FROM doctors WHERE body_part_id IS NULL AND is_active = 1
+     ORDER BY experience_years DESC LIMIT 3)
+    ORDER BY experience_years DESC LIMIT 3"""
+
+# Served by idx_health_tips_active_order.
+HEALTH_TIPS_SQL = """
+    SELECT * FROM health_tips WHERE is_active = 1
+    ORDER BY category, sort_order"""
+
+PART_BY_SLUG_SQL = "SELECT * FROM body_parts WHERE slug = %s"
+ALL_PARTS_SQL = "SELECT * FROM body_parts ORDER BY id"
+PARTS_BY_ID_SQL = "SELECT * FROM body_parts WHERE id IN ({}) ORDER BY id"
+
+# `{}` takes one placeholder per id. Served by idx_medicines_illness
+# (migrations/0007), which with the appended primary key is already in
+# (illness_id, id) order.
+MEDICINES_SQL = "SELECT " + MEDICINE_COLUMNS + " FROM medicines WHERE illness_id IN ({}) ORDER BY illness_id, id"
+
+# Served by idx_illnesses_part_active; ordering by its columns, the constant
+# is_active included, lets the range scan return rows already sorted.
+BUNDLE_ILLNESSES_SQL = """
+    SELECT * FROM illnesses WHERE body_part_id IN ({}) AND is_active = 1
+    ORDER BY body_part_id, is_active, id"""
+
+
+def split_list(value):
+    return value.split('|') if value else []
+
+
+def placeholders(n):
+    return ', '.join(['%s'] * n)
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def fetch_medicines(cursor, illness_ids, batch_size=MEDICINE_BATCH_SIZE):
+    return run_queries(cursor, medicine_queries(illness_ids, batch_size))
+
+
+def hydrate_illnesses(cursor, illnesses, batch_size=MEDICINE_BATCH_SIZE):
+    return run_queries(cursor, hydrate_queries(illnesses, batch_size))
+
+
+def build_body_part(cursor, slug):
+    return run_queries(cursor, body_part_queries(slug))
+
+
+# The builders below don't touch a cursor themselves. They are generators
+# that yield (sql, params) and are sent back the fetched rows, so the same
+# assembly code runs on a PyMySQL cursor (run_queries) or an async driver.
+
+def run_queries(cursor, queries):
+    try:
+        query = next(queries)
+        while True:
+            cursor.execute(*query)
+            query = queries.send(list(cursor.fetchall()))
+    except StopIteration as done:
+        return done.value
+
+
+def medicine_queries(illness_ids, batch_size=MEDICINE_BATCH_SIZE):
+    rows = []
+    for chunk in chunked(illness_ids, batch_size):
+        rows.extend((yield (MEDICINES_SQL.format(placeholders(len(chunk))), tuple(chunk))))
+    return rows
+
+
+def hydrate_queries(illnesses, batch_size=MEDICINE_BATCH_SIZE):
+    by_id = {}
+    for ill in illnesses:
+        ill['medicines'] = []
+        ill['symptoms_list'] = split_list(ill.get('symptoms'))
+        ill['care_list'] = split_list(ill.get('care_tips'))
+        by_id[ill['id']] = ill
+    if not by_id:
+        return illnesses
+
+    for med in (yield from medicine_queries(list(by_id), batch_size)):
+        owner = by_id.get(med.pop('illness_id'))
+        if owner is None:
+            continue
+        med['description'] = med['description'] or ''
+        med['dosage'] = med['dosage'] or ''
+        med['side_effects'] = med['side_effects'] or ''
+        med['is_otc'] = bool(med['is_otc'])
+        owner['medicines'].append(med)
+    return illnesses
+
+
+def body_part_queries(slug):
+    parts = yield (PART_BY_SLUG_SQL, (slug,))
+    if not parts:
+        return None
+    part = parts[0]
+
+    illnesses = yield (PART_ILLNESSES_SQL, (part['id'],))
+    illnesses = yield from hydrate_queries(illnesses)
+
+    doctors = yield (PART_DOCTORS_SQL, (part['id'],))
+
+    return {'part': part, 'illnesses': illnesses, 'doctors': doctors}
+
+
+def body_parts_queries():
+    return (yield (ALL_PARTS_SQL, ()))
+
+
+def health_tips_queries():
+    return group_health_tips((yield (HEALTH_TIPS_SQL, ())))
+
+
+def group_health_tips(tips):
+    grouped = {}
+    for tip in tips:
+        grouped.setdefault(tip['category'], []).append(tip)
+    return grouped
+
+
+def bundle_queries(part_ids=None, tips=True):
+    """Every body part page (or just those in `part_ids`) plus the health tips.
+
+    Each page is exactly what body_part_queries returns for its slug. The
+    illnesses of all requested parts come from one query and their medicines
+    from the usual batches; only the top-doctor lists are fetched per part.
+    """
+    bundle = {'parts': []}
+    if part_ids is None:
+        parts = yield (ALL_PARTS_SQL, ())
+    elif part_ids:
+        ids = sorted(part_ids)
+        parts = yield (PARTS_BY_ID_SQL.format(placeholders(len(ids))), tuple(ids))
+    else:
+        parts = []
+
+    if parts:
+        ids = [part['id'] for part in parts]
+        illnesses = yield (BUNDLE_ILLNESSES_SQL.format(placeholders(len(ids))), tuple(ids))
+        illnesses = yield from hydrate_queries(illnesses)
+        by_part = {}
+        for ill in illnesses:
+            by_part.setdefault(ill['body_part_id'], []).append(ill)
+        for part in parts:
+            doctors = yield (PART_DOCTORS_SQL, (part['id'],))
+            bundle['parts'].append({'part': part, 'illnesses': by_part.get(part['id'], []), 'doctors': doctors})
+
+    if tips:
+        bundle['tips'] = yield from health_tips_queries()
+    return bundle
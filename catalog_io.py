@@ -0,0 +1,330 @@
+# Bulk catalog import/export for illnesses, medicines and doctors.
+#
+# Import reads CSV or JSONL as a stream and validates each row against the
+# constraints in schema.sql. It resolves `body_part` slugs and illness names
+# to ids through in-memory maps, then writes chunked executemany batches
+# inside the caller's transaction. A row whose natural key already exists
+# (or that carries an explicit `id`) updates that row; anything else is
+# inserted. Any invalid row fails the whole import, so a load never leaves
+# partial state behind. Given a `locate` function (the gazetteer's), a doctor
+# import looks up coordinates for new rows and changed addresses; an address
+# it can't place keeps the coordinates the row had.
+#
+# Export streams rows from an unbuffered cursor in the same shape the
+# importer accepts, so an export can be edited and re-imported.
+
+import csv
+import io
+import json
+
+import pymysql
+
+BATCH_SIZE = 500
+MAX_ERRORS = 100
+FORMATS = ('csv', 'jsonl')
+
+
+class CatalogIOError(Exception):
+    pass
+
+
+class ImportFailed(Exception):
+    def __init__(self, report):
+        Exception.__init__(self, 'Import failed with %d invalid row(s)' % len(report['errors']))
+        self.report = report
+
+
+class Field:
+    def __init__(self, name, kind='str', required=False, max_len=None, choices=None, default=None):
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.max_len = max_len
+        self.choices = choices
+        self.default = default
+
+    def clean(self, value):
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            if self.required:
+                raise ValueError('%s is required' % self.name)
+            return self.default
+        if self.kind == 'int':
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError('%s must be an integer' % self.name)
+            if value < 0:
+                raise ValueError('%s must not be negative' % self.name)
+            return value
+        if self.kind == 'bool':
+            text = str(value).lower()
+            if text in ('1', 'true', 'yes', 'y'):
+                return 1
+            if text in ('0', 'false', 'no', 'n'):
+                return 0
+            raise ValueError('%s must be 0/1 or true/false' % self.name)
+        value = str(value)
+        if self.choices and value not in self.choices:
+            raise ValueError('%s must be one of %s' % (self.name, ', '.join(self.choices)))
+        if self.max_len and len(value) > self.max_len:
+            raise ValueError('%s is longer than %d characters' % (self.name, self.max_len))
+        return value
+
+
+# Column definitions mirror schema.sql. `ref` fields are resolved to ids.
+ENTITIES = {
+    'illnesses': {
+        'table': 'illnesses',
+        'fields': [
+            Field('name', required=True, max_len=200),
+            Field('description', required=True),
+            Field('symptoms', required=True),
+            Field('care_tips', required=True),
+            Field('severity', choices=('mild', 'moderate', 'severe'), default='mild'),
+            Field('is_active', 'bool', default=1),
+        ],
+        'ref': 'body_part',
+        'ref_column': 'body_part_id',
+        'ref_required': True,
+        'natural_key': ('body_part_id', 'name'),
+        'export_sql': """
+            SELECT i.id, bp.slug AS body_part, i.name, i.description, i.symptoms,
+                   i.care_tips, i.severity, i.is_active
+            FROM illnesses i JOIN body_parts bp ON bp.id = i.body_part_id
+            ORDER BY i.id""",
+    },
+    'medicines': {
+        'table': 'medicines',
+        'fields': [
+            Field('name', required=True, max_len=200),
+            Field('description', required=True),
+            Field('dosage', max_len=255, default=''),
+            Field('side_effects', default=''),
+            Field('is_otc', 'bool', default=0),
+        ],
+        'ref': 'illness',
+        'ref_column': 'illness_id',
+        'ref_required': True,
+        'natural_key': ('illness_id', 'name'),
+        'export_sql': """
+            SELECT m.id, m.illness_id, i.name AS illness, m.name, m.description,
+                   m.dosage, m.side_effects, m.is_otc
+            FROM medicines m JOIN illnesses i ON i.id = m.illness_id
+            ORDER BY m.id""",
+    },
+    'doctors': {
+        'table': 'doctors',
+        'fields': [
+            Field('name', required=True, max_len=200),
+            Field('specialization', required=True, max_len=200),
+            Field('hospital', max_len=300, default=''),
+            Field('phone', max_len=50, default=''),
+            Field('email', max_len=255, default=''),
+            Field('address', default=''),
+            Field('experience_years', 'int', default=0),
+            Field('is_active', 'bool', default=1),
+        ],
+        'ref': 'body_part',
+        'ref_column': 'body_part_id',
+        'ref_required': False,
+        'natural_key': ('name', 'specialization'),
+        'geocode': True,
+        'export_sql': """
+            SELECT d.id, bp.slug AS body_part, d.name, d.specialization, d.hospital,
+                   d.phone, d.email, d.address, d.experience_years, d.is_active
+            FROM doctors d LEFT JOIN body_parts bp ON bp.id = d.body_part_id
+            ORDER BY d.id""",
+    },
+}
+
+
+def read_rows(stream, fmt):
+    """Yield dict rows from a binary or text stream without loading it whole."""
+    if fmt not in FORMATS:
+        raise CatalogIOError('Unsupported format: %s' % fmt)
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield row
+        return
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            raise CatalogIOError('Line %d is not valid JSON' % line_no)
+        if not isinstance(row, dict):
+            raise CatalogIOError('Line %d is not a JSON object' % line_no)
+        yield row
+
+
+class Importer:
+    def __init__(self, cursor, entity, batch_size=BATCH_SIZE, locate=None):
+        if entity not in ENTITIES:
+            raise CatalogIOError('Unknown entity: %s' % entity)
+        self.cursor = cursor
+        self.entity = entity
+        self.spec = ENTITIES[entity]
+        self.batch_size = batch_size
+        # locate(address) -> place with .latitude/.longitude, or None
+        self.locate = locate if self.spec.get('geocode') else None
+        self._load_maps()
+
+    def _load_maps(self):
+        cursor = self.cursor
+        if self.spec['ref'] == 'body_part':
+            cursor.execute("SELECT id, slug FROM body_parts")
+            self.refs = {row['slug']: row['id'] for row in cursor.fetchall()}
+            self.ref_ids = set(self.refs.values())
+            self.ambiguous = set()
+        else:
+            cursor.execute("SELECT id, name FROM illnesses")
+            self.refs, self.ambiguous = {}, set()
+            for row in cursor.fetchall():
+                if row['name'] in self.refs:
+                    self.ambiguous.add(row['name'])
+                self.refs[row['name']] = row['id']
+            cursor.execute("SELECT id FROM illnesses")
+            self.ref_ids = {row['id'] for row in cursor.fetchall()}
+
+        key = self.spec['natural_key']
+        cursor.execute("SELECT id, %s FROM %s" % (', '.join(key), self.spec['table']))
+        self.existing = {tuple(row[k] for k in key): row['id'] for row in cursor.fetchall()}
+        cursor.execute("SELECT id FROM %s" % self.spec['table'])
+        self.existing_ids = {row['id'] for row in cursor.fetchall()}
+        if self.locate:
+            cursor.execute("SELECT id, address FROM %s" % self.spec['table'])
+            self.addresses = {row['id']: row['address'] for row in cursor.fetchall()}
+
+    def _resolve_ref(self, row):
+        spec = self.spec
+        ref_id = row.get(spec['ref_column'])
+        if ref_id not in (None, ''):
+            try:
+                ref_id = int(ref_id)
+            except (TypeError, ValueError):
+                raise ValueError('%s must be an integer' % spec['ref_column'])
+            if ref_id not in self.ref_ids:
+                raise ValueError('%s %d does not exist' % (spec['ref_column'], ref_id))
+            return ref_id
+        name = (row.get(spec['ref']) or '').strip()
+        if not name:
+            if spec['ref_required']:
+                raise ValueError('%s or %s is required' % (spec['ref'], spec['ref_column']))
+            return None
+        if spec['ref'] == 'illness' and name in self.ambiguous:
+            raise ValueError('illness "%s" is ambiguous, use illness_id' % name)
+        if name not in self.refs:
+            raise ValueError('unknown %s "%s"' % (spec['ref'], name))
+        return self.refs[name]
+
+    def clean(self, row):
+        values = {self.spec['ref_column']: self._resolve_ref(row)}
+        for field in self.spec['fields']:
+            values[field.name] = field.clean(row.get(field.name))
+        row_id = row.get('id')
+        if row_id not in (None, ''):
+            try:
+                row_id = int(row_id)
+            except (TypeError, ValueError):
+                raise ValueError('id must be an integer')
+            if row_id not in self.existing_ids:
+                raise ValueError('id %d does not exist' % row_id)
+        else:
+            key = tuple(values[k] for k in self.spec['natural_key'])
+            row_id = self.existing.get(key)
+        values['id'] = row_id
+        if self.locate:
+            place = None
+            if values['address'] and (row_id is None or values['address'] != self.addresses.get(row_id)):
+                place = self.locate(values['address'])
+            # None keeps what the row has (see _sql)
+            values['latitude'], values['longitude'] = (place.latitude, place.longitude) if place else (None, None)
+        return values
+
+    def _sql(self):
+        columns = ['id', self.spec['ref_column']] + [f.name for f in self.spec['fields']]
+        updates = ['%s=VALUES(%s)' % (c, c) for c in columns[1:]]
+        if self.locate:
+            columns += ['latitude', 'longitude']
+            updates += ['%s=COALESCE(VALUES(%s), %s)' % (c, c, c) for c in ('latitude', 'longitude')]
+        updates = ', '.join(updates)
+        return columns, "INSERT INTO %s (%s) VALUES (%s) ON DUPLICATE KEY UPDATE %s" % (
+            self.spec['table'], ', '.join(columns), ', '.join(['%s'] * len(columns)), updates)
+
+    def run(self, rows, dry_run=False):
+        """Validate every row and, unless dry_run, write them in batches.
+
+        Returns a report dict. Writes happen only when every row is valid;
+        otherwise ImportFailed is raised with the report, so a caller running
+        inside a transaction rolls everything back.
+        """
+        columns, sql = self._sql()
+        report = {'entity': self.entity, 'rows': 0, 'inserted': 0, 'updated': 0,
+                  'dry_run': dry_run, 'errors': []}
+        batch, seen = [], set()
+        for line_no, row in enumerate(rows, 1):
+            report['rows'] += 1
+            try:
+                values = self.clean(row)
+                key = values['id'] or tuple(values[k] for k in self.spec['natural_key'])
+                if key in seen:
+                    raise ValueError('duplicate of an earlier row in this file')
+                seen.add(key)
+            except ValueError as e:
+                if len(report['errors']) < MAX_ERRORS:
+                    report['errors'].append({'row': line_no, 'message': str(e)})
+                continue
+            report['updated' if values['id'] else 'inserted'] += 1
+            if self.locate and values['latitude'] is not None:
+                report['located'] = report.get('located', 0) + 1
+            if report['errors'] or dry_run:
+                continue
+            batch.append(tuple(values[c] for c in columns))
+            if len(batch) >= self.batch_size:
+                self.cursor.executemany(sql, batch)
+                batch = []
+        if report['errors']:
+            raise ImportFailed(report)
+        if batch:
+            self.cursor.executemany(sql, batch)
+        return report
+
+
+def export_rows(conn, entity):
+    """Yield dict rows for `entity` from an unbuffered server-side cursor."""
+    if entity not in ENTITIES:
+        raise CatalogIOError('Unknown entity: %s' % entity)
+    with conn.cursor(pymysql.cursors.SSDictCursor) as cursor:
+        cursor.execute(ENTITIES[entity]['export_sql'])
+        for row in cursor:
+            yield row
+
+
+def export_columns(entity):
+    spec = ENTITIES[entity]
+    ref_cols = [spec['ref_column'], spec['ref']] if spec['ref'] == 'illness' else [spec['ref']]
+    return ['id'] + ref_cols + [f.name for f in spec['fields']]
+
+
+def format_rows(rows, entity, fmt, dumps=json.dumps):
+    """Serialize rows to CSV or JSONL text chunks, one row at a time."""
+    if fmt not in FORMATS:
+        raise CatalogIOError('Unsupported format: %s' % fmt)
+    if fmt == 'jsonl':
+        for row in rows:
+            yield dumps(row) + '\n'
+        return
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=export_columns(entity), extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
@@ -0,0 +1,137 @@
+# Catalog change log.
+#
+# Every catalog write records what it changed in `catalog_changes`, in the
+# same transaction as its catalog_version bump and tagged with the version
+# that bump produced: the entity, its id, the operation and the body part
+# page(s) the row appeared on before and after the write. A client holding
+# the catalog as of version N can then be sent only the pages that changed
+# since N (see /api/catalog?since=N).
+#
+# A write that doesn't say what it changed (bulk import, CLI maintenance) is
+# logged as touching everything. Every version therefore has at least one
+# row, so a version missing from the log (bumped from outside the app, or
+# pruned away) is noticed and answered with the full catalog instead.
+#
+# The same log, read by its id, is the admin panel's change feed
+# (/admin/changes). Contact message writes are logged there too, under the
+# current version without bumping it, since they don't change the public
+# catalog. Every writer inserts its rows while holding the catalog_version
+# row lock (the bump, or SELECT ... FOR UPDATE) until it commits, so ids
+# become visible in increasing order and a reader that has seen id N never
+# later finds a smaller one appear.
+
+KEEP_VERSIONS = 10000
+
+# entity -> query for the body part page a row shows up on
+PAGE_SQL = {
+    'illness': "SELECT body_part_id FROM illnesses WHERE id = %s",
+    'medicine': """
+        SELECT i.body_part_id FROM medicines m JOIN illnesses i ON i.id = m.illness_id
+        WHERE m.id = %s""",
+    # a doctor without a body part is listed on every page (body_part_id NULL)
+    'doctor': "SELECT body_part_id FROM doctors WHERE id = %s",
+}
+
+EVERYTHING = ('catalog', None, 'update', {None})
+
+# Served by idx_catalog_changes_version.
+SINCE_SQL = """
+    SELECT version, entity, body_part_id FROM catalog_changes
+    WHERE version > %s AND version <= %s AND entity <> 'message'"""
+
+FEED_SQL = """
+    SELECT id, entity, entity_id, op FROM catalog_changes
+    WHERE id > %s ORDER BY id LIMIT %s"""
+
+FEED_LIMIT = 500
+
+INSERT_SQL = """
+    INSERT INTO catalog_changes (version, entity, entity_id, op, body_part_id)
+    VALUES (%s, %s, %s, %s, %s)"""
+
+
+def pages(cursor, entity, row_id):
+    """Body part ids whose page shows this row; None stands for every page."""
+    sql = PAGE_SQL.get(entity)
+    if sql is None or row_id is None:
+        return set()
+    cursor.execute(sql, (row_id,))
+    row = cursor.fetchone()
+    return {row['body_part_id']} if row else set()
+
+
+def record(cursor, version, changes):
+    """Log [(entity, entity_id, op, pages)] under `version`.
+
+    Tips aren't on any body part page, so they're logged with a NULL page;
+    for every other entity NULL means all pages.
+    """
+    rows = []
+    for entity, entity_id, op, parts in changes or [EVERYTHING]:
+        for part in sorted(parts, key=lambda p: (p is not None, p)) or [None]:
+            rows.append((version, entity, entity_id, op, part))
+    cursor.executemany(INSERT_SQL, rows)
+    if version > KEEP_VERSIONS:
+        cursor.execute("DELETE FROM catalog_changes WHERE version <= %s", (version - KEEP_VERSIONS,))
+
+
+def record_admin(cursor, entity, row_ids, op):
+    """Log a write outside catalog_write() (contact messages) for the feed only.
+
+    `row_ids` may be [None] when the ids aren't known, e.g. for a multi-row
+    INSERT; the feed then tells the panel to reload that table.
+    """
+    cursor.execute("SELECT version FROM catalog_version WHERE id = 1 FOR UPDATE")
+    version = cursor.fetchone()['version']
+    cursor.executemany(INSERT_SQL, [(version, entity, row_id, op, None) for row_id in row_ids])
+
+
+def feed(cursor, since, limit=FEED_LIMIT):
+    """(changes, last id, more) for the log entries after id `since`.
+
+    Entries for the same row are collapsed to its latest one, in the order
+    of their last change: [(entity, entity_id, op)]. changes is None when
+    the log no longer reaches back to `since` (pruned, or a different
+    database), and the panel has to reload everything.
+    """
+    cursor.execute("SELECT MIN(id) AS first, MAX(id) AS last FROM catalog_changes")
+    bounds = cursor.fetchone()
+    first, last = bounds['first'] or 0, bounds['last'] or 0
+    if since > last or first > since + 1:
+        return None, last, False
+    cursor.execute(FEED_SQL, (since, limit))
+    rows = cursor.fetchall()
+    if not rows:
+        return [], since, False
+    latest = {}
+    for row in rows:
+        key = (row['entity'], row['entity_id'])
+        latest.pop(key, None)
+        latest[key] = row['op']
+    return [(entity, row_id, op) for (entity, row_id), op in latest.items()], rows[-1]['id'], len(rows) == limit
+
+
+def touched_since(cursor, since, version):
+    """(body part ids, tips changed) for the writes after `since` up to `version`.
+
+    None when only the full catalog will do: the log doesn't cover every
+    version in between, `since` is ahead of `version`, or a write touched
+    every page.
+    """
+    if since == version:
+        return set(), False
+    if since > version:
+        return None
+    cursor.execute(SINCE_SQL, (since, version))
+    rows = cursor.fetchall()
+    if len({row['version'] for row in rows}) != version - since:
+        return None
+    parts, tips = set(), False
+    for row in rows:
+        if row['entity'] == 'tip':
+            tips = True
+        elif row['body_part_id'] is None:
+            return None
+        else:
+            parts.add(row['body_part_id'])
+    return parts, tips
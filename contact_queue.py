@@ -0,0 +1,346 @@
+# Write-behind queue and rate limiting for contact form submissions.
+#
+# submit_contact validates a message, checks the per-IP and per-email token
+# buckets, appends the message to this worker's spool file and puts it on a
+# bounded in-memory queue. A background writer drains the queue in
+# multi-row INSERTs, one transaction per batch, so a flood of submissions
+# costs a few connections' worth of work instead of one transaction each.
+#
+# The spool is an append-only JSONL file per worker, named after its pid and
+# a random token so a restarted container whose worker gets the same pid
+# never appends to its predecessor's file. Every batch the writer
+# commits is followed by an "ack" line, and the file is truncated once
+# everything in it is acked. A worker that starts up replays any spool file
+# whose owner is gone (its lock was released) and hasn't been acked. A crash
+# between a commit and its ack replays that batch, so delivery is
+# at-least-once.
+#
+# A batch the database refuses for a reason other than being unreachable is
+# retried one row at a time; rows that still fail go to dead-letter.jsonl in
+# the spool directory and are acked, so one bad message can't stall the
+# queue behind it.
+#
+# With write_through (serverless, where an instance is frozen as soon as it
+# has answered and its disk is thrown away) there is no spool or writer
+# thread: submit() inserts the message itself before returning.
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from itertools import islice
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to checking whether the owner pid is alive
+    fcntl = None
+
+QUEUE_SIZE = 1000
+BATCH_SIZE = 100
+FLUSH_INTERVAL = 0.5
+RETRY_DELAY = 5.0
+SPOOL_COMPACT_BYTES = 8 * 1024 * 1024
+MAX_NAME = 200
+MAX_EMAIL = 255
+MAX_MESSAGE = 5000
+DEAD_LETTER_FILE = 'dead-letter.jsonl'
+
+
+class ContactError(ValueError):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+def clean_message(data):
+    """Validate a submission; returns (name, email, message)."""
+    if not isinstance(data, dict):
+        raise ContactError('All fields are required')
+    name = str(data.get('name') or '').strip()
+    email = str(data.get('email') or '').strip()
+    message = str(data.get('message') or '').strip()
+    if not all([name, email, message]):
+        raise ContactError('All fields are required')
+    if '@' not in email or len(email) > MAX_EMAIL:
+        raise ContactError('Please enter a valid email address')
+    if len(name) > MAX_NAME:
+        raise ContactError('Name is too long')
+    if len(message) > MAX_MESSAGE:
+        raise ContactError('Message is too long (max %d characters)' % MAX_MESSAGE)
+    try:
+        # e.g. a lone surrogate from a "\ud800" JSON escape
+        ''.join([name, email, message]).encode('utf-8')
+    except UnicodeEncodeError:
+        raise ContactError('Message contains invalid characters')
+    return name, email, message
+
+
+class RateLimiter:
+    """Token buckets keyed by an arbitrary string (client IP, email...).
+
+    Each key refills at `rate` tokens per second up to `burst`. Only the
+    `max_keys` most recently seen keys are tracked; a forgotten key simply
+    starts again with a full bucket. Buckets live in this process, so with
+    several workers a client can get up to that many times the limit.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, *keys):
+        """Take one token from every key's bucket, or none if any is empty.
+
+        Returns 0 when allowed, otherwise the seconds until it would be.
+        """
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            for key in keys:
+                tokens, last = self._buckets.get(key, (self.burst, now))
+                levels.append(min(self.burst, tokens + (now - last) * self.rate))
+            wait = max((1 - level) / self.rate for level in levels)
+            if wait > 0:
+                return wait
+            for key, level in zip(keys, levels):
+                self._buckets[key] = (level - 1, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return 0
+
+
+class ContactQueue:
+    def __init__(self, get_db, spool_dir, max_size=QUEUE_SIZE, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, write_through=False, on_batch=None, on_error=None,
+                 retry_errors=(OSError,)):
+        self.get_db = get_db
+        self.spool_dir = spool_dir
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write_through = write_through
+        self.on_batch = on_batch    # on_batch(cursor, rows), inside the batch transaction
+        self.on_error = on_error
+        # errors that mean the database is unreachable: keep the batch and retry
+        self.retry_errors = retry_errors
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats = {'queued': 0, 'written': 0, 'batches': 0, 'rejected': 0,
+                       'failures': 0, 'recovered': 0, 'dead_lettered': 0}
+
+    # ----- per-process state -----
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = deque()
+            self._cond = threading.Condition(threading.Lock())
+            self._flush_lock = threading.Lock()
+            self._seq = 0
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._spool_path = os.path.join(self.spool_dir, 'contact-%d-%s.jsonl' % (
+                os.getpid(), uuid.uuid4().hex[:12]))
+            self._spool = _open_spool(self._spool_path)
+            self._pid = os.getpid()
+            self._recover()
+            threading.Thread(target=self._run, name='contact-writer', daemon=True).start()
+
+    def _recover(self):
+        # Adopt unacked records from spool files whose worker has exited.
+        for filename in sorted(os.listdir(self.spool_dir)):
+            path = os.path.join(self.spool_dir, filename)
+            if path == self._spool_path or not filename.startswith('contact-') \
+                    or not filename.endswith('.jsonl'):
+                continue
+            records = _orphaned_records(path)
+            if records is None:
+                continue
+            with self._cond:
+                for record in records:
+                    self._enqueue(record)
+            self._stats['recovered'] += len(records)
+            os.remove(path)
+
+    # ----- producer side -----
+
+    def submit(self, name, email, message):
+        record = {'name': name, 'email': email, 'message': message,
+                  'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        if self.write_through:
+            self._insert([record])
+            self._stats['queued'] += 1
+            self._stats['written'] += 1
+            self._stats['batches'] += 1
+            return
+        self._ensure_started()
+        with self._cond:
+            if len(self._queue) >= self.max_size:
+                self._stats['rejected'] += 1
+                raise QueueFull('We are receiving a lot of messages right now, please try again shortly')
+            self._enqueue(record)
+            self._cond.notify()
+
+    def _enqueue(self, record):
+        # caller holds self._cond
+        self._seq += 1
+        record = dict(record, seq=self._seq)
+        self._spool.write(json.dumps(record) + '\n')
+        self._spool.flush()
+        self._queue.append(record)
+        self._stats['queued'] += 1
+
+    # ----- writer -----
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+            # let a burst accumulate into one batch
+            time.sleep(self.flush_interval)
+            try:
+                while self.flush() == self.batch_size:
+                    pass
+            except Exception as e:
+                self._stats['failures'] += 1
+                if self.on_error:
+                    self.on_error(e)
+                time.sleep(RETRY_DELAY)
+
+    def flush(self):
+        """Write up to one batch from the queue; returns the number written."""
+        self._ensure_started()
+        with self._flush_lock:
+            with self._cond:
+                batch = list(islice(self._queue, self.batch_size))
+            if not batch:
+                return 0
+            try:
+                self._insert(batch)
+                written = len(batch)
+            except self.retry_errors:
+                raise
+            except Exception:
+                written = self._insert_each(batch)
+            with self._cond:
+                for _ in batch:
+                    self._queue.popleft()
+                self._spool.write(json.dumps({'ack': batch[-1]['seq']}) + '\n')
+                if not self._queue:
+                    self._spool.truncate(0)
+                elif self._spool.tell() > SPOOL_COMPACT_BYTES:
+                    self._compact()
+                self._spool.flush()
+            self._stats['written'] += written
+            self._stats['batches'] += 1
+            return len(batch)
+
+    def _insert_each(self, batch):
+        # The database refused the batch: write the rows that it accepts
+        # and set the rest aside. Returns the number written.
+        written = 0
+        for record in batch:
+            try:
+                self._insert([record])
+                written += 1
+            except self.retry_errors:
+                raise
+            except Exception as e:
+                self._dead_letter(record, e)
+        return written
+
+    def _dead_letter(self, record, error):
+        with open(os.path.join(self.spool_dir, DEAD_LETTER_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(dict(record, error=str(error))) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._stats['dead_lettered'] += 1
+        if self.on_error:
+            self.on_error(error)
+
+    def _insert(self, batch):
+        with self.get_db() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO contact_messages (name, email, message, created_at) VALUES "
+                    + ', '.join(['(%s, %s, %s, %s)'] * len(batch)),
+                    [v for r in batch for v in (r['name'], r['email'], r['message'], r['created_at'])])
+                if self.on_batch:
+                    self.on_batch(cursor, batch)
+            conn.commit()
+
+    def _compact(self):
+        # Under a sustained flood the queue never drains, so rewrite just the
+        # pending records into a fresh file. The new file is locked before it
+        # replaces the old one, so recovery never sees it unowned.
+        tmp = self._spool_path + '.tmp'
+        spool = _open_spool(tmp)
+        for record in self._queue:
+            spool.write(json.dumps(record) + '\n')
+        spool.flush()
+        os.replace(tmp, self._spool_path)
+        self._spool.close()
+        self._spool = spool
+
+    def stats(self):
+        pending = len(self._queue) if self._pid == os.getpid() else 0
+        return dict(self._stats, pending=pending, max_size=self.max_size)
+
+
+def _open_spool(path):
+    spool = open(path, 'a', encoding='utf-8')
+    if fcntl is not None:
+        fcntl.flock(spool.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    return spool
+
+
+def _orphaned_records(path):
+    """Unacked records of a spool file whose owner is gone, else None."""
+    try:
+        f = open(path, 'r+', encoding='utf-8')
+    except OSError:
+        return None
+    with f:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None  # owner still running
+            if os.fstat(f.fileno()).st_nlink == 0:
+                return None  # another worker recovered it first
+        elif _pid_alive(path):
+            return None
+        records, acked = [], 0
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line from a crash
+            if 'ack' in entry:
+                acked = max(acked, entry['ack'])
+            else:
+                records.append(entry)
+        return [r for r in records if r['seq'] > acked]
+
+
+def _pid_alive(path):
+    try:
+        pid = int(os.path.basename(path).split('-')[1].split('.')[0])
+        if pid == os.getpid():
+            return False  # an earlier process that had our pid
+        os.kill(pid, 0)
+    except (ValueError, IndexError, OSError):
+        return False
+    return True
@@ -0,0 +1,206 @@
+# Incrementally maintained dashboard counters.
+#
+# `stat_counters` holds one row per aggregate: the headline numbers
+# (active illnesses and doctors, medicines, total and unread messages) plus
+# breakdowns such as `illnesses.severity.mild` or `doctors.body_part.3`.
+#
+# Write paths apply deltas in the same transaction as the change. For
+# catalog rows, measure() records what a row contributes before the write
+# and settle() applies the difference afterwards, so an update that moves an
+# illness to another body part or deactivates it adjusts every affected
+# counter. reconcile() recounts everything from the real tables and fixes
+# drift. The counts and the stored values come from one consistent snapshot
+# read without locks, so writers never wait on the table scans; only the
+# counters that drifted are then locked and moved by the difference, which
+# stays right whatever writers committed in the meantime. The background
+# Reconciler holds a MySQL named lock while it runs, so only one process
+# reconciles at a time.
+
+import os
+import threading
+import time
+from collections import Counter
+
+RECONCILE_INTERVAL = 3600
+LOCK_NAME = 'ai_doctor_counter_reconcile'
+
+
+class ReconcileBusy(Exception):
+    pass
+
+
+# kind -> query that locks one catalog row and reads what contributions() needs
+_MEASURE = {
+    'illness': ("""
+        SELECT i.is_active, i.body_part_id, i.severity,
+               (SELECT COUNT(*) FROM medicines m WHERE m.illness_id = i.id) AS medicines
+        FROM illnesses i WHERE i.id = %s FOR UPDATE"""),
+    'doctor': "SELECT is_active, body_part_id FROM doctors WHERE id = %s FOR UPDATE",
+    'medicine': "SELECT id FROM medicines WHERE id = %s FOR UPDATE",
+}
+
+# name prefix -> query returning (k, value) rows; k = None for a plain total
+RECOUNT_SQL = {
+    'illnesses': "SELECT NULL AS k, COUNT(*) AS value FROM illnesses WHERE is_active = 1",
+    'illnesses.body_part': """
+        SELECT body_part_id AS k, COUNT(*) AS value FROM illnesses
+        WHERE is_active = 1 GROUP BY body_part_id""",
+    'illnesses.severity': """
+        SELECT severity AS k, COUNT(*) AS value FROM illnesses
+        WHERE is_active = 1 GROUP BY severity""",
+    'doctors': "SELECT NULL AS k, COUNT(*) AS value FROM doctors WHERE is_active = 1",
+    'doctors.body_part': """
+        SELECT body_part_id AS k, COUNT(*) AS value FROM doctors
+        WHERE is_active = 1 GROUP BY body_part_id""",
+    'medicines': "SELECT NULL AS k, COUNT(*) AS value FROM medicines",
+    'messages': "SELECT NULL AS k, COUNT(*) AS value FROM contact_messages",
+    'messages.unread': "SELECT NULL AS k, COUNT(*) AS value FROM contact_messages WHERE is_read = 0",
+}
+
+
+def counter_name(prefix, key=None):
+    if key is None and prefix.endswith('.body_part'):
+        key = 'none'
+    return prefix if key is None else '%s.%s' % (prefix, key)
+
+
+def contributions(kind, row):
+    """The counters one catalog row adds to (empty for a missing row)."""
+    c = Counter()
+    if not row:
+        return c
+    if kind == 'illness':
+        # medicines disappear with their illness (ON DELETE CASCADE)
+        c['medicines'] += row['medicines']
+        if row['is_active']:
+            c['illnesses'] += 1
+            c[counter_name('illnesses.body_part', row['body_part_id'])] += 1
+            c[counter_name('illnesses.severity', row['severity'] or 'mild')] += 1
+    elif kind == 'doctor':
+        if row['is_active']:
+            c['doctors'] += 1
+            c[counter_name('doctors.body_part', row['body_part_id'])] += 1
+    elif kind == 'medicine':
+        c['medicines'] += 1
+    return c
+
+
+def measure(cursor, kind, row_id):
+    """Lock a catalog row and return what it currently contributes."""
+    if row_id is None:
+        return Counter()
+    cursor.execute(_MEASURE[kind], (row_id,))
+    return contributions(kind, cursor.fetchone())
+
+
+def settle(cursor, kind, row_id, before=None):
+    """Apply the change in a row's contributions since measure()."""
+    after = measure(cursor, kind, row_id)
+    before = before or Counter()
+    deltas = {name: after[name] - before[name] for name in set(after) | set(before)}
+    apply(cursor, deltas)
+
+
+def apply(cursor, deltas):
+    """Add deltas ({name: n}) to the counters, in name order so concurrent
+    transactions lock counter rows in the same order."""
+    deltas = sorted((name, n) for name, n in deltas.items() if n)
+    if not deltas:
+        return
+    cursor.executemany("INSERT IGNORE INTO stat_counters (name, value) VALUES (%s, 0)",
+                       [(name,) for name, _ in deltas])
+    cursor.executemany("UPDATE stat_counters SET value = value + %s WHERE name = %s",
+                       [(n, name) for name, n in deltas])
+
+
+def recount(cursor):
+    counts = {}
+    for prefix, sql in RECOUNT_SQL.items():
+        cursor.execute(sql)
+        for row in cursor.fetchall():
+            counts[counter_name(prefix, row['k'])] = int(row['value'])
+    return counts
+
+
+def reconcile(cursor):
+    """Recount every aggregate and fix stored counters that drifted.
+
+    Both sides are plain reads from the transaction's snapshot, so a writer
+    that commits after it was taken is missing from both; adding the
+    difference rather than overwriting keeps that writer's own delta.
+
+    Returns {name: (stored, actual)} for the counters that were corrected.
+    """
+    actual = recount(cursor)
+    stored = snapshot(cursor)
+    fixes = {}
+    for name in sorted(set(stored) | set(actual)):
+        if stored.get(name, 0) != actual.get(name, 0):
+            fixes[name] = (stored.get(name), actual.get(name, 0))
+    apply(cursor, {name: actual - (stored or 0) for name, (stored, actual) in fixes.items()})
+    return fixes
+
+
+def snapshot(cursor):
+    cursor.execute("SELECT name, value FROM stat_counters")
+    return {row['name']: int(row['value']) for row in cursor.fetchall()}
+
+
+def breakdown(counters, prefix):
+    """{key: value} for the counters named `<prefix>.<key>` (zeros omitted)."""
+    start = prefix + '.'
+    return {name[len(start):]: value for name, value in counters.items()
+            if name.startswith(start) and '.' not in name[len(start):] and value}
+
+
+class Reconciler:
+    """Runs reconcile() every `interval` seconds on a daemon thread.
+
+    Started lazily and once per process, so it survives preforking servers;
+    run_once() takes a MySQL named lock, so when several workers wake up
+    together only one recounts and the rest skip that round.
+    """
+
+    def __init__(self, get_db, interval=RECONCILE_INTERVAL, on_error=None):
+        self.get_db = get_db
+        self.interval = interval
+        self.on_error = on_error
+        self.last_run = None
+        self.last_fixes = {}
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._loop, name='counter-reconciler', daemon=True).start()
+
+    def run_once(self):
+        with self.get_db() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT GET_LOCK(%s, 0) AS locked", (LOCK_NAME,))
+                if not cursor.fetchone()['locked']:
+                    raise ReconcileBusy('Another process is reconciling counters')
+                try:
+                    fixes = reconcile(cursor)
+                    conn.commit()
+                finally:
+                    conn.rollback()
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        self.last_run = time.time()
+        self.last_fixes = fixes
+        return fixes
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except ReconcileBusy:
+                pass
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
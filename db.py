@@ -0,0 +1,289 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+
+import pymysql
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Bounded per-process pool of PyMySQL connections.
+
+    Connections are created lazily, so importing the app under
+    `gunicorn --preload` never opens a socket in the master. If the pool
+    notices it is running in a forked child it throws away everything it
+    inherited and starts empty.
+    """
+
+    def __init__(self, config, max_size=10, timeout=5.0, max_lifetime=1800,
+                 ping_interval=30):
+        self.config = dict(config)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+        self._lock = threading.Lock()
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._cond = threading.Condition(threading.Lock())
+        # idle entries are (conn, created_at, last_used)
+        self._idle = deque()
+        self._size = 0
+        self._stats = {
+            'created': 0, 'closed': 0, 'recycled': 0, 'reconnects': 0,
+            'checkouts': 0, 'waits': 0, 'timeouts': 0, 'errors': 0,
+        }
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Never close inherited sockets: COM_QUIT would kill the
+                    # parent's session. Dropping the references is enough.
+                    self._reset()
+
+    def _connect(self):
+        conn = pymysql.connect(**self.config)
+        self._stats['created'] += 1
+        return conn
+
+    def _close(self, conn):
+        self._stats['closed'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _acquire(self):
+        self._check_pid()
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    entry = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        'Timed out after %.1fs waiting for a database connection' % self.timeout)
+                self._stats['waits'] += 1
+                self._cond.wait(remaining)
+            self._stats['checkouts'] += 1
+
+        try:
+            return self._prepare(entry)
+        except Exception:
+            self._discard()
+            raise
+
+    def _prepare(self, entry):
+        now = time.monotonic()
+        if entry is None:
+            return self._connect(), now
+        conn, created, last_used = entry
+        if now - created > self.max_lifetime:
+            self._stats['recycled'] += 1
+            self._close(conn)
+            return self._connect(), now
+        if now - last_used > self.ping_interval:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                self._stats['reconnects'] += 1
+                self._close(conn)
+                return self._connect(), now
+        return conn, created
+
+    def _release(self, conn, created):
+        if self._pid != os.getpid():
+            return
+        with self._cond:
+            self._idle.append((conn, created, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn=None):
+        if conn is not None:
+            self._close(conn)
+        if self._pid != os.getpid():
+            return
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn, created = self._acquire()
+        try:
+            yield conn
+        except pymysql.err.OperationalError:
+            self._stats['errors'] += 1
+            self._discard(conn)
+            raise
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                self._stats['errors'] += 1
+                self._discard(conn)
+            else:
+                self._release(conn, created)
+            raise
+        else:
+            try:
+                # End any implicit read transaction so the next borrower
+                # doesn't inherit a stale REPEATABLE READ snapshot.
+                conn.rollback()
+            except Exception:
+                self._stats['errors'] += 1
+                self._discard(conn)
+            else:
+                self._release(conn, created)
+
+    def close_all(self):
+        self._check_pid()
+        with self._cond:
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._size -= 1
+                self._close(conn)
+
+    def stats(self):
+        self._check_pid()
+        with self._cond:
+            idle = len(self._idle)
+            return dict(self._stats, pid=self._pid, size=self._size, idle=idle,
+                        in_use=self._size - idle, max_size=self.max_size)
+
+
+class Replica:
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.healthy = False    # until the first health check passes
+        self.lag = None
+        self.error = 'not checked yet'
+        self.checked_at = None
+
+
+def replication_lag(cursor):
+    """Seconds this server's replication is behind its source.
+
+    None when replication isn't running (or the server isn't a replica).
+    """
+    try:
+        cursor.execute("SHOW REPLICA STATUS")
+    except pymysql.err.ProgrammingError:
+        cursor.execute("SHOW SLAVE STATUS")  # MySQL < 8.0.22, MariaDB
+    row = cursor.fetchone()
+    if not row:
+        return None
+    lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+    return None if lag is None else int(lag)
+
+
+class ReplicaRouter:
+    """Sends read-only work to healthy replicas and everything else to the primary.
+
+    A daemon thread (started lazily, once per process) checks each replica
+    every `check_interval` seconds. A replica is used only while replication
+    is running and at most `max_lag` seconds behind. One that fails to hand
+    out a connection is taken out at once, and the next check can bring it
+    back. With no healthy replica, reads go to the primary.
+    """
+
+    def __init__(self, primary, replicas=(), max_lag=5, check_interval=2.0, on_change=None):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.on_change = on_change    # on_change(replica), when it goes up or down
+        self._next = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if not self.replicas or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._loop, name='replica-health', daemon=True).start()
+
+    def _loop(self):
+        while True:
+            self.check_all()
+            time.sleep(self.check_interval)
+
+    def check_all(self):
+        for replica in self.replicas:
+            try:
+                with replica.pool.connection() as conn:
+                    with conn.cursor() as cursor:
+                        lag = replication_lag(cursor)
+            except Exception as e:
+                self._mark(replica, False, None, str(e))
+                continue
+            if lag is None:
+                self._mark(replica, False, None, 'replication is not running')
+            elif lag > self.max_lag:
+                self._mark(replica, False, lag, 'lagging %ds behind' % lag)
+            else:
+                self._mark(replica, True, lag, None)
+
+    def _mark(self, replica, healthy, lag, error):
+        changed = replica.healthy != healthy
+        replica.healthy, replica.lag, replica.error = healthy, lag, error
+        replica.checked_at = time.time()
+        if changed and self.on_change:
+            self.on_change(replica)
+
+    def pick(self):
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        with self._lock:
+            self._next += 1
+            return healthy[self._next % len(healthy)]
+
+    @contextmanager
+    def connection(self, read_only=False):
+        self.ensure_started()
+        replica = self.pick() if read_only else None
+        with ExitStack() as stack:
+            conn = None
+            if replica is not None:
+                try:
+                    conn = stack.enter_context(replica.pool.connection())
+                except (pymysql.err.OperationalError, PoolTimeout) as e:
+                    self._mark(replica, False, None, str(e))
+                    replica = None
+            if conn is None:
+                conn = stack.enter_context(self.primary.connection())
+            try:
+                yield conn
+            except pymysql.err.OperationalError as e:
+                if replica is not None:
+                    self._mark(replica, False, None, str(e))
+                raise
+
+    def stats(self):
+        return [{'name': r.name, 'healthy': r.healthy, 'lag': r.lag, 'error': r.error,
+                 'checked_at': r.checked_at, 'pool': r.pool.stats()} for r in self.replicas]
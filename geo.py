@@ -0,0 +1,320 @@
+# Doctor locations: offline geocoding and nearest-doctor search.
+#
+# doctors.latitude / doctors.longitude are filled from the free-text address
+# by matching place names against a local gazetteer file (no network calls).
+# The default gazetteer in data/gazetteer.csv covers major cities; a GeoNames
+# dump such as cities15000.txt can be used instead for full coverage.
+#
+# Nearest-doctor queries run in MySQL against the SPATIAL index on the
+# generated doctors.location column (migration 0003): a bounding box around
+# the user is searched with MBRContains and ranked by great-circle distance,
+# and the box grows until it holds k doctors or reaches the search radius.
+# DoctorLocations answers the same query from memory with one KD-tree per
+# body part, for servers whose MySQL can't run the spatial query.
+
+import csv
+import heapq
+import math
+
+from search import words
+
+EARTH_RADIUS_KM = 6371.0088
+START_RADIUS_KM = 5.0
+DEFAULT_RADIUS_KM = 100.0
+MAX_RADIUS_KM = 1000.0
+MAX_NEIGHBOURS = 50
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+NEARBY_COLUMNS = """
+    d.id, d.body_part_id, bp.slug AS body_part, d.name, d.specialization, d.hospital,
+    d.phone, d.email, d.address, d.experience_years, d.latitude, d.longitude"""
+
+# MBRContains on the box is what uses the SPATIAL index; the distance is
+# computed only for the doctors inside it.
+NEARBY_SQL = """
+    SELECT %s,
+           ST_Distance_Sphere(d.location, POINT(%%s, %%s), %r) / 1000 AS distance_km
+    FROM doctors d LEFT JOIN body_parts bp ON bp.id = d.body_part_id
+    WHERE MBRContains(ST_GeomFromText(%%s), d.location)
+      AND d.latitude IS NOT NULL AND d.is_active = 1{part}
+    ORDER BY distance_km, d.experience_years DESC
+    LIMIT %%s""" % (NEARBY_COLUMNS, EARTH_RADIUS_KM * 1000)
+
+# doctors with no body part are general practitioners and match every part,
+# as on the body part page
+NEARBY_PART_FILTER = ' AND (d.body_part_id = %s OR d.body_part_id IS NULL)'
+
+LOCATIONS_SQL = """
+    SELECT %s
+    FROM doctors d LEFT JOIN body_parts bp ON bp.id = d.body_part_id
+    WHERE d.latitude IS NOT NULL AND d.is_active = 1""" % NEARBY_COLUMNS
+
+
+class GeoError(ValueError):
+    pass
+
+
+def parse_point(lat, lon):
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        raise GeoError('lat and lon must be numbers')
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise GeoError('lat must be within [-90, 90] and lon within [-180, 180]')
+    return lat, lon
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((p2 - p1) / 2) ** 2
+         + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lon, radius_km):
+    """(min_lon, min_lat, max_lon, max_lat) of a box holding the circle.
+
+    Near a pole or across the antimeridian the box simply spans every
+    longitude, which is still correct, only less selective.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    if min_lat <= -90 or max_lat >= 90:
+        return -180.0, min_lat, 180.0, max_lat
+    dlon = dlat / max(math.cos(math.radians(max(abs(min_lat), abs(max_lat)))), 1e-9)
+    if dlon >= 180 or lon - dlon < -180 or lon + dlon > 180:
+        return -180.0, min_lat, 180.0, max_lat
+    return lon - dlon, min_lat, lon + dlon, max_lat
+
+
+def box_wkt(box):
+    min_lon, min_lat, max_lon, max_lat = box
+    return 'POLYGON((%r %r, %r %r, %r %r, %r %r, %r %r))' % (
+        min_lon, min_lat, max_lon, min_lat, max_lon, max_lat,
+        min_lon, max_lat, min_lon, min_lat)
+
+
+def nearest_doctors(cursor, lat, lon, k, radius_km, body_part_id=None):
+    """Up to k active doctors within radius_km, nearest first.
+
+    Starts with a small box and grows it fourfold, so a query in a city
+    reads only the doctors around it and a rural one takes a few more
+    index probes. Once the k-th nearest doctor in a box lies inside the
+    box's circle, no doctor outside the box can be nearer.
+    """
+    sql = NEARBY_SQL.format(part=NEARBY_PART_FILTER if body_part_id is not None else '')
+    radius = min(START_RADIUS_KM, radius_km)
+    while True:
+        params = [lon, lat, box_wkt(bounding_box(lat, lon, radius))]
+        if body_part_id is not None:
+            params.append(body_part_id)
+        cursor.execute(sql, params + [k])
+        rows = [row for row in cursor.fetchall() if row['distance_km'] <= radius]
+        if len(rows) >= k or radius >= radius_km:
+            return [_located(row, row['distance_km']) for row in rows]
+        radius = min(radius * 4, radius_km)
+
+
+def _located(row, distance_km):
+    row = dict(row)
+    row['latitude'], row['longitude'] = float(row['latitude']), float(row['longitude'])
+    row['distance_km'] = round(float(distance_km), 3)
+    return row
+
+
+# ----- in-memory fallback -----
+
+def unit_vector(lat, lon):
+    p, l = math.radians(lat), math.radians(lon)
+    return (math.cos(p) * math.cos(l), math.cos(p) * math.sin(l), math.sin(p))
+
+
+def chord_for_km(km):
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def km_for_chord(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+class KDTree:
+    """Static 3-d tree over points on the unit sphere.
+
+    Straight-line (chord) distance between unit vectors orders points the
+    same way great-circle distance does, with no special cases at the poles
+    or the antimeridian. The tree is stored implicitly: the median of each
+    slice is its node, with the halves on either side.
+    """
+
+    def __init__(self, items):
+        self.items = list(items)    # (vector, key) pairs
+        self._build(0, len(self.items), 0)
+
+    def _build(self, lo, hi, axis):
+        if hi - lo <= 1:
+            return
+        self.items[lo:hi] = sorted(self.items[lo:hi], key=lambda item: item[0][axis])
+        mid = (lo + hi) // 2
+        self._build(lo, mid, (axis + 1) % 3)
+        self._build(mid + 1, hi, (axis + 1) % 3)
+
+    def nearest(self, vector, k, max_chord):
+        """[(chord, key)] for up to k points within max_chord, nearest first."""
+        best = []    # max-heap on distance: (-d2, key)
+        limit2 = max_chord * max_chord
+        stack = [(0, len(self.items), 0)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            point, key = self.items[mid]
+            d2 = ((point[0] - vector[0]) ** 2 + (point[1] - vector[1]) ** 2
+                  + (point[2] - vector[2]) ** 2)
+            bound = -best[0][0] if len(best) == k else limit2
+            if d2 <= bound:
+                entry = (-d2, key)
+                if len(best) < k:
+                    heapq.heappush(best, entry)
+                else:
+                    heapq.heapreplace(best, entry)
+            diff = vector[axis] - point[axis]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            bound = -best[0][0] if len(best) == k else limit2
+            # the far side is pushed first so the near side is searched first
+            if diff * diff <= bound:
+                stack.append(far + ((axis + 1) % 3,))
+            stack.append(near + ((axis + 1) % 3,))
+        return sorted((math.sqrt(-d2), key) for d2, key in best)
+
+
+class DoctorLocations:
+    """Located doctors in memory, one KD-tree per body part (None = general)."""
+
+    def __init__(self):
+        self.doctors = {}    # id -> row
+        self.trees = {}
+        self.part_ids = {}   # body part slug -> id
+
+    def build(self, cursor):
+        cursor.execute("SELECT id, slug FROM body_parts")
+        self.part_ids = {row['slug']: row['id'] for row in cursor.fetchall()}
+        cursor.execute(LOCATIONS_SQL)
+        for row in cursor.fetchall():
+            self.doctors[row['id']] = row
+        for part in {row['body_part_id'] for row in self.doctors.values()}:
+            self._plant(part)
+
+    def refresh(self, cursor, kind, doc_id):
+        if kind != 'doctor':
+            return
+        old = self.doctors.pop(doc_id, None)
+        cursor.execute(LOCATIONS_SQL + ' AND d.id = %s', (doc_id,))
+        row = cursor.fetchone()
+        if row:
+            self.doctors[doc_id] = row
+        for part in {r['body_part_id'] for r in (old, row) if r}:
+            self._plant(part)
+
+    def _plant(self, part):
+        items = [(unit_vector(float(row['latitude']), float(row['longitude'])), row['id'])
+                 for row in self.doctors.values() if row['body_part_id'] == part]
+        if items:
+            self.trees[part] = KDTree(items)
+        else:
+            self.trees.pop(part, None)
+
+    def nearest(self, lat, lon, k, radius_km, body_part_id=None):
+        parts = list(self.trees) if body_part_id is None else [body_part_id, None]
+        vector, max_chord = unit_vector(lat, lon), chord_for_km(radius_km)
+        found = []
+        for part in parts:
+            tree = self.trees.get(part)
+            if tree is not None:
+                found.extend(tree.nearest(vector, k, max_chord))
+        rows = [(km_for_chord(chord), self.doctors.get(key)) for chord, key in found]
+        rows = [(km, row) for km, row in rows if row is not None]
+        rows.sort(key=lambda item: (item[0], -(item[1]['experience_years'] or 0)))
+        return [_located(row, km) for km, row in rows[:k]]
+
+    def stats(self):
+        return {'doctors': len(self.doctors), 'trees': len(self.trees)}
+
+
+# ----- offline geocoding -----
+
+# a place name followed by one of these is a street ("Boston Road"), not a city
+STREET_WORDS = {'street', 'st', 'road', 'rd', 'avenue', 'ave', 'boulevard', 'blvd', 'lane', 'ln',
+                'drive', 'dr', 'way', 'place', 'pl', 'court', 'ct', 'highway', 'hwy', 'square'}
+MAX_PLACE_WORDS = 4
+
+
+class Place:
+    __slots__ = ('name', 'region', 'country', 'latitude', 'longitude', 'population')
+
+    def __init__(self, name, region, country, latitude, longitude, population=0):
+        self.name = name
+        self.region = region
+        self.country = country
+        self.latitude = latitude
+        self.longitude = longitude
+        self.population = population
+
+
+class Gazetteer:
+    """Place names -> coordinates, matched against free-text addresses."""
+
+    def __init__(self):
+        self.places = {}    # normalized name -> [Place]
+
+    def __len__(self):
+        return sum(len(places) for places in self.places.values())
+
+    def add(self, place, aliases=()):
+        for name in {place.name, *aliases}:
+            key = ' '.join(words(name))
+            if key and len(key.split()) <= MAX_PLACE_WORDS:
+                self.places.setdefault(key, []).append(place)
+
+    @classmethod
+    def load(cls, path):
+        """Read data/gazetteer.csv-style CSV, or a GeoNames dump (.txt)."""
+        gazetteer = cls()
+        with open(path, encoding='utf-8', newline='') as f:
+            if path.endswith('.txt'):
+                # geonameid, name, asciiname, alternatenames, latitude,
+                # longitude, feature class/code, country, cc2, admin1..4, population
+                for cols in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+                    if len(cols) > 14:
+                        gazetteer.add(Place(cols[1], cols[10], cols[8], float(cols[4]), float(cols[5]),
+                                            int(cols[14] or 0)), aliases=(cols[2],))
+            else:
+                for row in csv.DictReader(f):
+                    gazetteer.add(Place(row['name'], row.get('region', ''), row.get('country', ''),
+                                        float(row['latitude']), float(row['longitude']),
+                                        int(row.get('population') or 0)),
+                                  aliases=[a for a in (row.get('aliases') or '').split('|') if a])
+        return gazetteer
+
+    def locate(self, address):
+        """The best matching Place for an address, or None.
+
+        Every run of up to MAX_PLACE_WORDS words is looked up. Among the
+        matches, one whose region is also named in the address wins, then
+        the one nearest the end (the city usually follows the street), then
+        the longer name, then the more populous place.
+        """
+        tokens = words(address)
+        text = ' %s ' % ' '.join(tokens)
+        best, best_score = None, None
+        for i in range(len(tokens)):
+            for n in range(1, min(MAX_PLACE_WORDS, len(tokens) - i) + 1):
+                if i + n < len(tokens) and tokens[i + n] in STREET_WORDS:
+                    continue
+                for place in self.places.get(' '.join(tokens[i:i + n]), ()):
+                    region = ' '.join(words(place.region))
+                    in_region = bool(region) and (' %s ' % region) in text
+                    score = (in_region, i + n, n, place.population)
+                    if best_score is None or score > best_score:
+                        best, best_score = place, score
+        return best
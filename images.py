@@ -0,0 +1,234 @@
+# Content-addressed storage for medicine images.
+#
+# An upload is hashed (SHA-256) and stored once under the key
+#     <hash[:2]>/<hash>/original.<ext>
+# next to its generated variants (w160/w480/w960 in WebP and JPEG) and a
+# manifest.json that is written last, in a storage backend from storage.py
+# (a local directory or a bucket). Identical uploads share one set.
+# `medicines.image_path` holds the bare hash, which names the whole variant
+# set. Because the bytes behind a URL never change, files can be served with
+# immutable cache headers.
+#
+# Resizing runs on a small bounded thread pool so the request thread only
+# hashes, validates and writes the original. With max_workers=0 (serverless,
+# where threads are frozen between requests) it runs in the request instead.
+# Pillow is imported on the first upload rather than at startup.
+
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+WIDTHS = (160, 480, 960)
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}),
+           'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+PIL_FORMATS = {'PNG': 'png', 'JPEG': 'jpg', 'GIF': 'gif', 'WEBP': 'webp'}
+MAX_PIXELS = 40 * 1000 * 1000
+
+log = logging.getLogger(__name__)
+
+_hash_re = re.compile(r'^[0-9a-f]{64}$')
+_variant_re = re.compile(r'^(original\.(png|jpg|gif|webp)|w\d+\.(webp|jpg)|manifest\.json)$')
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+class ImageQueueFull(Exception):
+    pass
+
+
+def is_content_id(value):
+    return bool(value) and bool(_hash_re.match(value))
+
+
+class ImageStore:
+    def __init__(self, storage, widths=WIDTHS, max_workers=2, max_pending=16):
+        self.storage = storage
+        self.widths = widths
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pid = None
+        self._lock = threading.Lock()
+
+    # ----- keys -----
+
+    def set_key(self, content_id):
+        return '%s/%s' % (content_id[:2], content_id)
+
+    def key_for(self, content_id, name):
+        if not is_content_id(content_id) or not _variant_re.match(name):
+            return None
+        return '%s/%s' % (self.set_key(content_id), name)
+
+    def original_name(self, content_id):
+        if not is_content_id(content_id):
+            return None
+        for ext in PIL_FORMATS.values():
+            name = 'original.' + ext
+            if self.storage.exists(self.key_for(content_id, name)):
+                return name
+        return None
+
+    def manifest(self, content_id):
+        key = self.key_for(content_id, 'manifest.json')
+        if key is None:
+            return None
+        try:
+            data = self.storage.read(key)
+            return json.loads(data) if data is not None else None
+        except (OSError, ValueError):
+            return None
+
+    # ----- worker pool -----
+
+    def _executor(self):
+        # One pool per process; a pool inherited through fork has no threads.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='image-variants')
+                    self._slots = threading.BoundedSemaphore(self.max_pending)
+                    self._pid = os.getpid()
+        return self._pool
+
+    def _reserve(self):
+        self._executor()
+        if not self._slots.acquire(blocking=False):
+            raise ImageQueueFull('Image processing queue is full, try again shortly')
+
+    def _submit(self, content_id, ext):
+        def run():
+            try:
+                self.generate_variants(content_id, ext)
+            except Exception:
+                log.exception('Generating variants for image %s failed', content_id)
+            finally:
+                self._slots.release()
+        return self._executor().submit(run)
+
+    # ----- upload -----
+
+    def store(self, data):
+        """Validate and store raw upload bytes, queue variant generation.
+
+        Returns the content id. Re-uploading bytes that are already stored
+        costs only the hash.
+        """
+        from PIL import Image
+
+        content_id = hashlib.sha256(data).hexdigest()
+        if self.manifest(content_id) is not None:
+            self.storage.touch(self.set_key(content_id))
+            return content_id
+
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                ext = PIL_FORMATS.get(img.format)
+                if ext is None:
+                    raise InvalidImage('Unsupported image format')
+                if img.width * img.height > MAX_PIXELS:
+                    raise InvalidImage('Image dimensions are too large')
+                img.verify()
+        except InvalidImage:
+            raise
+        except Exception:
+            raise InvalidImage('File is not a valid image')
+
+        original = self.key_for(content_id, 'original.' + ext)
+        if self.max_workers <= 0:
+            if not self.storage.exists(original):
+                self.storage.write(original, data)
+            try:
+                self.generate_variants(content_id, ext)
+            except Exception:
+                # served as the original until a re-upload generates them
+                log.exception('Generating variants for image %s failed', content_id)
+            return content_id
+
+        self._reserve()
+        try:
+            if not self.storage.exists(original):
+                self.storage.write(original, data)
+        except Exception:
+            self._slots.release()
+            raise
+        self._submit(content_id, ext)
+        return content_id
+
+    def generate_variants(self, content_id, ext):
+        from PIL import Image, ImageOps
+
+        with Image.open(io.BytesIO(self.storage.read(self.key_for(content_id, 'original.' + ext)))) as src:
+            img = ImageOps.exif_transpose(src)
+            img.load()
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+
+        variants = []
+        for width in self.widths:
+            if variants and width > img.width:
+                break
+            resized = img.copy()
+            resized.thumbnail((width, width * 10), Image.LANCZOS)
+            for fmt, (pil_format, options) in FORMATS.items():
+                out = resized
+                if pil_format == 'JPEG' and resized.mode == 'RGBA':
+                    out = Image.new('RGB', resized.size, (255, 255, 255))
+                    out.paste(resized, mask=resized.split()[3])
+                buf = io.BytesIO()
+                out.save(buf, pil_format, **options)
+                name = 'w%d.%s' % (width, fmt)
+                self.storage.write(self.key_for(content_id, name), buf.getvalue())
+                variants.append({'name': name, 'width': resized.width,
+                                 'height': resized.height, 'format': fmt})
+
+        manifest = {'id': content_id, 'original': 'original.' + ext,
+                    'width': img.width, 'height': img.height, 'variants': variants}
+        self.storage.write(self.key_for(content_id, 'manifest.json'), json.dumps(manifest).encode('utf-8'))
+        return manifest
+
+    # ----- garbage collection -----
+
+    def delete(self, content_id, grace=60):
+        """Remove one image set unless it was stored within `grace` seconds.
+
+        The grace period covers a concurrent upload of the same bytes for
+        another medicine that hasn't committed its reference yet; anything
+        skipped here is picked up by sweep().
+        """
+        if not is_content_id(content_id):
+            return False
+        modified = self.storage.modified(self.set_key(content_id))
+        if modified is None or modified > time.time() - grace:
+            return False
+        self.storage.delete(self.set_key(content_id))
+        return True
+
+    def sweep(self, referenced, grace=3600):
+        """Remove stored images not in `referenced` (a set of content ids).
+
+        Sets modified within `grace` seconds are kept, so an upload whose
+        database update hasn't committed yet is never swept.
+        """
+        removed = []
+        cutoff = time.time() - grace
+        for shard in self.storage.list():
+            if len(shard) != 2:
+                continue
+            for content_id in self.storage.list(shard):
+                if not is_content_id(content_id) or content_id in referenced:
+                    continue
+                modified = self.storage.modified(self.set_key(content_id))
+                if modified is None or modified > cutoff:
+                    continue
+                self.storage.delete(self.set_key(content_id))
+                removed.append(content_id)
+        return removed
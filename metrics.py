@@ -0,0 +1,378 @@
+# Request and database metrics, exposed in Prometheus text format.
+#
+# The app records every request into latency histograms labelled by endpoint,
+# method and status. Connections handed out by get_db() are wrapped so every
+# query adds to the current request's count, DB time and fetched rows. Queries
+# slower than a threshold are also kept with their SQL in a slow-query log.
+#
+# Metrics live in the worker process that served the request. With several
+# workers, each one exposes only its own numbers.
+#
+# The optional StackSampler captures the stacks of in-flight requests every few
+# milliseconds. When a request runs over its latency budget, its samples are
+# written as collapsed stacks ("frame;frame;frame count"), which flamegraph.pl
+# and speedscope read directly.
+
+import contextvars
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SLOW_QUERY_LOG_SIZE = 100
+
+slow_log = logging.getLogger('ai_doctor.slow_query')
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Counters, gauges and histograms keyed by (name, sorted labels)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}      # name -> (type, help)
+        self._series = {}    # name -> {labels tuple: value or Histogram}
+
+    def _declare(self, name, kind, help_text):
+        if name not in self._meta:
+            self._meta[name] = (kind, help_text)
+            self._series[name] = {}
+
+    def inc(self, name, value=1, help_text='', **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._declare(name, 'counter', help_text)
+            series = self._series[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, help_text='', kind='gauge', **labels):
+        """Set a gauge, or a counter whose total is kept elsewhere."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._declare(name, kind, help_text)
+            self._series[name][key] = value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, help_text='', **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._declare(name, 'histogram', help_text)
+            series = self._series[name]
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        out = []
+        with self._lock:
+            for name in sorted(self._meta):
+                kind, help_text = self._meta[name]
+                if help_text:
+                    out.append('# HELP %s %s' % (name, help_text))
+                out.append('# TYPE %s %s' % (name, kind))
+                for key, value in sorted(self._series[name].items()):
+                    if kind != 'histogram':
+                        out.append('%s%s %s' % (name, _labels(key), _num(value)))
+                        continue
+                    cumulative = 0
+                    for bound, n in zip(value.buckets + (float('inf'),), value.counts):
+                        cumulative += n
+                        le = '+Inf' if bound == float('inf') else _num(bound)
+                        out.append('%s_bucket%s %d' % (name, _labels(key + (('le', le),)), cumulative))
+                    out.append('%s_sum%s %s' % (name, _labels(key), _num(value.sum)))
+                    out.append('%s_count%s %d' % (name, _labels(key), value.count))
+        return '\n'.join(out) + '\n'
+
+
+def _labels(key):
+    if not key:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (k, _escape(v)) for k, v in key)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _num(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+# ----- per-request accounting -----
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'rows', 'connect_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.connect_time = 0.0
+
+
+def begin_request():
+    stats = RequestStats()
+    _current.set(stats)
+    return stats
+
+
+def end_request():
+    _current.set(None)
+
+
+def current_stats():
+    return _current.get()
+
+
+def stream_request(iterable, stats, finish):
+    """Wrap a streamed response body so the queries it runs count towards
+    the request, and call finish() once the stream ends or the client
+    disconnects (the server closes the iterable either way)."""
+    it = iter(iterable)
+    try:
+        while True:
+            _current.set(stats)
+            try:
+                chunk = next(it)
+            except StopIteration:
+                return
+            finally:
+                _current.set(None)
+            yield chunk
+    finally:
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            close()
+        finish()
+
+
+def observe_request(registry, endpoint, method, status, elapsed, stats):
+    registry.observe('http_request_duration_seconds', elapsed,
+                     help_text='Request latency by endpoint, method and status',
+                     endpoint=endpoint, method=method, status=str(status))
+    registry.observe('http_request_db_seconds', stats.db_time,
+                     help_text='Time spent in SQL per request', endpoint=endpoint)
+    registry.observe('http_request_db_queries', stats.queries, buckets=COUNT_BUCKETS,
+                     help_text='SQL statements per request', endpoint=endpoint)
+    registry.inc('http_request_db_rows_total', stats.rows,
+                 help_text='Rows fetched by requests', endpoint=endpoint)
+
+
+def server_timing(stats, elapsed):
+    """Server-Timing header value: pool wait, SQL and everything else
+    (mostly serialization), so a browser's network panel can split a slow
+    response."""
+    return 'db-wait;dur=%.1f, db;dur=%.1f;desc="%d queries", app;dur=%.1f' % (
+        stats.connect_time * 1000, stats.db_time * 1000, stats.queries,
+        max(0.0, elapsed - stats.db_time - stats.connect_time) * 1000)
+
+
+class QueryTracker:
+    """Wraps pooled connections so every query is timed and counted."""
+
+    def __init__(self, registry, slow_query_ms=200, log_size=SLOW_QUERY_LOG_SIZE):
+        self.registry = registry
+        self.slow_query_seconds = slow_query_ms / 1000.0
+        self.slow_queries = deque(maxlen=log_size)
+
+    @contextmanager
+    def connection(self, pool_connection):
+        started = time.perf_counter()
+        with pool_connection as conn:
+            self.record_acquire(time.perf_counter() - started)
+            yield TrackedConnection(conn, self)
+
+    def record_acquire(self, waited):
+        self.registry.observe('db_connection_acquire_seconds', waited,
+                              help_text='Time to get a connection from the pool')
+        stats = _current.get()
+        if stats is not None:
+            stats.connect_time += waited
+
+    def record(self, sql, elapsed, rows=0):
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+            stats.rows += rows
+        self.registry.observe('db_query_duration_seconds', elapsed,
+                              help_text='Duration of individual SQL statements')
+        if elapsed >= self.slow_query_seconds:
+            text = _compact_sql(sql)
+            self.registry.inc('db_slow_queries_total', help_text='Statements over the slow-query threshold')
+            self.slow_queries.append({'sql': text, 'ms': round(elapsed * 1000, 1),
+                                      'at': time.strftime('%Y-%m-%d %H:%M:%S')})
+            slow_log.warning('slow query (%.1f ms): %s', elapsed * 1000, text)
+
+    def add_rows(self, n):
+        stats = _current.get()
+        if stats is not None:
+            stats.rows += n
+
+
+class TrackedConnection:
+    def __init__(self, conn, tracker):
+        self._conn = conn
+        self._tracker = tracker
+
+    def cursor(self, *args, **kwargs):
+        return TrackedCursor(self._conn.cursor(*args, **kwargs), self._tracker)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class TrackedCursor:
+    def __init__(self, cursor, tracker):
+        self._cursor = cursor
+        self._tracker = tracker
+
+    def execute(self, sql, args=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, args)
+        finally:
+            self._tracker.record(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, args):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, args)
+        finally:
+            self._tracker.record(sql, time.perf_counter() - started)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._tracker.add_rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._tracker.add_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._tracker.add_rows(len(rows))
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._tracker.add_rows(1)
+            yield row
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._cursor.__exit__(*exc)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+_space_re = re.compile(r'\s+')
+
+
+def _compact_sql(sql, limit=2000):
+    text = _space_re.sub(' ', sql if isinstance(sql, str) else str(sql)).strip()
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+# ----- sampling profiler -----
+
+class StackSampler:
+    """Samples the stacks of registered threads every `interval` seconds."""
+
+    def __init__(self, out_dir, interval=0.005, max_depth=64):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.max_depth = max_depth
+        self._active = {}    # thread id -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._active = {}
+                threading.Thread(target=self._run, name='stack-sampler', daemon=True).start()
+
+    def start(self):
+        self._ensure_started()
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = Counter()
+        return ident
+
+    def stop(self, ident):
+        with self._lock:
+            return self._active.pop(ident, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                idents = list(self._active)
+            if not idents:
+                continue
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = self._collapse(frame)
+                with self._lock:
+                    samples = self._active.get(ident)
+                    if samples is not None:
+                        samples[stack] += 1
+
+    def _collapse(self, frame):
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append('%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def dump(self, samples, label):
+        """Write samples as collapsed stacks; returns the file path."""
+        os.makedirs(self.out_dir, exist_ok=True)
+        safe = re.sub(r'[^\w.-]+', '_', label)[:80]
+        path = os.path.join(self.out_dir, '%s-%d-%s.folded' % (
+            time.strftime('%Y%m%d-%H%M%S'), os.getpid(), safe))
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in samples.most_common():
+                f.write('%s %d\n' % (stack, count))
+        return path
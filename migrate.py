@@ -0,0 +1,174 @@
+# Versioned schema migrations.
+#
+# Migrations are plain SQL files in migrations/ named NNNN_description.sql and
+# applied in version order. Each applied version is recorded in
+# `schema_migrations` together with a checksum of the file, so editing a
+# migration after it ran is reported instead of silently ignored.
+#
+# MySQL commits DDL implicitly, so a migration can't be rolled back half way.
+# Statements are written to be repeatable instead, and the runner treats
+# "already exists" errors from an earlier interrupted run as success.
+# A named lock (GET_LOCK) keeps two deploys from migrating at once, and a
+# short lock_wait_timeout makes an ALTER that can't get its metadata lock
+# fail quickly instead of stalling live queries queued behind it.
+
+import hashlib
+import os
+import re
+import time
+
+import pymysql
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+LOCK_NAME = 'ai_doctor_schema_migrations'
+LOCK_WAIT_TIMEOUT = 10
+
+# MySQL error codes meaning the change is already in place
+ALREADY_APPLIED = {
+    1050: 'table already exists',
+    1060: 'duplicate column name',
+    1061: 'duplicate key name',
+    1091: 'column/key does not exist',
+}
+
+_filename_re = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name VARCHAR(200) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        duration_ms INT NOT NULL DEFAULT 0
+    )"""
+
+
+class MigrationError(Exception):
+    pass
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, encoding='utf-8') as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode('utf-8')).hexdigest()
+
+    def statements(self):
+        # One statement per `;` at the end of a line; `--` comment lines are
+        # dropped. Migrations don't define procedures, so this is enough.
+        lines = [line for line in self.sql.splitlines() if not line.strip().startswith('--')]
+        for stmt in re.split(r';\s*$', '\n'.join(lines), flags=re.M):
+            if stmt.strip():
+                yield stmt.strip()
+
+
+def discover(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        m = _filename_re.match(filename)
+        if m:
+            migrations.append(Migration(int(m.group(1)), m.group(2), os.path.join(directory, filename)))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError('Duplicate migration version in %s' % directory)
+    return migrations
+
+
+class Migrator:
+    def __init__(self, get_db, directory=MIGRATIONS_DIR, lock_wait_timeout=LOCK_WAIT_TIMEOUT, log=None):
+        self.get_db = get_db
+        self.directory = directory
+        self.lock_wait_timeout = lock_wait_timeout
+        self.log = log or (lambda msg: None)
+
+    def _applied(self, cursor):
+        cursor.execute(CREATE_TABLE_SQL)
+        cursor.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+        return {row['version']: row for row in cursor.fetchall()}
+
+    def status(self):
+        """[(migration, applied row or None, checksum changed)] in version order."""
+        with self.get_db() as conn:
+            with conn.cursor() as cursor:
+                applied = self._applied(cursor)
+        result = []
+        for m in discover(self.directory):
+            row = applied.get(m.version)
+            result.append((m, row, bool(row) and row['checksum'] != m.checksum))
+        return result
+
+    def migrate(self, target=None, dry_run=False):
+        """Apply pending migrations up to `target` (default: all).
+
+        Returns the migrations applied (or, with dry_run, that would be).
+        """
+        with self.get_db() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT GET_LOCK(%s, %s) AS locked", (LOCK_NAME, self.lock_wait_timeout))
+                if not cursor.fetchone()['locked']:
+                    raise MigrationError('Another migration run holds the lock')
+                try:
+                    return self._migrate(conn, cursor, target, dry_run)
+                finally:
+                    # the connection goes back to the pool afterwards
+                    cursor.execute("SET SESSION lock_wait_timeout = DEFAULT")
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+
+    def _migrate(self, conn, cursor, target, dry_run):
+        applied = self._applied(cursor)
+        pending = [m for m in discover(self.directory)
+                   if m.version not in applied and (target is None or m.version <= target)]
+        if dry_run:
+            return pending
+        cursor.execute("SET SESSION lock_wait_timeout = %s", (self.lock_wait_timeout,))
+        for m in pending:
+            self.log('Applying %04d_%s' % (m.version, m.name))
+            started = time.monotonic()
+            for stmt in m.statements():
+                try:
+                    cursor.execute(stmt)
+                except pymysql.MySQLError as e:
+                    code = e.args[0] if e.args else None
+                    if code not in ALREADY_APPLIED:
+                        conn.rollback()
+                        raise MigrationError('%04d_%s failed: %s' % (m.version, m.name, e))
+                    self.log('  skipped (%s): %s' % (ALREADY_APPLIED[code], stmt.splitlines()[0]))
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name, checksum, duration_ms) VALUES (%s, %s, %s, %s)",
+                (m.version, m.name, m.checksum, int((time.monotonic() - started) * 1000)))
+            conn.commit()
+        return pending
+
+
+# ----- query plan checks -----
+
+def explain(cursor, sql, params=()):
+    cursor.execute('EXPLAIN ' + sql, params)
+    return cursor.fetchall()
+
+
+def plan_problems(rows, allow_filesort=False, allow_scan=False):
+    """Full scans and filesorts on base tables in an EXPLAIN result.
+
+    Derived and union result tables (`<derived2>`, `<union1,2>`) are ignored:
+    they hold rows already cut down by the indexed scans that produced them.
+    Queries ordered by a computed value (a distance) always sort; for those
+    only the scans are checked. `allow_scan` is for small, fixed lookup
+    tables, where a full scan is the best plan.
+    """
+    problems = []
+    for row in rows:
+        table = row.get('table') or ''
+        if not table or table.startswith('<'):
+            continue
+        extra = row.get('Extra') or ''
+        if row.get('type') == 'ALL' and not allow_scan:
+            problems.append('full table scan on %s' % table)
+        elif row.get('type') == 'index' and 'Using where' in extra and not allow_scan:
+            problems.append('full index scan on %s' % table)
+        if 'Using filesort' in extra and not allow_filesort:
+            problems.append('filesort on %s' % table)
+    return problems
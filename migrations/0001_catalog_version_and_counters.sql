@@ -0,0 +1,14 @@
+-- Tables added after the original schema.sql, for databases created from it.
+
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 1
+);
+
+INSERT IGNORE INTO catalog_version (id, version) VALUES (1, 1);
+
+CREATE TABLE IF NOT EXISTS stat_counters (
+    name VARCHAR(100) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -0,0 +1,38 @@
+-- Composite indexes for the public read paths and the admin lists.
+-- Each is built online (InnoDB in-place, reads and writes continue), one
+-- index per statement so an interrupted run can simply be repeated.
+
+-- body-part page: WHERE body_part_id = ? AND is_active = 1 ORDER BY id
+ALTER TABLE illnesses
+    ADD INDEX idx_illnesses_part_active (body_part_id, is_active),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- body-part page: top doctors per part (and with no part) by experience
+ALTER TABLE doctors
+    ADD INDEX idx_doctors_part_active_exp (body_part_id, is_active, experience_years),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- admin doctors list, keyset on (name, id)
+ALTER TABLE doctors
+    ADD INDEX idx_doctors_name (name),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- public tips: WHERE is_active = 1 ORDER BY category, sort_order
+ALTER TABLE health_tips
+    ADD INDEX idx_health_tips_active_order (is_active, category, sort_order),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- admin tips list, keyset on (category, sort_order, id)
+ALTER TABLE health_tips
+    ADD INDEX idx_health_tips_order (category, sort_order),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- admin inbox, newest first, keyset on (created_at, id)
+ALTER TABLE contact_messages
+    ADD INDEX idx_contact_messages_created (created_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- unread filter and the unread counter recount
+ALTER TABLE contact_messages
+    ADD INDEX idx_contact_messages_unread (is_read, created_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,24 @@
+-- Doctor coordinates for the nearest-doctor search (see geo.py).
+--
+-- latitude/longitude are filled by `flask --app app geocode-doctors` and by
+-- the admin doctor routes. `location` mirrors them as a POINT (X = longitude,
+-- Y = latitude) so they can carry a SPATIAL index. It is INVISIBLE, so the
+-- SELECT * queries on doctors don't start returning geometry blobs.
+-- SPATIAL indexes need a NOT NULL column; doctors without coordinates sit at
+-- POINT(0, 0) and every nearby query filters them out on latitude.
+
+-- nullable columns at the end of the row: instant on MySQL 8.0.12+
+ALTER TABLE doctors
+    ADD COLUMN latitude DOUBLE NULL,
+    ADD COLUMN longitude DOUBLE NULL;
+
+-- a stored generated column rebuilds the table (reads continue, writes wait)
+ALTER TABLE doctors
+    ADD COLUMN location POINT
+        GENERATED ALWAYS AS (POINT(COALESCE(longitude, 0), COALESCE(latitude, 0))) STORED
+        NOT NULL SRID 0 INVISIBLE,
+    ALGORITHM=COPY, LOCK=SHARED;
+
+ALTER TABLE doctors
+    ADD SPATIAL INDEX idx_doctors_location (location),
+    ALGORITHM=INPLACE, LOCK=SHARED;
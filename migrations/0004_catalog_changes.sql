@@ -0,0 +1,13 @@
+-- Log of catalog writes by catalog version, for /api/catalog?since=<version>
+-- deltas (see changes.py).
+
+CREATE TABLE IF NOT EXISTS catalog_changes (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL,
+    entity VARCHAR(20) NOT NULL,
+    entity_id INT NULL,
+    op ENUM('insert', 'update', 'delete') NOT NULL,
+    body_part_id INT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_catalog_changes_version (version)
+);
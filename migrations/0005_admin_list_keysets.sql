@@ -0,0 +1,14 @@
+-- Indexes for the admin illness and medicine lists. Their keysets used to
+-- sort on the joined body part / illness name, which no index can serve,
+-- so every page sorted the whole join. They now sort on base-table columns;
+-- InnoDB appends the primary key, so these cover (..., name, id).
+
+-- admin illnesses list, keyset on (body_part_id, name, id)
+ALTER TABLE illnesses
+    ADD INDEX idx_illnesses_part_name (body_part_id, name),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- admin medicines list, keyset on (illness_id, name, id)
+ALTER TABLE medicines
+    ADD INDEX idx_medicines_illness_name (illness_id, name),
+    ALGORITHM=INPLACE, LOCK=NONE;
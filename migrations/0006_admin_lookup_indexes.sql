@@ -0,0 +1,11 @@
+-- Indexes for the remaining admin queries found by `flask explain-check`.
+
+-- medicine dropdown: WHERE is_active = 1 ORDER BY name
+ALTER TABLE illnesses
+    ADD INDEX idx_illnesses_active_name (is_active, name),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- releasing replaced images and gc-images: which content ids are still used
+ALTER TABLE medicines
+    ADD INDEX idx_medicines_image_path (image_path),
+    ALGORITHM=INPLACE, LOCK=NONE;
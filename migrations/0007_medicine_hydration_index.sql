@@ -0,0 +1,12 @@
+-- Index for the medicine batches that hydrate every body part page
+-- (catalog.MEDICINES_SQL: illness_id IN (...) ORDER BY illness_id, id).
+-- They used the index MySQL creates for the illness_id foreign key, which it
+-- drops silently once another index starts with illness_id, as
+-- idx_medicines_illness_name (0005) does; that index is ordered by name, so
+-- the batches sorted. With the appended primary key this one is in
+-- (illness_id, id) order.
+
+-- medicine hydration, ordered by (illness_id, id)
+ALTER TABLE medicines
+    ADD INDEX idx_medicines_illness (illness_id),
+    ALGORITHM=INPLACE, LOCK=NONE;
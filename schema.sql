@@ -88,8 +88,25 @@ CREATE TABLE IF NOT EXISTS health_tips (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Catalog version (single row). Bumped by every admin write so each worker's
+-- in-process catalog cache can tell when its entries are stale.
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 1
+);
+
+-- Dashboard counters (see counters.py), kept current by the write paths and
+-- periodically reconciled against the real tables.
+CREATE TABLE IF NOT EXISTS stat_counters (
+    name VARCHAR(100) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
 -- ===== DEFAULT DATA =====
 
+INSERT IGNORE INTO catalog_version (id, version) VALUES (1, 1);
+
 -- Admin user (password: admin123)
 INSERT IGNORE INTO admin_users (email, password, name) VALUES 
 ('admin@gmail.com', 'admin123', 'Administrator');
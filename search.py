@@ -0,0 +1,283 @@
+# In-memory typeahead index over illnesses, medicines and doctors.
+#
+# Two structures back each query:
+#   * a prefix trie over the normalized words of each document's name, for
+#     fast "starts with" matches while the user is typing;
+#   * a trigram inverted index over names (and illness symptoms /
+#     doctor specializations), which tolerates typos via trigram overlap.
+#
+# The index is built once from MySQL and then patched row by row when the
+# admin CRUD routes change something (see cache.IndexManager).
+
+import heapq
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+MAX_RESULTS = 10
+MIN_TRIGRAM_SCORE = 0.5
+TRIE_CANDIDATE_LIMIT = 200
+TRIGRAM_CANDIDATE_LIMIT = 200
+# A trigram shared by more than 1/STOP_GRAM_DIVISOR of all documents (and at
+# least STOP_GRAM_MIN of them) is ignored when scoring typo matches.
+STOP_GRAM_DIVISOR = 20
+STOP_GRAM_MIN = 500
+
+ILLNESS_SQL = """
+    SELECT i.id, i.name, i.symptoms, i.severity, bp.slug AS body_part
+    FROM illnesses i JOIN body_parts bp ON bp.id = i.body_part_id
+    WHERE i.is_active = 1"""
+
+MEDICINE_SQL = """
+    SELECT m.id, m.name, m.is_otc, m.illness_id, i.name AS illness_name
+    FROM medicines m JOIN illnesses i ON i.id = m.illness_id
+    WHERE i.is_active = 1"""
+
+DOCTOR_SQL = """
+    SELECT d.id, d.name, d.specialization, d.hospital, bp.slug AS body_part
+    FROM doctors d LEFT JOIN body_parts bp ON bp.id = d.body_part_id
+    WHERE d.is_active = 1"""
+
+_word_re = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def words(text):
+    return _word_re.findall(normalize(text))
+
+
+def trigrams(text):
+    grams = set()
+    for word in words(text):
+        padded = '  ' + word + ' '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class _TrieNode:
+    __slots__ = ('children', 'docs', 'ends')
+
+    def __init__(self):
+        self.children = {}
+        self.docs = set()   # documents with a name word starting here
+        self.ends = set()   # ... and ending here
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self.docs = {}
+        self._root = _TrieNode()
+        self._grams = defaultdict(set)
+        self._doc_grams = {}
+        self._doc_words = {}
+        self._rank = {}
+
+    # ----- building -----
+
+    def build(self, cursor):
+        illnesses = self._fetch(cursor, ILLNESS_SQL)
+        medicines = self._fetch(cursor, MEDICINE_SQL)
+        doctors = self._fetch(cursor, DOCTOR_SQL)
+        with self._lock:
+            self._clear()
+            for row in illnesses:
+                self.add_illness(row)
+            for row in medicines:
+                self.add_medicine(row)
+            for row in doctors:
+                self.add_doctor(row)
+
+    def _fetch(self, cursor, sql, where='', args=()):
+        cursor.execute(sql + where, args)
+        return cursor.fetchall()
+
+    def refresh(self, cursor, kind, doc_id):
+        # Re-read one row after an admin write and patch the index. An illness
+        # also takes its medicines with it, since deleting or deactivating it
+        # hides them too.
+        if kind == 'illness':
+            rows = self._fetch(cursor, ILLNESS_SQL, ' AND i.id = %s', (doc_id,))
+            meds = self._fetch(cursor, MEDICINE_SQL, ' AND m.illness_id = %s', (doc_id,))
+            with self._lock:
+                self.remove('illness', doc_id)
+                self.remove_medicines_of(doc_id)
+                for row in rows:
+                    self.add_illness(row)
+                for row in meds:
+                    self.add_medicine(row)
+        elif kind == 'medicine':
+            rows = self._fetch(cursor, MEDICINE_SQL, ' AND m.id = %s', (doc_id,))
+            with self._lock:
+                self.remove('medicine', doc_id)
+                for row in rows:
+                    self.add_medicine(row)
+        elif kind == 'doctor':
+            rows = self._fetch(cursor, DOCTOR_SQL, ' AND d.id = %s', (doc_id,))
+            with self._lock:
+                self.remove('doctor', doc_id)
+                for row in rows:
+                    self.add_doctor(row)
+
+    def add_illness(self, row):
+        self._add(('illness', row['id']), row['name'], (row.get('symptoms') or '').replace('|', ' '), {
+            'type': 'illness', 'id': row['id'], 'name': row['name'],
+            'severity': row.get('severity'), 'body_part': row.get('body_part'),
+        })
+
+    def add_medicine(self, row):
+        self._add(('medicine', row['id']), row['name'], '', {
+            'type': 'medicine', 'id': row['id'], 'name': row['name'],
+            'illness_id': row.get('illness_id'), 'illness': row.get('illness_name'),
+            'is_otc': bool(row.get('is_otc')),
+        })
+
+    def add_doctor(self, row):
+        self._add(('doctor', row['id']), row['name'], row.get('specialization') or '', {
+            'type': 'doctor', 'id': row['id'], 'name': row['name'],
+            'specialization': row.get('specialization'), 'hospital': row.get('hospital'),
+            'body_part': row.get('body_part'),
+        })
+
+    def _add(self, key, name, extra, payload):
+        with self._lock:
+            self.remove(*key)
+            self.docs[key] = payload
+            name_words = words(name)
+            self._doc_words[key] = name_words
+            # fixed candidate order when a prefix matches too many documents:
+            # shorter names first, as they score higher
+            self._rank[key] = (len(name_words), normalize(name), key)
+            for word in name_words:
+                node = self._root
+                for ch in word:
+                    node = node.children.setdefault(ch, _TrieNode())
+                    node.docs.add(key)
+                node.ends.add(key)
+            grams = trigrams(name) | trigrams(extra)
+            self._doc_grams[key] = grams
+            for g in grams:
+                self._grams[g].add(key)
+
+    def remove(self, kind, doc_id):
+        key = (kind, doc_id)
+        with self._lock:
+            if key not in self.docs:
+                return
+            del self.docs[key]
+            del self._rank[key]
+            for word in self._doc_words.pop(key, ()):
+                self._trie_remove(word, key)
+            for g in self._doc_grams.pop(key, ()):
+                bucket = self._grams.get(g)
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self._grams[g]
+
+    def _trie_remove(self, word, key):
+        path = [self._root]
+        for ch in word:
+            node = path[-1].children.get(ch)
+            if node is None:
+                return
+            node.docs.discard(key)
+            path.append(node)
+        path[-1].ends.discard(key)
+        # prune empty branches bottom-up
+        for i in range(len(word), 0, -1):
+            node = path[i]
+            if node.docs or node.children:
+                break
+            del path[i - 1].children[word[i - 1]]
+
+    def remove_medicines_of(self, illness_id):
+        with self._lock:
+            for key, doc in list(self.docs.items()):
+                if key[0] == 'medicine' and doc.get('illness_id') == illness_id:
+                    self.remove(*key)
+
+    # ----- querying -----
+
+    def _prefix_node(self, prefix):
+        node = self._root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def search(self, query, types=None, limit=MAX_RESULTS):
+        q_words = words(query)
+        if not q_words:
+            return []
+        limit = max(1, min(limit, 50))
+        scores = {}
+        rank = self._rank.__getitem__
+        with self._lock:
+            # Every query word must prefix-match some word of the name. A
+            # short prefix can match thousands of names; names with a word
+            # equal to a query word are kept first, then the shortest ones.
+            nodes = [self._prefix_node(w) for w in q_words]
+            if all(nodes):
+                sets = sorted((node.docs for node in nodes), key=len)
+
+                def matches(k):
+                    return (not types or k[0] in types) and all(k in docs for docs in sets)
+
+                whole_words = heapq.nsmallest(TRIE_CANDIDATE_LIMIT, {k for node in nodes for k in node.ends
+                                                                     if matches(k)}, key=rank)
+                candidates = set(whole_words)
+                candidates.update(heapq.nsmallest(
+                    TRIE_CANDIDATE_LIMIT - len(whole_words),
+                    (k for k in sets[0] if k not in candidates and matches(k)), key=rank))
+            else:
+                candidates = ()
+            for key in candidates:
+                name_words = self._doc_words[key]
+                exact = sum(1 for w in q_words if w in name_words)
+                starts = 1 if name_words and name_words[0].startswith(q_words[0]) else 0
+                scores[key] = 2.0 + exact * 0.5 + starts * 0.5 - len(name_words) * 0.01
+
+            # Trigram overlap catches typos and symptom/specialization hits.
+            # Very common trigrams carry little signal and cost the most to
+            # scan, so they are skipped.
+            q_grams = trigrams(query)
+            if q_grams and len(scores) < limit:
+                max_bucket = max(STOP_GRAM_MIN, len(self.docs) // STOP_GRAM_DIVISOR)
+                overlap = Counter()
+                for g in q_grams:
+                    bucket = self._grams.get(g, ())
+                    if len(bucket) > max_bucket:
+                        continue
+                    if types:
+                        bucket = [k for k in bucket if k[0] in types]
+                    overlap.update(bucket)
+                best = heapq.nsmallest(TRIGRAM_CANDIDATE_LIMIT, overlap.items(),
+                                       key=lambda kv: (-kv[1], rank(kv[0])))
+                for key, shared in best:
+                    recall = shared / float(len(q_grams))
+                    if recall < MIN_TRIGRAM_SCORE:
+                        break
+                    jaccard = shared / float(len(q_grams) + len(self._doc_grams[key]) - shared)
+                    scores[key] = max(scores.get(key, 0.0), recall + jaccard)
+
+            ranked = sorted(scores.items(), key=lambda kv: (-kv[1], self.docs[kv[0]]['name']))
+            return [dict(self.docs[key], score=round(score, 3)) for key, score in ranked[:limit]]
+
+    def stats(self):
+        with self._lock:
+            counts = defaultdict(int)
+            for kind, _ in self.docs:
+                counts[kind] += 1
+            return {'documents': dict(counts), 'trigrams': len(self._grams)}
+
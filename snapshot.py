@@ -0,0 +1,295 @@
+# Compiled, read-only copy of the public catalog.
+#
+# SnapshotCompiler reads every catalog payload (the body-parts list, each
+# body part page, the health tips and the full bundle) in one transaction
+# and writes them, already serialized, to a single file:
+#
+#     header   magic, catalog version, build time, record count, CRC-32
+#     offsets  one 8-byte file offset per record, in key order
+#     records  key length, body length, key bytes, body bytes
+#
+# Workers map the file with mmap, so all gunicorn processes on a host share
+# one copy in the page cache, and a lookup is a binary search over the
+# offset table. The file is replaced by rename, never rewritten, so a
+# reader keeps a complete old mapping or opens the complete new one.
+#
+# app.py answers from the snapshot when MySQL fails, and on a cache miss
+# when the snapshot is already at the current catalog version.
+
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from cache import VERSION_SQL
+from catalog import bundle_queries, run_queries
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent compiles just race for the rename
+    fcntl = None
+
+MAGIC = b'AIDCSNP1'
+HEADER = struct.Struct('<8sQdII')   # magic, version, built at, records, crc32 of the rest
+OFFSET = struct.Struct('<Q')
+RECORD = struct.Struct('<HI')       # key length, body length
+COMPILE_DELAY = 2.0
+CHECK_INTERVAL = 1.0
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def catalog_payloads(cursor, dumps):
+    """(catalog version, {cache key: serialized body}) for the whole catalog.
+
+    Bodies are byte-for-byte what the /api routes build, keyed like the
+    catalog cache entries.
+    """
+    cursor.execute(VERSION_SQL)
+    row = cursor.fetchone()
+    version = row['version'] if row else 0
+    bundle = run_queries(cursor, bundle_queries())
+    payloads = {
+        'body-parts': dumps({'success': True, 'data': [page['part'] for page in bundle['parts']]}),
+        'health-tips': dumps({'success': True, 'data': bundle['tips']}),
+    }
+    for page in bundle['parts']:
+        payloads['body-part:' + page['part']['slug']] = dumps({'success': True, 'data': page})
+    payloads['bundle'] = dumps({'success': True, 'data': dict(bundle, version=version, full=True, since=None)})
+    return version, payloads
+
+
+def write_snapshot(path, version, payloads):
+    """Atomically replace `path` with a snapshot of `payloads`; returns its size."""
+    keys = sorted(payloads)
+    offsets, records = [], bytearray()
+    base = HEADER.size + OFFSET.size * len(keys)
+    for key in keys:
+        name = key.encode('utf-8')
+        body = payloads[key]
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        offsets.append(base + len(records))
+        records += RECORD.pack(len(name), len(body)) + name + body
+    rest = b''.join(OFFSET.pack(offset) for offset in offsets) + records
+    header = HEADER.pack(MAGIC, version, time.time(), len(keys), zlib.crc32(rest))
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(header)
+        f.write(rest)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(header) + len(rest)
+
+
+def read_version(path):
+    """Catalog version in the header of the snapshot at `path`, or None."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(head) < HEADER.size or head[:len(MAGIC)] != MAGIC:
+        return None
+    return HEADER.unpack(head)[1]
+
+
+def static_name(key):
+    """Relative file name for a payload in a static export, or None to skip it."""
+    if key == 'bundle':
+        return 'catalog.json'
+    if key.startswith('body-part:'):
+        slug = key[len('body-part:'):]
+        if not slug or '/' in slug or '\\' in slug or slug.startswith('.'):
+            return None
+        return os.path.join('body-part', slug + '.json')
+    return key + '.json'
+
+
+class CatalogSnapshot:
+    """One mapped snapshot file. Immutable; safe to share between threads."""
+
+    def __init__(self, data, version, built_at, count):
+        self._data = data
+        self.version = version
+        self.built_at = built_at
+        self.count = count
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise SnapshotError('%s is truncated' % path)
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, built_at, count, crc = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise SnapshotError('%s is not a catalog snapshot' % path)
+        with memoryview(data) as view:
+            if zlib.crc32(view[HEADER.size:]) != crc:
+                raise SnapshotError('%s failed its checksum' % path)
+        return cls(data, version, built_at, count)
+
+    def _record(self, i):
+        offset = OFFSET.unpack_from(self._data, HEADER.size + i * OFFSET.size)[0]
+        key_len, body_len = RECORD.unpack_from(self._data, offset)
+        start = offset + RECORD.size
+        return start, key_len, body_len
+
+    def get(self, key):
+        """Body bytes stored under `key`, or None."""
+        name = key.encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, key_len, body_len = self._record(mid)
+            probe = self._data[start:start + key_len]
+            if probe < name:
+                lo = mid + 1
+            elif probe > name:
+                hi = mid
+            else:
+                return self._data[start + key_len:start + key_len + body_len]
+        return None
+
+    def text(self, key):
+        body = self.get(key)
+        return None if body is None else body.decode('utf-8')
+
+    def items(self):
+        for i in range(self.count):
+            start, key_len, body_len = self._record(i)
+            yield (self._data[start:start + key_len].decode('utf-8'),
+                   self._data[start + key_len:start + key_len + body_len])
+
+
+class SnapshotReader:
+    """Per-process handle on the snapshot file that follows replacements.
+
+    The file is stat'ed at most once per `check_interval`; when it changed
+    the new one is mapped. If the new file can't be opened the previous
+    mapping keeps serving.
+    """
+
+    def __init__(self, path, check_interval=CHECK_INTERVAL, on_error=None):
+        self.path = path
+        self.check_interval = check_interval
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._ident = None
+        self._checked_at = None
+
+    def current(self):
+        """The newest readable CatalogSnapshot, or None if there is none."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self._snapshot
+            self._checked_at = now
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return self._snapshot
+            ident = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if ident != self._ident:
+                self._ident = ident
+                try:
+                    self._snapshot = CatalogSnapshot.open(self.path)
+                except (OSError, ValueError, SnapshotError) as e:
+                    if self.on_error:
+                        self.on_error(e)
+            return self._snapshot
+
+    def stats(self):
+        snapshot = self.current()
+        if snapshot is None:
+            return {'path': self.path, 'version': None}
+        return {'path': self.path, 'version': snapshot.version, 'records': snapshot.count,
+                'bytes': self._ident[2] if self._ident else None,
+                'built_at': snapshot.built_at}
+
+
+class SnapshotCompiler:
+    """Builds the snapshot file from MySQL, on demand or shortly after writes.
+
+    `dumps` serializes a payload the way the routes do (app.json.dumps).
+    schedule() coalesces a burst of writes into one compile `delay` seconds
+    after the last of them, on a background thread of this process.
+    """
+
+    def __init__(self, path, get_db, dumps, delay=COMPILE_DELAY, on_error=None):
+        self.path = path
+        self.get_db = get_db
+        self.dumps = dumps
+        self.delay = delay
+        self.on_error = on_error
+        self.last_result = None
+        self._lock = threading.Lock()
+        self._due = None
+        self._pid = None
+        self._checked_pid = None
+
+    def compile(self, force=False):
+        """Write a snapshot of the committed catalog.
+
+        Returns {'version', 'records', 'bytes'}, or None when the file on
+        disk is already at that version or newer (unless `force`, e.g. after
+        a deploy that changed the payload format).
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # serialises compiles on this host, so an older build never
+        # replaces a newer one
+        with open(self.path + '.lock', 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            with self.get_db() as conn:
+                with conn.cursor() as cursor:
+                    version, payloads = catalog_payloads(cursor, self.dumps)
+            existing = read_version(self.path)
+            if not force and existing is not None and existing >= version:
+                return None
+            size = write_snapshot(self.path, version, payloads)
+        self.last_result = {'version': version, 'records': len(payloads), 'bytes': size}
+        return self.last_result
+
+    def schedule(self):
+        with self._lock:
+            self._due = time.monotonic() + self.delay
+            if self._pid == os.getpid():
+                return  # the running thread picks up the new due time
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name='catalog-snapshot', daemon=True).start()
+
+    def ensure_present(self):
+        """Once per process: schedule a compile if there's no snapshot yet."""
+        if self._checked_pid == os.getpid():
+            return
+        self._checked_pid = os.getpid()
+        if not os.path.exists(self.path):
+            self.schedule()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                wait = self._due - time.monotonic()
+                if wait <= 0:
+                    self._due = None
+            if wait > 0:
+                time.sleep(wait)
+                continue
+            try:
+                self.compile()
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+            with self._lock:
+                if self._due is None:
+                    self._pid = None
+                    return
@@ -0,0 +1,901 @@
+'use strict';
+let currentPage='home';
+let tipsLoaded=false;
+let currentSlug=null;
+let adminDataLoaded={illnesses:false,doctors:false,medicines:false,tips:false,messages:false};
+function showPage(name){
+document.querySelectorAll('.page').forEach(p=>p.classList.remove('active'));
+document.querySelectorAll('.nav-link').forEach(l=>l.classList.remove('active'));
+const page=document.getElementById(`page-${name}`);
+if(!page)return;
+page.classList.add('active');
+currentPage=name;
+const navLink=document.querySelector(`[data-page="${name}"]`);
+if(navLink)navLink.classList.add('active');
+const headerPages=['home','about','tips','contact'];
+document.getElementById('main-header').style.display=headerPages.includes(name)?'':'none';
+document.getElementById('main-footer').style.display=headerPages.includes(name)?'':'none';
+document.getElementById('main-nav').classList.remove('open');
+window.scrollTo({top:0,behavior:'smooth'});
+if(name==='tips'&&!tipsLoaded)loadHealthTips();
+if(name==='about')initScrollReveal();
+if(name==='admin')loadAdminDashboard();
+}
+function toggleMenu(){
+document.getElementById('main-nav').classList.toggle('open');
+}
+document.addEventListener('DOMContentLoaded',()=>{
+initBodyMap();
+initScrollReveal();
+updateTopbarDate();
+checkAdminSession();
+prefetchCatalog();
+document.addEventListener('visibilitychange',()=>{
+if(document.visibilityState==='visible'&&localCatalog)syncCatalog();
+});
+});
+function initBodyMap(){
+const parts=document.querySelectorAll('.body-part');
+const label=document.getElementById('hover-label');
+parts.forEach(part=>{
+part.addEventListener('mouseenter',()=>{
+label.textContent=part.dataset.label||part.dataset.part;
+document.querySelectorAll(`[data-part="${part.dataset.part}"]`).forEach(p=>{
+p.style.fill='rgba(0,180,216,0.25)';
+});
+});
+part.addEventListener('mouseleave',()=>{
+label.textContent='Hover to select';
+document.querySelectorAll(`[data-part="${part.dataset.part}"]`).forEach(p=>{
+p.style.fill='transparent';
+});
+});
+part.addEventListener('click',()=>{
+loadIllnessPage(part.dataset.part);
+});
+});
+}
+async function loadIllnessPage(slug){
+showPage('illness');
+const content=document.getElementById('illness-content');
+const title=document.getElementById('illness-page-title');
+const sub=document.getElementById('illness-page-sub');
+const badge=document.getElementById('part-badge');
+content.innerHTML=`<div class="loading-state"><div class="loader"></div><p>Loading health information...</p></div>`;
+title.textContent='';
+sub.textContent='';
+badge.textContent='';
+currentSlug=slug;
+try{
+const data=await getBodyPart(slug);
+if(!data.success){
+content.innerHTML=`<div class="loading-state"><div class="empty-icon">⚠️</div><p>Could not load data. Please try again.</p></div>`;
+return;
+}
+renderIllnessPage(slug,data.data);
+}catch(err){
+content.innerHTML=`<div class="loading-state"><div class="empty-icon">⚠️</div><p>Error: ${err.message}</p></div>`;
+console.error(err);
+}
+}
+function renderIllnessPage(slug,{part,illnesses,doctors}){
+const content=document.getElementById('illness-content');
+document.getElementById('part-badge').textContent='🔬 '+part.name;
+document.getElementById('illness-page-title').textContent=part.name+' — Health Information';
+document.getElementById('illness-page-sub').textContent=
+`Explore common conditions, symptoms, care tips, and specialists for ${part.name} health.`;
+let html=`<div class="illness-grid">`;
+if(!illnesses.length){
+html+=`<div class="ill-section"><p class="ill-desc">No illness data available for this body part yet. Please check back later.</p></div>`;
+}else{
+illnesses.forEach((ill,idx)=>{
+const sevClass=`severity-${ill.severity||'mild'}`;
+const sevLabel=(ill.severity||'mild').charAt(0).toUpperCase()+(ill.severity||'mild').slice(1);
+html+=`
+      <div class="ill-section">
+        <div class="ill-section-header">
+          <div class="ill-section-icon">${getIllnessIcon(ill.name)}</div>
+          <div>
+            <div class="ill-name">${escHtml(ill.name)}</div>
+            <span class="severity-badge ${sevClass}">${sevLabel} Severity</span>
+          </div>
+        </div>
+        <p class="ill-desc">${escHtml(ill.description)}</p>
+      </div>`;
+if(ill.symptoms_list&&ill.symptoms_list.length){
+html+=`
+        <div class="ill-section">
+          <div class="ill-section-header">
+            <div class="ill-section-icon">🔍</div>
+            <h3 class="ill-section-title">Symptoms — ${escHtml(ill.name)}</h3>
+          </div>
+          <ul class="symptoms-list">
+            ${ill.symptoms_list.map(s=>`<li>${escHtml(s)}</li>`).join('')}
+          </ul>
+        </div>`;
+}
+if(ill.care_list&&ill.care_list.length){
+html+=`
+        <div class="ill-section">
+          <div class="ill-section-header">
+            <div class="ill-section-icon">💚</div>
+            <h3 class="ill-section-title">Care Tips — ${escHtml(ill.name)}</h3>
+          </div>
+          <ul class="care-list">
+            ${ill.care_list.map(c=>`<li>${escHtml(c)}</li>`).join('')}
+          </ul>
+        </div>`;
+}
+if(ill.medicines&&ill.medicines.length){
+html+=`
+        <div class="ill-section">
+          <div class="ill-section-header">
+            <div class="ill-section-icon">💊</div>
+            <h3 class="ill-section-title">Medicine Information — ${escHtml(ill.name)}</h3>
+          </div>
+          <div class="med-warning">⚠️ Educational information only. Always consult a doctor before taking any medication.</div>
+          <div class="medicine-cards" style="margin-top:16px">
+            ${ill.medicines.map(m=>`
+              <div class="medicine-card">
+                <div class="med-card-name">${escHtml(m.name)}</div>
+                <span class="med-otc-badge ${m.is_otc?'otc-yes':'otc-no'}">${m.is_otc?'✓ Over-the-Counter':'⚕ Prescription Required'}</span>
+                <div class="med-field">${escHtml(m.description)}</div>
+                ${m.dosage?`<div class="med-field"><strong>Dosage:</strong> ${escHtml(m.dosage)}</div>`:''}
+                ${m.side_effects?`<div class="med-field"><strong>Side Effects:</strong> ${escHtml(m.side_effects)}</div>`:''}
+              </div>`).join('')}
+          </div>
+        </div>`;
+}
+if(idx<illnesses.length-1)html+=`<hr style="border:none;border-top:2px dashed var(--gray-100);margin:8px 0">`;
+});
+}
+if(doctors&&doctors.length){
+html+=`
+    <div class="ill-section">
+      <div class="ill-section-header">
+        <div class="ill-section-icon">👨‍⚕️</div>
+        <h3 class="ill-section-title" id="doctors-title">Recommended Specialists</h3>
+        ${navigator.geolocation?`<button type="button" class="btn-ghost" style="margin-left:auto" onclick="loadNearbyDoctors('${slug}', this)">📍 Near me</button>`:''}
+      </div>
+      <div class="doctors-grid" id="doctors-grid">
+        ${doctors.map(doctorCard).join('')}
+      </div>
+    </div>`;
+}
+html+=`</div>`;
+content.innerHTML=html;
+}
+const CATALOG_STORE='catalog';
+const CATALOG_SYNC_INTERVAL=60*1000;
+let localCatalog=null;
+let catalogDb=null;
+let catalogSync=null;
+let catalogSyncedAt=0;
+function openCatalogDb(){
+if(!catalogDb){
+catalogDb=new Promise((resolve,reject)=>{
+const req=indexedDB.open('ai-doctor',1);
+req.onupgradeneeded=()=>req.result.createObjectStore(CATALOG_STORE);
+req.onsuccess=()=>resolve(req.result);
+req.onerror=()=>reject(req.error);
+});
+}
+return catalogDb;
+}
+async function readStoredCatalog(){
+try{
+if(window.indexedDB){
+const db=await openCatalogDb();
+return await new Promise((resolve,reject)=>{
+const req=db.transaction(CATALOG_STORE).objectStore(CATALOG_STORE).get(CATALOG_STORE);
+req.onsuccess=()=>resolve(req.result||null);
+req.onerror=()=>reject(req.error);
+});
+}
+const saved=localStorage.getItem(CATALOG_STORE);
+return saved?JSON.parse(saved):null;
+}catch(err){
+return null;
+}
+}
+async function storeCatalog(catalog){
+try{
+if(window.indexedDB){
+const db=await openCatalogDb();
+await new Promise((resolve,reject)=>{
+const tx=db.transaction(CATALOG_STORE,'readwrite');
+tx.objectStore(CATALOG_STORE).put(catalog,CATALOG_STORE);
+tx.oncomplete=resolve;
+tx.onerror=()=>reject(tx.error);
+});
+}else{
+localStorage.setItem(CATALOG_STORE,JSON.stringify(catalog));
+}
+}catch(err){
+console.warn('Catalog not saved locally:',err);
+}
+}
+async function prefetchCatalog(){
+if(!localCatalog)localCatalog=await readStoredCatalog();
+if(!localCatalog&&navigator.connection&&navigator.connection.saveData)return;
+const idle=window.requestIdleCallback||(cb=>setTimeout(cb,2000));
+idle(()=>syncCatalog());
+}
+function syncCatalog(){
+if(catalogSync)return catalogSync;
+catalogSync=(async()=>{
+const since=localCatalog?`?since=${localCatalog.version}`:'';
+const res=await fetch(`/api/catalog${since}`);
+const data=await res.json();
+if(!data.success)throw new Error(data.message);
+const bundle=data.data;
+catalogSyncedAt=Date.now();
+if(!bundle.full&&bundle.version===localCatalog.version)return;
+const catalog=bundle.full
+?{version:bundle.version,parts:{},tips:{}}
+:{...localCatalog,version:bundle.version,parts:{...localCatalog.parts}};
+bundle.parts.forEach(page=>{catalog.parts[page.part.slug]=page;});
+if(bundle.tips)catalog.tips=bundle.tips;
+localCatalog=catalog;
+await storeCatalog(catalog);
+if(currentPage==='illness'&&bundle.parts.some(page=>page.part.slug===currentSlug)){
+renderIllnessPage(currentSlug,catalog.parts[currentSlug]);
+}
+if(bundle.tips&&tipsLoaded)loadHealthTips();
+})().catch(err=>console.warn('Catalog sync failed:',err))
+.finally(()=>{catalogSync=null;});
+return catalogSync;
+}
+function cachedCatalog(){
+if(localCatalog&&Date.now()-catalogSyncedAt>CATALOG_SYNC_INTERVAL)syncCatalog();
+return localCatalog;
+}
+async function getBodyPart(slug){
+const catalog=cachedCatalog();
+if(catalog&&catalog.parts[slug])return{success:true,data:catalog.parts[slug]};
+const res=await fetch(`/api/body-part/${slug}`);
+return res.json();
+}
+async function getHealthTips(){
+const catalog=cachedCatalog();
+if(catalog)return{success:true,data:catalog.tips};
+const res=await fetch('/api/health-tips');
+return res.json();
+}
+async function loadHealthTips(){
+const container=document.getElementById('tips-content');
+try{
+const data=await getHealthTips();
+if(!data.success)throw new Error(data.message);
+const grouped=data.data;
+const catConfig={
+'home_care':{label:'🏠 Home Care Tips',sub:'Daily habits for a healthier life',color:'--primary'},
+'medicine_safety':{label:'💊 Medicine Safety Tips',sub:'Stay safe with medications',color:'--success'},
+'nutrition':{label:'🥗 Nutrition Tips',sub:'Fuel your body right',color:'--warning'},
+'fitness':{label:'🏃 Fitness Tips',sub:'Move more, feel better',color:'--accent'},
+'mental_health':{label:'🧠 Mental Health Tips',sub:'Take care of your mind',color:'--primary'}
+};
+let html='';
+Object.entries(grouped).forEach(([cat,tips])=>{
+const cfg=catConfig[cat]||{label:cat,sub:'',color:'--primary'};
+html+=`
+      <div class="tips-section">
+        <div class="tips-section-header">
+          <div class="tips-section-title">${cfg.label}</div>
+        </div>
+        <div class="tips-section-sub" style="margin-bottom:16px;color:var(--text-muted);font-size:14px">${cfg.sub}</div>
+        <div class="tips-grid">
+          ${tips.map(t=>`
+            <div class="tip-card">
+              <div class="tip-icon">${t.icon||'💡'}</div>
+              <div class="tip-title">${escHtml(t.title)}</div>
+              <div class="tip-desc">${escHtml(t.description)}</div>
+            </div>`).join('')}
+        </div>
+      </div>`;
+});
+container.innerHTML=html;
+tipsLoaded=true;
+}catch(err){
+container.innerHTML=`<div class="loading-state"><p>Could not load tips: ${err.message}</p></div>`;
+}
+}
+async function submitContact(e){
+e.preventDefault();
+const btn=document.getElementById('contact-submit');
+btn.disabled=true;
+btn.innerHTML='<span>Sending...</span>';
+try{
+const res=await fetch('/api/contact',{
+method:'POST',
+headers:{'Content-Type':'application/json'},
+body:JSON.stringify({
+name:document.getElementById('contact-name').value,
+email:document.getElementById('contact-email').value,
+message:document.getElementById('contact-message').value
+})
+});
+const data=await res.json();
+if(data.success){
+document.getElementById('contact-success').style.display='flex';
+document.getElementById('contact-form').reset();
+showToast('Message sent successfully!','success');
+}else{
+showToast(data.message||'Failed to send message','error');
+}
+}catch(err){
+showToast('Network error. Please try again.','error');
+}finally{
+btn.disabled=false;
+btn.innerHTML='<span>Send Message</span><svg width="18" height="18" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><line x1="22" y1="2" x2="11" y2="13"/><polygon points="22 2 15 22 11 13 2 9 22 2"/></svg>';
+}
+}
+async function adminLogin(e){
+e.preventDefault();
+const email=document.getElementById('admin-email').value;
+const password=document.getElementById('admin-password').value;
+const errDiv=document.getElementById('login-error');
+errDiv.style.display='none';
+try{
+const res=await fetch('/admin/login',{
+method:'POST',
+headers:{'Content-Type':'application/json'},
+body:JSON.stringify({email,password})
+});
+const data=await res.json();
+if(data.success){
+document.getElementById('admin-user-info').innerHTML=`Logged in as<br><strong style="color:white">${data.name}</strong>`;
+document.getElementById('admin-nav-link').style.display='';
+showPage('admin');
+adminTab('dashboard');
+}else{
+errDiv.textContent=data.message||'Invalid credentials';
+errDiv.style.display='block';
+}
+}catch(err){
+errDiv.textContent='Connection error: '+err.message;
+errDiv.style.display='block';
+}
+}
+async function adminLogout(){
+await fetch('/admin/logout',{method:'POST'});
+stopAdminFeed();
+document.getElementById('admin-nav-link').style.display='none';
+showPage('home');
+showToast('Logged out successfully','info');
+}
+async function checkAdminSession(){
+try{
+const res=await fetch('/admin/check');
+const data=await res.json();
+if(data.success){
+document.getElementById('admin-user-info').innerHTML=`Logged in as<br><strong style="color:white">${data.name}</strong>`;
+document.getElementById('admin-nav-link').style.display='';
+}
+}catch(e){}
+}
+function toggleAdminPass(btn){
+const inp=btn.previousElementSibling;
+inp.type=inp.type==='password'?'text':'password';
+btn.textContent=inp.type==='password'?'👁':'🙈';
+}
+function loadAdminDashboard(){
+updateTopbarDate();
+loadAdminStats();
+startAdminFeed();
+}
+async function loadAdminStats(){
+try{
+const res=await fetch('/admin/stats');
+const data=await res.json();
+if(data.success)showAdminStats(data.data);
+}catch(e){}
+}
+function showAdminStats(s){
+document.getElementById('stat-illnesses').textContent=s.illnesses;
+document.getElementById('stat-doctors').textContent=s.doctors;
+document.getElementById('stat-medicines').textContent=s.medicines;
+document.getElementById('stat-messages').textContent=s.messages;
+const badge=document.getElementById('msg-badge');
+badge.textContent=s.messages;
+badge.style.display=s.messages>0?'':'none';
+}
+function adminTab(name){
+document.querySelectorAll('.admin-tab').forEach(t=>t.classList.remove('active'));
+document.querySelectorAll('.sidebar-link').forEach(l=>l.classList.remove('active'));
+document.getElementById(`atab-${name}`).classList.add('active');
+document.getElementById(`tab-${name==='tips'?'tips-admin':name}`).classList.add('active');
+const titles={
+'dashboard':'Dashboard Overview','illnesses':'Manage Illnesses',
+'doctors':'Manage Doctors','medicines':'Manage Medicines',
+'tips':'Manage Health Tips','messages':'Contact Messages'
+};
+document.getElementById('admin-page-title').textContent=titles[name]||'Admin Panel';
+if(name==='illnesses'&&!adminDataLoaded.illnesses)loadAdminIllnesses();
+if(name==='doctors'&&!adminDataLoaded.doctors)loadAdminDoctors();
+if(name==='medicines'&&!adminDataLoaded.medicines)loadAdminMedicines();
+if(name==='tips'&&!adminDataLoaded.tips)loadAdminTips();
+if(name==='messages'&&!adminDataLoaded.messages)loadAdminMessages();
+}
+const ADMIN_PAGE_SIZE=100;
+async function loadAdminTable(el,url,opts){
+const token=String(Date.now()+Math.random());
+el.dataset.loadToken=token;
+el.innerHTML=`<div class="loading-state"><div class="loader"></div><p>Loading...</p></div>`;
+let tbody=null;
+let after=null;
+do{
+const sep=url.includes('?')?'&':'?';
+const res=await fetch(`${url}${sep}limit=${ADMIN_PAGE_SIZE}${after?'&after='+encodeURIComponent(after):''}`);
+const data=await res.json();
+if(el.dataset.loadToken!==token)return false;
+if(!data.success)throw new Error(data.message);
+if(!tbody){
+if(!data.data.length){
+el.innerHTML=opts.empty;
+return true;
+}
+el.innerHTML=`
+      <table class="admin-table">
+        <thead><tr>${opts.head}</tr></thead>
+        <tbody></tbody>
+      </table>`;
+tbody=el.querySelector('tbody');
+}
+tbody.insertAdjacentHTML('beforeend',data.data.map(opts.row).join(''));
+after=data.next;
+}while(after);
+return true;
+}
+const illnessRow=i=>`<tr data-id="${i.id}">
+  <td>#${i.id}</td>
+  <td><span style="background:var(--gray-100);padding:2px 8px;border-radius:4px;font-size:12px">${escHtml(i.body_part_name)}</span></td>
+  <td><strong>${escHtml(i.name)}</strong></td>
+  <td><span class="severity-badge severity-${i.severity}">${i.severity}</span></td>
+  <td><span style="color:${i.is_active?'var(--success)':'var(--danger)'}">●</span> ${i.is_active?'Active':'Inactive'}</td>
+  <td><button class="btn-danger" onclick="deleteIllness(${i.id})">Delete</button></td>
+</tr>`;
+async function loadAdminIllnesses(){
+const el=document.getElementById('illnesses-table');
+try{
+const done=await loadAdminTable(el,'/admin/illnesses',{
+head:`<th>ID</th><th>Body Part</th><th>Name</th><th>Severity</th><th>Status</th><th>Actions</th>`,
+empty:`<div class="empty-state"><div class="empty-icon">🦠</div><p>No illnesses added yet.</p></div>`,
+row:illnessRow
+});
+if(done)adminDataLoaded.illnesses=true;
+}catch(e){
+el.innerHTML=`<div class="empty-state"><p>Error: ${e.message}</p></div>`;
+}
+}
+async function saveIllness(e){
+e.preventDefault();
+const body={
+body_part_id:document.getElementById('ill-body-part').value,
+name:document.getElementById('ill-name').value,
+description:document.getElementById('ill-description').value,
+symptoms:document.getElementById('ill-symptoms').value,
+care_tips:document.getElementById('ill-care').value,
+severity:document.getElementById('ill-severity').value
+};
+try{
+const res=await fetch('/admin/illness',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(body)});
+const data=await res.json();
+if(data.success){
+closeModal('illness-modal');
+document.getElementById('illness-form').reset();
+pollAdminChanges();
+showToast('Illness added successfully!','success');
+}else showToast(data.message,'error');
+}catch(e){showToast('Error: '+e.message,'error');}
+}
+async function deleteIllness(id){
+if(!confirm('Delete this illness? Related medicines will also be deleted.'))return;
+try{
+await fetch(`/admin/illness/${id}`,{method:'DELETE'});
+pollAdminChanges();
+showToast('Illness deleted','success');
+}catch(e){showToast('Error deleting','error');}
+}
+const doctorRow=d=>`<tr data-id="${d.id}">
+  <td><strong>${escHtml(d.name)}</strong></td>
+  <td>${escHtml(d.specialization)}</td>
+  <td><span style="background:var(--gray-100);padding:2px 8px;border-radius:4px;font-size:12px">${escHtml(d.body_part_name||'General')}</span></td>
+  <td>${escHtml(d.hospital||'—')}</td>
+  <td>${escHtml(d.phone||'—')}</td>
+  <td>${d.experience_years}y</td>
+  <td><button class="btn-danger" onclick="deleteDoctor(${d.id})">Delete</button></td>
+</tr>`;
+async function loadAdminDoctors(){
+const el=document.getElementById('doctors-table');
+try{
+const done=await loadAdminTable(el,'/admin/doctors',{
+head:`<th>Name</th><th>Specialization</th><th>Body Part</th><th>Hospital</th><th>Phone</th><th>Exp.</th><th>Actions</th>`,
+empty:`<div class="empty-state"><div class="empty-icon">👨‍⚕️</div><p>No doctors added yet.</p></div>`,
+row:doctorRow
+});
+if(done)adminDataLoaded.doctors=true;
+}catch(e){
+el.innerHTML=`<div class="empty-state"><p>Error: ${e.message}</p></div>`;
+}
+}
+async function saveDoctor(e){
+e.preventDefault();
+const body={
+body_part_id:document.getElementById('doc-body-part').value||null,
+name:document.getElementById('doc-name').value,
+specialization:document.getElementById('doc-spec').value,
+hospital:document.getElementById('doc-hospital').value,
+phone:document.getElementById('doc-phone').value,
+email:document.getElementById('doc-email').value,
+address:document.getElementById('doc-address').value,
+experience_years:parseInt(document.getElementById('doc-exp').value)||0
+};
+try{
+const res=await fetch('/admin/doctor',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(body)});
+const data=await res.json();
+if(data.success){
+closeModal('doctor-modal');
+document.getElementById('doctor-form').reset();
+pollAdminChanges();
+showToast('Doctor added successfully!','success');
+}else showToast(data.message,'error');
+}catch(e){showToast('Error: '+e.message,'error');}
+}
+async function deleteDoctor(id){
+if(!confirm('Delete this doctor?'))return;
+try{
+await fetch(`/admin/doctor/${id}`,{method:'DELETE'});
+pollAdminChanges();
+showToast('Doctor deleted','success');
+}catch(e){}
+}
+const medicineRow=m=>`<tr data-id="${m.id}">
+  <td><strong>${escHtml(m.name)}</strong></td>
+  <td>${escHtml(m.illness_name)}</td>
+  <td style="font-size:12px;color:var(--text-muted)">${escHtml(m.dosage||'—')}</td>
+  <td><span style="background:${m.is_otc?'#e7f7ef':'#fff3e0'};color:${m.is_otc?'#2d9970':'#e65100'};padding:2px 8px;border-radius:4px;font-size:12px">${m.is_otc?'OTC':'Rx'}</span></td>
+  <td>
+    <button class="btn-danger" onclick="deleteMedicine(${m.id})">Delete</button>
+  </td>
+</tr>`;
+async function loadAdminMedicines(){
+const el=document.getElementById('medicines-table');
+try{
+const done=await loadAdminTable(el,'/admin/medicines',{
+head:`<th>Medicine</th><th>Related Illness</th><th>Dosage</th><th>Type</th><th>Actions</th>`,
+empty:`<div class="empty-state"><div class="empty-icon">💊</div><p>No medicines added yet.</p></div>`,
+row:medicineRow
+});
+if(done)adminDataLoaded.medicines=true;
+}catch(e){
+el.innerHTML=`<div class="empty-state"><p>Error: ${e.message}</p></div>`;
+}
+}
+async function saveMedicine(e){
+e.preventDefault();
+const body={
+illness_id:document.getElementById('med-illness').value,
+name:document.getElementById('med-name').value,
+description:document.getElementById('med-description').value,
+dosage:document.getElementById('med-dosage').value,
+side_effects:document.getElementById('med-sides').value,
+is_otc:parseInt(document.getElementById('med-otc').value)
+};
+try{
+const res=await fetch('/admin/medicine',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(body)});
+const data=await res.json();
+if(data.success){
+closeModal('medicine-modal');
+document.getElementById('medicine-form').reset();
+pollAdminChanges();
+showToast('Medicine added successfully!','success');
+}else showToast(data.message,'error');
+}catch(e){showToast('Error: '+e.message,'error');}
+}
+async function deleteMedicine(id){
+if(!confirm('Delete this medicine?'))return;
+try{
+await fetch(`/admin/medicine/${id}`,{method:'DELETE'});
+pollAdminChanges();
+showToast('Medicine deleted','success');
+}catch(e){}
+}
+const tipRow=t=>`<tr data-id="${t.id}">
+  <td style="font-size:20px">${t.icon||'💡'}</td>
+  <td><strong>${escHtml(t.title)}</strong></td>
+  <td><span style="background:var(--gray-100);padding:2px 8px;border-radius:4px;font-size:12px">${t.category.replace('_',' ')}</span></td>
+  <td><span style="color:${t.is_active?'var(--success)':'var(--danger)'}">●</span></td>
+  <td><button class="btn-danger" onclick="deleteTip(${t.id})">Delete</button></td>
+</tr>`;
+async function loadAdminTips(){
+const el=document.getElementById('tips-table');
+try{
+const done=await loadAdminTable(el,'/admin/tips',{
+head:`<th>Icon</th><th>Title</th><th>Category</th><th>Active</th><th>Actions</th>`,
+empty:`<div class="empty-state"><div class="empty-icon">💡</div><p>No tips added yet.</p></div>`,
+row:tipRow
+});
+if(done)adminDataLoaded.tips=true;
+}catch(e){
+el.innerHTML=`<div class="empty-state"><p>Error: ${e.message}</p></div>`;
+}
+}
+async function saveTip(e){
+e.preventDefault();
+const body={
+category:document.getElementById('tip-category').value,
+title:document.getElementById('tip-title').value,
+description:document.getElementById('tip-description').value,
+icon:document.getElementById('tip-icon').value||'💡'
+};
+try{
+const res=await fetch('/admin/tip',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(body)});
+const data=await res.json();
+if(data.success){
+closeModal('tip-modal');
+document.getElementById('tip-form').reset();
+pollAdminChanges();
+showToast('Health tip added!','success');
+}else showToast(data.message,'error');
+}catch(e){showToast('Error: '+e.message,'error');}
+}
+async function deleteTip(id){
+if(!confirm('Delete this tip?'))return;
+try{
+await fetch(`/admin/tip/${id}`,{method:'DELETE'});
+pollAdminChanges();
+showToast('Tip deleted','success');
+}catch(e){}
+}
+const messageRow=m=>`<tr data-id="${m.id}">
+  <td><strong>${escHtml(m.name)}</strong></td>
+  <td><a href="mailto:${escHtml(m.email)}" style="color:var(--primary-light)">${escHtml(m.email)}</a></td>
+  <td style="max-width:300px;overflow:hidden;text-overflow:ellipsis;white-space:nowrap">${escHtml(m.message)}</td>
+  <td style="font-size:12px;color:var(--text-muted)">${new Date(m.created_at).toLocaleDateString()}</td>
+  <td>
+    ${m.is_read?'<span style="color:var(--success);font-size:12px">✓ Read</span>':
+`<button onclick="markRead(${m.id})" style="background:var(--primary);color:white;border:none;padding:4px 10px;border-radius:4px;font-size:11px;cursor:pointer">Mark Read</button>`}
+  </td>
+</tr>`;
+async function loadAdminMessages(){
+const el=document.getElementById('messages-table');
+try{
+const done=await loadAdminTable(el,'/admin/messages',{
+head:`<th>Name</th><th>Email</th><th>Message</th><th>Date</th><th>Status</th>`,
+empty:`<div class="empty-state"><div class="empty-icon">💬</div><p>No messages yet.</p></div>`,
+row:messageRow
+});
+if(done)adminDataLoaded.messages=true;
+}catch(e){
+el.innerHTML=`<div class="empty-state"><p>Error: ${e.message}</p></div>`;
+}
+}
+async function markRead(id){
+try{
+await fetch(`/admin/message/${id}/read`,{method:'POST'});
+pollAdminChanges();
+showToast('Message marked as read','success');
+}catch(e){}
+}
+const FEED_TABLES={
+illness:{el:'illnesses-table',flag:'illnesses',row:illnessRow,load:()=>loadAdminIllnesses()},
+doctor:{el:'doctors-table',flag:'doctors',row:doctorRow,load:()=>loadAdminDoctors()},
+medicine:{el:'medicines-table',flag:'medicines',row:medicineRow,load:()=>loadAdminMedicines()},
+tip:{el:'tips-table',flag:'tips',row:tipRow,load:()=>loadAdminTips()},
+message:{el:'messages-table',flag:'messages',row:messageRow,load:()=>loadAdminMessages()}
+};
+const CATALOG_TABLES=['illness','doctor','medicine','tip'];
+const ADMIN_POLL_MS=5000;
+let adminSeq=null;
+let adminStream=null;
+let adminPollTimer=null;
+async function startAdminFeed(){
+if(adminStream)return;
+try{
+if(adminSeq===null){
+const res=await fetch('/admin/changes');
+const data=await res.json();
+if(!data.success)return;
+adminSeq=data.data.seq;
+}
+if(adminStream||adminPollTimer)return;
+if(!window.EventSource)return pollAdminFeed();
+adminStream=new EventSource(`/admin/changes/stream?since=${adminSeq}`);
+adminStream.addEventListener('changes',e=>applyAdminChanges(JSON.parse(e.data)));
+adminStream.addEventListener('error',()=>{
+if(adminStream&&adminStream.readyState===EventSource.CLOSED){
+adminStream=null;
+pollAdminFeed();
+}
+});
+}catch(e){}
+}
+function pollAdminFeed(){
+if(!adminPollTimer)adminPollTimer=setInterval(pollAdminChanges,ADMIN_POLL_MS);
+}
+function stopAdminFeed(){
+if(adminStream)adminStream.close();
+if(adminPollTimer)clearInterval(adminPollTimer);
+adminStream=null;
+adminPollTimer=null;
+adminSeq=null;
+}
+async function pollAdminChanges(){
+if(adminSeq===null)return startAdminFeed();
+try{
+const res=await fetch(`/admin/changes?since=${adminSeq}`);
+const data=await res.json();
+if(!data.success)return;
+applyAdminChanges(data.data);
+if(data.data.more)pollAdminChanges();
+}catch(e){}
+}
+function reloadAdminTable(entity){
+const table=FEED_TABLES[entity];
+if(adminDataLoaded[table.flag])table.load();
+}
+function applyAdminChanges(payload){
+if(payload.seq<=adminSeq&&!payload.reset)return;
+adminSeq=payload.seq;
+let catalogChanged=payload.reset;
+if(payload.reset)Object.keys(FEED_TABLES).forEach(reloadAdminTable);
+payload.changes.forEach(change=>{
+if(change.entity==='catalog'||CATALOG_TABLES.includes(change.entity))catalogChanged=true;
+if(change.op==='reload'){
+(change.entity==='catalog'?CATALOG_TABLES:[change.entity]).forEach(reloadAdminTable);
+return;
+}
+const table=FEED_TABLES[change.entity];
+if(!table||!adminDataLoaded[table.flag])return;
+const tbody=document.getElementById(table.el).querySelector('tbody');
+const current=tbody&&tbody.querySelector(`tr[data-id="${change.id}"]`);
+if(change.op==='delete'){
+if(current)current.remove();
+return;
+}
+if(!tbody)return table.load();
+const prev=change.prev===null?null:tbody.querySelector(`tr[data-id="${change.prev}"]`);
+if(change.prev!==null&&!prev)return reloadAdminTable(change.entity);
+if(current)current.remove();
+if(prev)prev.insertAdjacentHTML('afterend',table.row(change.row));
+else tbody.insertAdjacentHTML('afterbegin',table.row(change.row));
+});
+if(payload.stats)showAdminStats(payload.stats);
+else if(payload.reset)loadAdminStats();
+if(catalogChanged)syncCatalog();
+}
+async function openModal(id){
+const modal=document.getElementById(id);
+modal.classList.add('open');
+if(id==='illness-modal'||id==='doctor-modal'){
+const res=await fetch('/admin/body-parts');
+const data=await res.json();
+if(data.success){
+const selectId=id==='illness-modal'?'ill-body-part':'doc-body-part';
+const select=document.getElementById(selectId);
+const addEmpty=id==='doctor-modal';
+select.innerHTML=(addEmpty?'<option value="">-- General / All --</option>':'')+
+data.data.map(p=>`<option value="${p.id}">${p.name}</option>`).join('');
+}
+}
+if(id==='medicine-modal'){
+const res=await fetch('/admin/illnesses-list');
+const data=await res.json();
+if(data.success){
+document.getElementById('med-illness').innerHTML=data.data.map(i=>`<option value="${i.id}">${i.name}</option>`).join('');
+}
+document.getElementById('med-upload-group').style.display='none';
+}
+}
+function closeModal(id){
+document.getElementById(id).classList.remove('open');
+}
+document.addEventListener('click',(e)=>{
+if(e.target.classList.contains('modal-overlay')){
+e.target.classList.remove('open');
+}
+});
+function initScrollReveal(){
+const observer=new IntersectionObserver((entries)=>{
+entries.forEach((entry,i)=>{
+if(entry.isIntersecting){
+setTimeout(()=>{
+entry.target.classList.add('revealed');
+},i*100);
+}
+});
+},{threshold:0.1,rootMargin:'0px 0px -50px 0px'});
+document.querySelectorAll('.scroll-reveal').forEach(el=>observer.observe(el));
+}
+function showToast(message,type='info'){
+const toast=document.getElementById('toast');
+toast.textContent=message;
+toast.className=`toast show ${type}`;
+setTimeout(()=>toast.classList.remove('show'),3500);
+}
+function doctorCard(d){
+return`
+    <div class="doctor-card">
+      <div class="doc-avatar">${getDoctorEmoji(d.specialization)}</div>
+      <div class="doc-name">${escHtml(d.name)}</div>
+      <div class="doc-spec">${escHtml(d.specialization)}</div>
+      ${d.hospital?`<div class="doc-hospital">🏥 ${escHtml(d.hospital)}</div>`:''}
+      ${d.distance_km!=null?`<div class="doc-hospital">📍 ${d.distance_km<10?d.distance_km.toFixed(1):Math.round(d.distance_km)} km away</div>`:''}
+      <div class="doc-contacts">
+        ${d.phone?`<div class="doc-contact-item">📞 <a href="tel:${escHtml(d.phone)}" style="color:var(--primary-light)">${escHtml(d.phone)}</a></div>`:''}
+        ${d.email?`<div class="doc-contact-item">📧 <a href="mailto:${escHtml(d.email)}" style="color:var(--primary-light)">${escHtml(d.email)}</a></div>`:''}
+      </div>
+      ${d.experience_years?`<span class="doc-exp">${d.experience_years} years experience</span>`:''}
+    </div>`;
+}
+function loadNearbyDoctors(slug,btn){
+btn.disabled=true;
+navigator.geolocation.getCurrentPosition(async pos=>{
+try{
+const{latitude,longitude}=pos.coords;
+const res=await fetch(`/api/doctors/nearby?lat=${latitude}&lon=${longitude}&body_part=${encodeURIComponent(slug)}&k=6`);
+const data=await res.json();
+if(!data.success)throw new Error(data.message);
+if(!data.data.length){
+showToast(`No specialists found within ${data.radius_km} km`,'info');
+btn.disabled=false;
+return;
+}
+document.getElementById('doctors-title').textContent='Specialists Near You';
+document.getElementById('doctors-grid').innerHTML=data.data.map(doctorCard).join('');
+btn.remove();
+}catch(err){
+showToast('Could not load nearby doctors','error');
+btn.disabled=false;
+}
+},()=>{
+showToast('Location access was denied','error');
+btn.disabled=false;
+});
+}
+function escHtml(str){
+if(!str)return'';
+return String(str)
+.replace(/&/g,'&amp;')
+.replace(/</g,'&lt;')
+.replace(/>/g,'&gt;')
+.replace(/"/g,'&quot;')
+.replace(/'/g,'&#39;');
+}
+function updateTopbarDate(){
+const el=document.getElementById('topbar-date');
+if(el)el.textContent=new Date().toLocaleDateString('en-US',{weekday:'short',year:'numeric',month:'short',day:'numeric'});
+}
+function getIllnessIcon(name){
+const n=(name||'').toLowerCase();
+if(n.includes('migrain')||n.includes('headache'))return'🤕';
+if(n.includes('sinus'))return'🤧';
+if(n.includes('cancer')||n.includes('tumor'))return'🔴';
+if(n.includes('heart')||n.includes('cardiac'))return'❤️';
+if(n.includes('lung')||n.includes('pneumon')||n.includes('breath'))return'🫁';
+if(n.includes('stomach')||n.includes('gastri')||n.includes('ibs'))return'🫃';
+if(n.includes('knee')||n.includes('arthrit'))return'🦵';
+if(n.includes('back')||n.includes('spine')||n.includes('disc'))return'🦴';
+if(n.includes('shoulder')||n.includes('rotator'))return'💪';
+if(n.includes('foot')||n.includes('feet')||n.includes('plantar')||n.includes('gout'))return'🦶';
+if(n.includes('neck')||n.includes('cervical'))return'🧍';
+if(n.includes('carpal')||n.includes('wrist')||n.includes('elbow'))return'🖐';
+if(n.includes('varicose')||n.includes('vein'))return'🩸';
+if(n.includes('frozen'))return'🧊';
+return'🏥';
+}
+function getDoctorEmoji(spec){
+const s=(spec||'').toLowerCase();
+if(s.includes('neuro')||s.includes('brain'))return'🧠';
+if(s.includes('cardio')||s.includes('heart'))return'❤️';
+if(s.includes('ortho')||s.includes('bone'))return'🦴';
+if(s.includes('gastro')||s.includes('digest'))return'🫃';
+if(s.includes('pulmo')||s.includes('lung'))return'🫁';
+if(s.includes('sports'))return'🏃';
+if(s.includes('rheuma'))return'💊';
+if(s.includes('pod')||s.includes('foot'))return'🦶';
+if(s.includes('vascul'))return'🩸';
+if(s.includes('spine')||s.includes('back'))return'🦴';
+return'👨‍⚕️';
+}
@@ -9,6 +9,7 @@
 /* ===== PAGE ROUTING ===== */
 let currentPage = 'home';
 let tipsLoaded = false;
+let currentSlug = null;
 let adminDataLoaded = { illnesses:false, doctors:false, medicines:false, tips:false, messages:false };
 
 function showPage(name) {
@@ -51,6 +52,10 @@ document.addEventListener('DOMContentLoaded', () => {
   initScrollReveal();
   updateTopbarDate();
   checkAdminSession();
+  prefetchCatalog();
+  document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'visible' && localCatalog) syncCatalog();
+  });
 });
 
 function initBodyMap() {
@@ -93,135 +98,246 @@ async function loadIllnessPage(slug) {
   sub.textContent = '';
   badge.textContent = '';
 
+  currentSlug = slug;
   try {
-    const res = await fetch(`/api/body-part/${slug}`);
-    const data = await res.json();
+    const data = await getBodyPart(slug);
 
     if (!data.success) {
       content.innerHTML = `<div class="loading-state"><div class="empty-icon">⚠️</div><p>Could not load data. Please try again.</p></div>`;
       return;
     }
+    renderIllnessPage(slug, data.data);
 
-    const { part, illnesses, doctors } = data.data;
+  } catch (err) {
+    content.innerHTML = `<div class="loading-state"><div class="empty-icon">⚠️</div><p>Error: ${err.message}</p></div>`;
+    console.error(err);
+  }
+}
 
-    // Update hero
-    badge.textContent = '🔬 ' + part.name;
-    title.textContent = part.name + ' — Health Information';
-    sub.textContent = `Explore common conditions, symptoms, care tips, and specialists for ${part.name} health.`;
+function renderIllnessPage(slug, { part, illnesses, doctors }) {
+  const content = document.getElementById('illness-content');
 
-    // Build content
-    let html = `<div class="illness-grid">`;
+  // Update hero
+  document.getElementById('part-badge').textContent = '🔬 ' + part.name;
+  document.getElementById('illness-page-title').textContent = part.name + ' — Health Information';
+  document.getElementById('illness-page-sub').textContent =
+    `Explore common conditions, symptoms, care tips, and specialists for ${part.name} health.`;
 
-    if (!illnesses.length) {
-      html += `<div class="ill-section"><p class="ill-desc">No illness data available for this body part yet. Please check back later.</p></div>`;
-    } else {
-      illnesses.forEach((ill, idx) => {
-        const sevClass = `severity-${ill.severity || 'mild'}`;
-        const sevLabel = (ill.severity || 'mild').charAt(0).toUpperCase() + (ill.severity || 'mild').slice(1);
+  // Build content
+  let html = `<div class="illness-grid">`;
+
+  if (!illnesses.length) {
+    html += `<div class="ill-section"><p class="ill-desc">No illness data available for this body part yet. Please check back later.</p></div>`;
+  } else {
+    illnesses.forEach((ill, idx) => {
+      const sevClass = `severity-${ill.severity || 'mild'}`;
+      const sevLabel = (ill.severity || 'mild').charAt(0).toUpperCase() + (ill.severity || 'mild').slice(1);
+
+      html += `
+      <div class="ill-section">
+        <div class="ill-section-header">
+          <div class="ill-section-icon">${getIllnessIcon(ill.name)}</div>
+          <div>
+            <div class="ill-name">${escHtml(ill.name)}</div>
+            <span class="severity-badge ${sevClass}">${sevLabel} Severity</span>
+          </div>
+        </div>
+        <p class="ill-desc">${escHtml(ill.description)}</p>
+      </div>`;
 
+      if (ill.symptoms_list && ill.symptoms_list.length) {
         html += `
         <div class="ill-section">
           <div class="ill-section-header">
-            <div class="ill-section-icon">${getIllnessIcon(ill.name)}</div>
-            <div>
-              <div class="ill-name">${escHtml(ill.name)}</div>
-              <span class="severity-badge ${sevClass}">${sevLabel} Severity</span>
-            </div>
+            <div class="ill-section-icon">🔍</div>
+            <h3 class="ill-section-title">Symptoms — ${escHtml(ill.name)}</h3>
           </div>
-          <p class="ill-desc">${escHtml(ill.description)}</p>
+          <ul class="symptoms-list">
+            ${ill.symptoms_list.map(s => `<li>${escHtml(s)}</li>`).join('')}
+          </ul>
         </div>`;
+      }
 
-        if (ill.symptoms_list && ill.symptoms_list.length) {
-          html += `
-          <div class="ill-section">
-            <div class="ill-section-header">
-              <div class="ill-section-icon">🔍</div>
-              <h3 class="ill-section-title">Symptoms — ${escHtml(ill.name)}</h3>
-            </div>
-            <ul class="symptoms-list">
-              ${ill.symptoms_list.map(s => `<li>${escHtml(s)}</li>`).join('')}
-            </ul>
-          </div>`;
-        }
-
-        if (ill.care_list && ill.care_list.length) {
-          html += `
-          <div class="ill-section">
-            <div class="ill-section-header">
-              <div class="ill-section-icon">💚</div>
-              <h3 class="ill-section-title">Care Tips — ${escHtml(ill.name)}</h3>
-            </div>
-            <ul class="care-list">
-              ${ill.care_list.map(c => `<li>${escHtml(c)}</li>`).join('')}
-            </ul>
-          </div>`;
-        }
-
-        if (ill.medicines && ill.medicines.length) {
-          html += `
-          <div class="ill-section">
-            <div class="ill-section-header">
-              <div class="ill-section-icon">💊</div>
-              <h3 class="ill-section-title">Medicine Information — ${escHtml(ill.name)}</h3>
-            </div>
-            <div class="med-warning">⚠️ Educational information only. Always consult a doctor before taking any medication.</div>
-            <div class="medicine-cards" style="margin-top:16px">
-              ${ill.medicines.map(m => `
-                <div class="medicine-card">
-                  <div class="med-card-name">${escHtml(m.name)}</div>
-                  <span class="med-otc-badge ${m.is_otc ? 'otc-yes' : 'otc-no'}">${m.is_otc ? '✓ Over-the-Counter' : '⚕ Prescription Required'}</span>
-                  <div class="med-field">${escHtml(m.description)}</div>
-                  ${m.dosage ? `<div class="med-field"><strong>Dosage:</strong> ${escHtml(m.dosage)}</div>` : ''}
-                  ${m.side_effects ? `<div class="med-field"><strong>Side Effects:</strong> ${escHtml(m.side_effects)}</div>` : ''}
-                </div>`).join('')}
-            </div>
-          </div>`;
-        }
-
-        if (idx < illnesses.length - 1) html += `<hr style="border:none;border-top:2px dashed var(--gray-100);margin:8px 0">`;
+      if (ill.care_list && ill.care_list.length) {
+        html += `
+        <div class="ill-section">
+          <div class="ill-section-header">
+            <div class="ill-section-icon">💚</div>
+            <h3 class="ill-section-title">Care Tips — ${escHtml(ill.name)}</h3>
+          </div>
+          <ul class="care-list">
+            ${ill.care_list.map(c => `<li>${escHtml(c)}</li>`).join('')}
+          </ul>
+        </div>`;
+      }
+
+      if (ill.medicines && ill.medicines.length) {
+        html += `
+        <div class="ill-section">
+          <div class="ill-section-header">
+            <div class="ill-section-icon">💊</div>
+            <h3 class="ill-section-title">Medicine Information — ${escHtml(ill.name)}</h3>
+          </div>
+          <div class="med-warning">⚠️ Educational information only. Always consult a doctor before taking any medication.</div>
+          <div class="medicine-cards" style="margin-top:16px">
+            ${ill.medicines.map(m => `
+              <div class="medicine-card">
+                <div class="med-card-name">${escHtml(m.name)}</div>
+                <span class="med-otc-badge ${m.is_otc ? 'otc-yes' : 'otc-no'}">${m.is_otc ? '✓ Over-the-Counter' : '⚕ Prescription Required'}</span>
+                <div class="med-field">${escHtml(m.description)}</div>
+                ${m.dosage ? `<div class="med-field"><strong>Dosage:</strong> ${escHtml(m.dosage)}</div>` : ''}
+                ${m.side_effects ? `<div class="med-field"><strong>Side Effects:</strong> ${escHtml(m.side_effects)}</div>` : ''}
+              </div>`).join('')}
+          </div>
+        </div>`;
+      }
+
+      if (idx < illnesses.length - 1) html += `<hr style="border:none;border-top:2px dashed var(--gray-100);margin:8px 0">`;
+    });
+  }
+
+  // Doctors section
+  if (doctors && doctors.length) {
+    html += `
+    <div class="ill-section">
+      <div class="ill-section-header">
+        <div class="ill-section-icon">👨‍⚕️</div>
+        <h3 class="ill-section-title" id="doctors-title">Recommended Specialists</h3>
+        ${navigator.geolocation ? `<button type="button" class="btn-ghost" style="margin-left:auto" onclick="loadNearbyDoctors('${slug}', this)">📍 Near me</button>` : ''}
+      </div>
+      <div class="doctors-grid" id="doctors-grid">
+        ${doctors.map(doctorCard).join('')}
+      </div>
+    </div>`;
+  }
+
+  html += `</div>`;
+  content.innerHTML = html;
+}
+
+/* ===== LOCAL CATALOG =====
+   The public catalog (/api/catalog) is kept in IndexedDB, or localStorage
+   where that isn't available, as { version, parts: { slug: page }, tips }.
+   Body part pages and health tips render from it without a request. It is
+   fetched when the browser is idle and brought up to date with
+   ?since=<version> deltas when the tab comes back into view, after admin
+   edits, and at most once a minute as pages are opened. */
+const CATALOG_STORE = 'catalog';
+const CATALOG_SYNC_INTERVAL = 60 * 1000;
+let localCatalog = null;
+let catalogDb = null;
+let catalogSync = null;
+let catalogSyncedAt = 0;
+
+function openCatalogDb() {
+  if (!catalogDb) {
+    catalogDb = new Promise((resolve, reject) => {
+      const req = indexedDB.open('ai-doctor', 1);
+      req.onupgradeneeded = () => req.result.createObjectStore(CATALOG_STORE);
+      req.onsuccess = () => resolve(req.result);
+      req.onerror = () => reject(req.error);
+    });
+  }
+  return catalogDb;
+}
+
+async function readStoredCatalog() {
+  try {
+    if (window.indexedDB) {
+      const db = await openCatalogDb();
+      return await new Promise((resolve, reject) => {
+        const req = db.transaction(CATALOG_STORE).objectStore(CATALOG_STORE).get(CATALOG_STORE);
+        req.onsuccess = () => resolve(req.result || null);
+        req.onerror = () => reject(req.error);
       });
     }
+    const saved = localStorage.getItem(CATALOG_STORE);
+    return saved ? JSON.parse(saved) : null;
+  } catch (err) {
+    return null;   // private browsing, blocked storage: fetch as before
+  }
+}
 
-    // Doctors section
-    if (doctors && doctors.length) {
-      html += `
-      <div class="ill-section">
-        <div class="ill-section-header">
-          <div class="ill-section-icon">👨‍⚕️</div>
-          <h3 class="ill-section-title">Recommended Specialists</h3>
-        </div>
-        <div class="doctors-grid">
-          ${doctors.map(d => `
-            <div class="doctor-card">
-              <div class="doc-avatar">${getDoctorEmoji(d.specialization)}</div>
-              <div class="doc-name">${escHtml(d.name)}</div>
-              <div class="doc-spec">${escHtml(d.specialization)}</div>
-              ${d.hospital ? `<div class="doc-hospital">🏥 ${escHtml(d.hospital)}</div>` : ''}
-              <div class="doc-contacts">
-                ${d.phone ? `<div class="doc-contact-item">📞 <a href="tel:${escHtml(d.phone)}" style="color:var(--primary-light)">${escHtml(d.phone)}</a></div>` : ''}
-                ${d.email ? `<div class="doc-contact-item">📧 <a href="mailto:${escHtml(d.email)}" style="color:var(--primary-light)">${escHtml(d.email)}</a></div>` : ''}
-              </div>
-              ${d.experience_years ? `<span class="doc-exp">${d.experience_years} years experience</span>` : ''}
-            </div>`).join('')}
-        </div>
-      </div>`;
+async function storeCatalog(catalog) {
+  try {
+    if (window.indexedDB) {
+      const db = await openCatalogDb();
+      await new Promise((resolve, reject) => {
+        const tx = db.transaction(CATALOG_STORE, 'readwrite');
+        tx.objectStore(CATALOG_STORE).put(catalog, CATALOG_STORE);
+        tx.oncomplete = resolve;
+        tx.onerror = () => reject(tx.error);
+      });
+    } else {
+      localStorage.setItem(CATALOG_STORE, JSON.stringify(catalog));
     }
-
-    html += `</div>`;
-    content.innerHTML = html;
-
   } catch (err) {
-    content.innerHTML = `<div class="loading-state"><div class="empty-icon">⚠️</div><p>Error: ${err.message}</p></div>`;
-    console.error(err);
+    console.warn('Catalog not saved locally:', err);   // quota: keep it in memory only
   }
 }
 
+async function prefetchCatalog() {
+  if (!localCatalog) localCatalog = await readStoredCatalog();
+  // with Data Saver on, only keep an existing copy current
+  if (!localCatalog && navigator.connection && navigator.connection.saveData) return;
+  const idle = window.requestIdleCallback || (cb => setTimeout(cb, 2000));
+  idle(() => syncCatalog());
+}
+
+function syncCatalog() {
+  if (catalogSync) return catalogSync;
+  catalogSync = (async () => {
+    const since = localCatalog ? `?since=${localCatalog.version}` : '';
+    const res = await fetch(`/api/catalog${since}`);
+    const data = await res.json();
+    if (!data.success) throw new Error(data.message);
+    const bundle = data.data;
+    catalogSyncedAt = Date.now();
+    if (!bundle.full && bundle.version === localCatalog.version) return;
+
+    const catalog = bundle.full
+      ? { version: bundle.version, parts: {}, tips: {} }
+      : { ...localCatalog, version: bundle.version, parts: { ...localCatalog.parts } };
+    bundle.parts.forEach(page => { catalog.parts[page.part.slug] = page; });
+    if (bundle.tips) catalog.tips = bundle.tips;
+    localCatalog = catalog;
+    await storeCatalog(catalog);
+
+    // redraw what's on screen if it just changed
+    if (currentPage === 'illness' && bundle.parts.some(page => page.part.slug === currentSlug)) {
+      renderIllnessPage(currentSlug, catalog.parts[currentSlug]);
+    }
+    if (bundle.tips && tipsLoaded) loadHealthTips();
+  })().catch(err => console.warn('Catalog sync failed:', err))
+    .finally(() => { catalogSync = null; });
+  return catalogSync;
+}
+
+function cachedCatalog() {
+  // serve the local copy as is; a sync in the background picks up changes
+  if (localCatalog && Date.now() - catalogSyncedAt > CATALOG_SYNC_INTERVAL) syncCatalog();
+  return localCatalog;
+}
+
+async function getBodyPart(slug) {
+  const catalog = cachedCatalog();
+  if (catalog && catalog.parts[slug]) return { success: true, data: catalog.parts[slug] };
+  const res = await fetch(`/api/body-part/${slug}`);
+  return res.json();
+}
+
+async function getHealthTips() {
+  const catalog = cachedCatalog();
+  if (catalog) return { success: true, data: catalog.tips };
+  const res = await fetch('/api/health-tips');
+  return res.json();
+}
+
 /* ===== HEALTH TIPS ===== */
 async function loadHealthTips() {
   const container = document.getElementById('tips-content');
   try {
-    const res = await fetch('/api/health-tips');
-    const data = await res.json();
+    const data = await getHealthTips();
     if (!data.success) throw new Error(data.message);
 
     const grouped = data.data;
@@ -325,6 +441,7 @@ async function adminLogin(e) {
 
 async function adminLogout() {
   await fetch('/admin/logout', { method:'POST' });
+  stopAdminFeed();
   document.getElementById('admin-nav-link').style.display = 'none';
   showPage('home');
   showToast('Logged out successfully', 'info');
@@ -351,25 +468,27 @@ function toggleAdminPass(btn) {
 function loadAdminDashboard() {
   updateTopbarDate();
   loadAdminStats();
+  startAdminFeed();
 }
 
 async function loadAdminStats() {
   try {
     const res = await fetch('/admin/stats');
     const data = await res.json();
-    if (data.success) {
-      const s = data.data;
-      document.getElementById('stat-illnesses').textContent = s.illnesses;
-      document.getElementById('stat-doctors').textContent = s.doctors;
-      document.getElementById('stat-medicines').textContent = s.medicines;
-      document.getElementById('stat-messages').textContent = s.messages;
-      const badge = document.getElementById('msg-badge');
-      badge.textContent = s.messages;
-      badge.style.display = s.messages > 0 ? '' : 'none';
-    }
+    if (data.success) showAdminStats(data.data);
   } catch(e){}
 }
 
+function showAdminStats(s) {
+  document.getElementById('stat-illnesses').textContent = s.illnesses;
+  document.getElementById('stat-doctors').textContent = s.doctors;
+  document.getElementById('stat-medicines').textContent = s.medicines;
+  document.getElementById('stat-messages').textContent = s.messages;
+  const badge = document.getElementById('msg-badge');
+  badge.textContent = s.messages;
+  badge.style.display = s.messages > 0 ? '' : 'none';
+}
+
 function adminTab(name) {
   document.querySelectorAll('.admin-tab').forEach(t => t.classList.remove('active'));
   document.querySelectorAll('.sidebar-link').forEach(l => l.classList.remove('active'));
@@ -387,40 +506,67 @@ function adminTab(name) {
   if (name === 'illnesses' && !adminDataLoaded.illnesses) loadAdminIllnesses();
   if (name === 'doctors' && !adminDataLoaded.doctors) loadAdminDoctors();
   if (name === 'medicines' && !adminDataLoaded.medicines) loadAdminMedicines();
-  if (name === 'tips') loadAdminTips();
-  if (name === 'messages') loadAdminMessages();
+  if (name === 'tips' && !adminDataLoaded.tips) loadAdminTips();
+  if (name === 'messages' && !adminDataLoaded.messages) loadAdminMessages();
 }
 
-/* ===== ADMIN ILLNESSES ===== */
-async function loadAdminIllnesses() {
-  const el = document.getElementById('illnesses-table');
+/* ===== ADMIN TABLE PAGING ===== */
+const ADMIN_PAGE_SIZE = 100;
+
+// Fetches an admin list page by page (keyset cursors) and appends each page's
+// rows as it arrives, so big tables start rendering right away. Returns false
+// if a newer load of the same table superseded this one.
+async function loadAdminTable(el, url, opts) {
+  const token = String(Date.now() + Math.random());
+  el.dataset.loadToken = token;
   el.innerHTML = `<div class="loading-state"><div class="loader"></div><p>Loading...</p></div>`;
-  try {
-    const res = await fetch('/admin/illnesses');
+
+  let tbody = null;
+  let after = null;
+  do {
+    const sep = url.includes('?') ? '&' : '?';
+    const res = await fetch(`${url}${sep}limit=${ADMIN_PAGE_SIZE}${after ? '&after=' + encodeURIComponent(after) : ''}`);
     const data = await res.json();
+    if (el.dataset.loadToken !== token) return false;
     if (!data.success) throw new Error(data.message);
-    const items = data.data;
-    if (!items.length) {
-      el.innerHTML = `<div class="empty-state"><div class="empty-icon">🦠</div><p>No illnesses added yet.</p></div>`;
-      return;
-    }
-    el.innerHTML = `
+
+    if (!tbody) {
+      if (!data.data.length) {
+        el.innerHTML = opts.empty;
+        return true;
+      }
+      el.innerHTML = `
       <table class="admin-table">
-        <thead><tr>
-          <th>ID</th><th>Body Part</th><th>Name</th><th>Severity</th><th>Status</th><th>Actions</th>
-        </tr></thead>
-        <tbody>
-          ${items.map(i => `<tr>
-            <td>#${i.id}</td>
-            <td><span style="background:var(--gray-100);padding:2px 8px;border-radius:4px;font-size:12px">${escHtml(i.body_part_name)}</span></td>
-            <td><strong>${escHtml(i.name)}</strong></td>
-            <td><span class="severity-badge severity-${i.severity}">${i.severity}</span></td>
-            <td><span style="color:${i.is_active?'var(--success)':'var(--danger)'}">●</span> ${i.is_active?'Active':'Inactive'}</td>
-            <td><button class="btn-danger" onclick="deleteIllness(${i.id})">Delete</button></td>
-          </tr>`).join('')}
-        </tbody>
+        <thead><tr>${opts.head}</tr></thead>
+        <tbody></tbody>
       </table>`;
-    adminDataLoaded.illnesses = true;
+      tbody = el.querySelector('tbody');
+    }
+    tbody.insertAdjacentHTML('beforeend', data.data.map(opts.row).join(''));
+    after = data.next;
+  } while (after);
+  return true;
+}
+
+/* ===== ADMIN ILLNESSES ===== */
+const illnessRow = i => `<tr data-id="${i.id}">
+  <td>#${i.id}</td>
+  <td><span style="background:var(--gray-100);padding:2px 8px;border-radius:4px;font-size:12px">${escHtml(i.body_part_name)}</span></td>
+  <td><strong>${escHtml(i.name)}</strong></td>
+  <td><span class="severity-badge severity-${i.severity}">${i.severity}</span></td>
+  <td><span style="color:${i.is_active?'var(--success)':'var(--danger)'}">●</span> ${i.is_active?'Active':'Inactive'}</td>
+  <td><button class="btn-danger" onclick="deleteIllness(${i.id})">Delete</button></td>
+</tr>`;
+
+async function loadAdminIllnesses() {
+  const el = document.getElementById('illnesses-table');
+  try {
+    const done = await loadAdminTable(el, '/admin/illnesses', {
+      head: `<th>ID</th><th>Body Part</th><th>Name</th><th>Severity</th><th>Status</th><th>Actions</th>`,
+      empty: `<div class="empty-state"><div class="empty-icon">🦠</div><p>No illnesses added yet.</p></div>`,
+      row: illnessRow
+    });
+    if (done) adminDataLoaded.illnesses = true;
   } catch(e) {
     el.innerHTML = `<div class="empty-state"><p>Error: ${e.message}</p></div>`;
   }
@@ -442,9 +588,7 @@ async function saveIllness(e) {
     if (data.success) {
       closeModal('illness-modal');
       document.getElementById('illness-form').reset();
-      adminDataLoaded.illnesses = false;
-      loadAdminIllnesses();
-      loadAdminStats();
+      pollAdminChanges();
       showToast('Illness added successfully!', 'success');
     } else showToast(data.message, 'error');
   } catch(e) { showToast('Error: ' + e.message, 'error'); }
@@ -454,44 +598,31 @@ async function deleteIllness(id) {
   if (!confirm('Delete this illness? Related medicines will also be deleted.')) return;
   try {
     await fetch(`/admin/illness/${id}`, { method:'DELETE' });
-    adminDataLoaded.illnesses = false;
-    loadAdminIllnesses();
-    loadAdminStats();
+    pollAdminChanges();
     showToast('Illness deleted', 'success');
   } catch(e) { showToast('Error deleting', 'error'); }
 }
 
 /* ===== ADMIN DOCTORS ===== */
+const doctorRow = d => `<tr data-id="${d.id}">
+  <td><strong>${escHtml(d.name)}</strong></td>
+  <td>${escHtml(d.specialization)}</td>
+  <td><span style="background:var(--gray-100);padding:2px 8px;border-radius:4px;font-size:12px">${escHtml(d.body_part_name||'General')}</span></td>
+  <td>${escHtml(d.hospital||'—')}</td>
+  <td>${escHtml(d.phone||'—')}</td>
+  <td>${d.experience_years}y</td>
+  <td><button class="btn-danger" onclick="deleteDoctor(${d.id})">Delete</button></td>
+</tr>`;
+
 async function loadAdminDoctors() {
   const el = document.getElementById('doctors-table');
-  el.innerHTML = `<div class="loading-state"><div class="loader"></div><p>Loading...</p></div>`;
   try {
-    const res = await fetch('/admin/doctors');
-    const data = await res.json();
-    if (!data.success) throw new Error(data.message);
-    const items = data.data;
-    if (!items.length) {
-      el.innerHTML = `<div class="empty-state"><div class="empty-icon">👨‍⚕️</div><p>No doctors added yet.</p></div>`;
-      return;
-    }
-    el.innerHTML = `
-      <table class="admin-table">
-        <thead><tr>
-          <th>Name</th><th>Specialization</th><th>Body Part</th><th>Hospital</th><th>Phone</th><th>Exp.</th><th>Actions</th>
-        </tr></thead>
-        <tbody>
-          ${items.map(d => `<tr>
-            <td><strong>${escHtml(d.name)}</strong></td>
-            <td>${escHtml(d.specialization)}</td>
-            <td><span style="background:var(--gray-100);padding:2px 8px;border-radius:4px;font-size:12px">${escHtml(d.body_part_name||'General')}</span></td>
-            <td>${escHtml(d.hospital||'—')}</td>
-            <td>${escHtml(d.phone||'—')}</td>
-            <td>${d.experience_years}y</td>
-            <td><button class="btn-danger" onclick="deleteDoctor(${d.id})">Delete</button></td>
-          </tr>`).join('')}
-        </tbody>
-      </table>`;
-    adminDataLoaded.doctors = true;
+    const done = await loadAdminTable(el, '/admin/doctors', {
+      head: `<th>Name</th><th>Specialization</th><th>Body Part</th><th>Hospital</th><th>Phone</th><th>Exp.</th><th>Actions</th>`,
+      empty: `<div class="empty-state"><div class="empty-icon">👨‍⚕️</div><p>No doctors added yet.</p></div>`,
+      row: doctorRow
+    });
+    if (done) adminDataLoaded.doctors = true;
   } catch(e) {
     el.innerHTML = `<div class="empty-state"><p>Error: ${e.message}</p></div>`;
   }
@@ -515,9 +646,7 @@ async function saveDoctor(e) {
     if (data.success) {
       closeModal('doctor-modal');
       document.getElementById('doctor-form').reset();
-      adminDataLoaded.doctors = false;
-      loadAdminDoctors();
-      loadAdminStats();
+      pollAdminChanges();
       showToast('Doctor added successfully!', 'success');
     } else showToast(data.message, 'error');
   } catch(e) { showToast('Error: ' + e.message, 'error'); }
@@ -527,44 +656,31 @@ async function deleteDoctor(id) {
   if (!confirm('Delete this doctor?')) return;
   try {
     await fetch(`/admin/doctor/${id}`, { method:'DELETE' });
-    adminDataLoaded.doctors = false;
-    loadAdminDoctors();
-    loadAdminStats();
+    pollAdminChanges();
     showToast('Doctor deleted', 'success');
   } catch(e) {}
 }
 
 /* ===== ADMIN MEDICINES ===== */
+const medicineRow = m => `<tr data-id="${m.id}">
+  <td><strong>${escHtml(m.name)}</strong></td>
+  <td>${escHtml(m.illness_name)}</td>
+  <td style="font-size:12px;color:var(--text-muted)">${escHtml(m.dosage||'—')}</td>
+  <td><span style="background:${m.is_otc?'#e7f7ef':'#fff3e0'};color:${m.is_otc?'#2d9970':'#e65100'};padding:2px 8px;border-radius:4px;font-size:12px">${m.is_otc?'OTC':'Rx'}</span></td>
+  <td>
+    <button class="btn-danger" onclick="deleteMedicine(${m.id})">Delete</button>
+  </td>
+</tr>`;
+
 async function loadAdminMedicines() {
   const el = document.getElementById('medicines-table');
-  el.innerHTML = `<div class="loading-state"><div class="loader"></div><p>Loading...</p></div>`;
   try {
-    const res = await fetch('/admin/medicines');
-    const data = await res.json();
-    if (!data.success) throw new Error(data.message);
-    const items = data.data;
-    if (!items.length) {
-      el.innerHTML = `<div class="empty-state"><div class="empty-icon">💊</div><p>No medicines added yet.</p></div>`;
-      return;
-    }
-    el.innerHTML = `
-      <table class="admin-table">
-        <thead><tr>
-          <th>Medicine</th><th>Related Illness</th><th>Dosage</th><th>Type</th><th>Actions</th>
-        </tr></thead>
-        <tbody>
-          ${items.map(m => `<tr>
-            <td><strong>${escHtml(m.name)}</strong></td>
-            <td>${escHtml(m.illness_name)}</td>
-            <td style="font-size:12px;color:var(--text-muted)">${escHtml(m.dosage||'—')}</td>
-            <td><span style="background:${m.is_otc?'#e7f7ef':'#fff3e0'};color:${m.is_otc?'#2d9970':'#e65100'};padding:2px 8px;border-radius:4px;font-size:12px">${m.is_otc?'OTC':'Rx'}</span></td>
-            <td>
-              <button class="btn-danger" onclick="deleteMedicine(${m.id})">Delete</button>
-            </td>
-          </tr>`).join('')}
-        </tbody>
-      </table>`;
-    adminDataLoaded.medicines = true;
+    const done = await loadAdminTable(el, '/admin/medicines', {
+      head: `<th>Medicine</th><th>Related Illness</th><th>Dosage</th><th>Type</th><th>Actions</th>`,
+      empty: `<div class="empty-state"><div class="empty-icon">💊</div><p>No medicines added yet.</p></div>`,
+      row: medicineRow
+    });
+    if (done) adminDataLoaded.medicines = true;
   } catch(e) {
     el.innerHTML = `<div class="empty-state"><p>Error: ${e.message}</p></div>`;
   }
@@ -586,9 +702,7 @@ async function saveMedicine(e) {
     if (data.success) {
       closeModal('medicine-modal');
       document.getElementById('medicine-form').reset();
-      adminDataLoaded.medicines = false;
-      loadAdminMedicines();
-      loadAdminStats();
+      pollAdminChanges();
       showToast('Medicine added successfully!', 'success');
     } else showToast(data.message, 'error');
   } catch(e) { showToast('Error: ' + e.message, 'error'); }
@@ -598,39 +712,29 @@ async function deleteMedicine(id) {
   if (!confirm('Delete this medicine?')) return;
   try {
     await fetch(`/admin/medicine/${id}`, { method:'DELETE' });
-    adminDataLoaded.medicines = false;
-    loadAdminMedicines();
-    loadAdminStats();
+    pollAdminChanges();
     showToast('Medicine deleted', 'success');
   } catch(e) {}
 }
 
 /* ===== ADMIN HEALTH TIPS ===== */
+const tipRow = t => `<tr data-id="${t.id}">
+  <td style="font-size:20px">${t.icon||'💡'}</td>
+  <td><strong>${escHtml(t.title)}</strong></td>
+  <td><span style="background:var(--gray-100);padding:2px 8px;border-radius:4px;font-size:12px">${t.category.replace('_',' ')}</span></td>
+  <td><span style="color:${t.is_active?'var(--success)':'var(--danger)'}">●</span></td>
+  <td><button class="btn-danger" onclick="deleteTip(${t.id})">Delete</button></td>
+</tr>`;
+
 async function loadAdminTips() {
   const el = document.getElementById('tips-table');
-  el.innerHTML = `<div class="loading-state"><div class="loader"></div><p>Loading...</p></div>`;
   try {
-    const res = await fetch('/admin/tips');
-    const data = await res.json();
-    if (!data.success) throw new Error(data.message);
-    const items = data.data;
-    if (!items.length) {
-      el.innerHTML = `<div class="empty-state"><div class="empty-icon">💡</div><p>No tips added yet.</p></div>`;
-      return;
-    }
-    el.innerHTML = `
-      <table class="admin-table">
-        <thead><tr><th>Icon</th><th>Title</th><th>Category</th><th>Active</th><th>Actions</th></tr></thead>
-        <tbody>
-          ${items.map(t => `<tr>
-            <td style="font-size:20px">${t.icon||'💡'}</td>
-            <td><strong>${escHtml(t.title)}</strong></td>
-            <td><span style="background:var(--gray-100);padding:2px 8px;border-radius:4px;font-size:12px">${t.category.replace('_',' ')}</span></td>
-            <td><span style="color:${t.is_active?'var(--success)':'var(--danger)'}">●</span></td>
-            <td><button class="btn-danger" onclick="deleteTip(${t.id})">Delete</button></td>
-          </tr>`).join('')}
-        </tbody>
-      </table>`;
+    const done = await loadAdminTable(el, '/admin/tips', {
+      head: `<th>Icon</th><th>Title</th><th>Category</th><th>Active</th><th>Actions</th>`,
+      empty: `<div class="empty-state"><div class="empty-icon">💡</div><p>No tips added yet.</p></div>`,
+      row: tipRow
+    });
+    if (done) adminDataLoaded.tips = true;
   } catch(e) {
     el.innerHTML = `<div class="empty-state"><p>Error: ${e.message}</p></div>`;
   }
@@ -650,8 +754,7 @@ async function saveTip(e) {
     if (data.success) {
       closeModal('tip-modal');
       document.getElementById('tip-form').reset();
-      loadAdminTips();
-      tipsLoaded = false;
+      pollAdminChanges();
       showToast('Health tip added!', 'success');
     } else showToast(data.message, 'error');
   } catch(e) { showToast('Error: ' + e.message, 'error'); }
@@ -661,41 +764,32 @@ async function deleteTip(id) {
   if (!confirm('Delete this tip?')) return;
   try {
     await fetch(`/admin/tip/${id}`, { method:'DELETE' });
-    loadAdminTips();
-    tipsLoaded = false;
+    pollAdminChanges();
     showToast('Tip deleted', 'success');
   } catch(e) {}
 }
 
 /* ===== ADMIN MESSAGES ===== */
+const messageRow = m => `<tr data-id="${m.id}">
+  <td><strong>${escHtml(m.name)}</strong></td>
+  <td><a href="mailto:${escHtml(m.email)}" style="color:var(--primary-light)">${escHtml(m.email)}</a></td>
+  <td style="max-width:300px;overflow:hidden;text-overflow:ellipsis;white-space:nowrap">${escHtml(m.message)}</td>
+  <td style="font-size:12px;color:var(--text-muted)">${new Date(m.created_at).toLocaleDateString()}</td>
+  <td>
+    ${m.is_read ? '<span style="color:var(--success);font-size:12px">✓ Read</span>' :
+    `<button onclick="markRead(${m.id})" style="background:var(--primary);color:white;border:none;padding:4px 10px;border-radius:4px;font-size:11px;cursor:pointer">Mark Read</button>`}
+  </td>
+</tr>`;
+
 async function loadAdminMessages() {
   const el = document.getElementById('messages-table');
-  el.innerHTML = `<div class="loading-state"><div class="loader"></div><p>Loading...</p></div>`;
   try {
-    const res = await fetch('/admin/messages');
-    const data = await res.json();
-    if (!data.success) throw new Error(data.message);
-    const items = data.data;
-    if (!items.length) {
-      el.innerHTML = `<div class="empty-state"><div class="empty-icon">💬</div><p>No messages yet.</p></div>`;
-      return;
-    }
-    el.innerHTML = `
-      <table class="admin-table">
-        <thead><tr><th>Name</th><th>Email</th><th>Message</th><th>Date</th><th>Status</th></tr></thead>
-        <tbody>
-          ${items.map(m => `<tr>
-            <td><strong>${escHtml(m.name)}</strong></td>
-            <td><a href="mailto:${escHtml(m.email)}" style="color:var(--primary-light)">${escHtml(m.email)}</a></td>
-            <td style="max-width:300px;overflow:hidden;text-overflow:ellipsis;white-space:nowrap">${escHtml(m.message)}</td>
-            <td style="font-size:12px;color:var(--text-muted)">${new Date(m.created_at).toLocaleDateString()}</td>
-            <td>
-              ${m.is_read ? '<span style="color:var(--success);font-size:12px">✓ Read</span>' :
-              `<button onclick="markRead(${m.id})" style="background:var(--primary);color:white;border:none;padding:4px 10px;border-radius:4px;font-size:11px;cursor:pointer">Mark Read</button>`}
-            </td>
-          </tr>`).join('')}
-        </tbody>
-      </table>`;
+    const done = await loadAdminTable(el, '/admin/messages', {
+      head: `<th>Name</th><th>Email</th><th>Message</th><th>Date</th><th>Status</th>`,
+      empty: `<div class="empty-state"><div class="empty-icon">💬</div><p>No messages yet.</p></div>`,
+      row: messageRow
+    });
+    if (done) adminDataLoaded.messages = true;
   } catch(e) {
     el.innerHTML = `<div class="empty-state"><p>Error: ${e.message}</p></div>`;
   }
@@ -704,12 +798,119 @@ async function loadAdminMessages() {
 async function markRead(id) {
   try {
     await fetch(`/admin/message/${id}/read`, { method:'POST' });
-    loadAdminMessages();
-    loadAdminStats();
+    pollAdminChanges();
     showToast('Message marked as read', 'success');
   } catch(e) {}
 }
 
+/* ===== ADMIN CHANGE FEED =====
+   Admin writes (from any admin, or new contact messages) arrive as
+   row-level changes from /admin/changes, pushed over Server-Sent Events,
+   and are patched into the tables already on screen. After its own writes
+   the panel asks for the changes right away rather than waiting for the
+   stream. */
+const FEED_TABLES = {
+  illness:  { el:'illnesses-table', flag:'illnesses', row:illnessRow,  load:() => loadAdminIllnesses() },
+  doctor:   { el:'doctors-table',   flag:'doctors',   row:doctorRow,   load:() => loadAdminDoctors() },
+  medicine: { el:'medicines-table', flag:'medicines', row:medicineRow, load:() => loadAdminMedicines() },
+  tip:      { el:'tips-table',      flag:'tips',      row:tipRow,      load:() => loadAdminTips() },
+  message:  { el:'messages-table',  flag:'messages',  row:messageRow,  load:() => loadAdminMessages() }
+};
+const CATALOG_TABLES = ['illness', 'doctor', 'medicine', 'tip'];
+const ADMIN_POLL_MS = 5000;
+let adminSeq = null;
+let adminStream = null;
+let adminPollTimer = null;
+
+async function startAdminFeed() {
+  if (adminStream) return;
+  try {
+    if (adminSeq === null) {
+      const res = await fetch('/admin/changes');
+      const data = await res.json();
+      if (!data.success) return;
+      adminSeq = data.data.seq;
+    }
+    if (adminStream || adminPollTimer) return;
+    if (!window.EventSource) return pollAdminFeed();
+    // reconnects on its own, resuming from the last event id it saw
+    adminStream = new EventSource(`/admin/changes/stream?since=${adminSeq}`);
+    adminStream.addEventListener('changes', e => applyAdminChanges(JSON.parse(e.data)));
+    adminStream.addEventListener('error', () => {
+      // closed for good: the server doesn't stream (204) or refused
+      if (adminStream && adminStream.readyState === EventSource.CLOSED) {
+        adminStream = null;
+        pollAdminFeed();
+      }
+    });
+  } catch (e) {}
+}
+
+function pollAdminFeed() {
+  if (!adminPollTimer) adminPollTimer = setInterval(pollAdminChanges, ADMIN_POLL_MS);
+}
+
+function stopAdminFeed() {
+  if (adminStream) adminStream.close();
+  if (adminPollTimer) clearInterval(adminPollTimer);
+  adminStream = null;
+  adminPollTimer = null;
+  adminSeq = null;
+}
+
+async function pollAdminChanges() {
+  if (adminSeq === null) return startAdminFeed();
+  try {
+    const res = await fetch(`/admin/changes?since=${adminSeq}`);
+    const data = await res.json();
+    if (!data.success) return;
+    applyAdminChanges(data.data);
+    if (data.data.more) pollAdminChanges();
+  } catch (e) {}
+}
+
+function reloadAdminTable(entity) {
+  const table = FEED_TABLES[entity];
+  // a table that hasn't been opened yet loads fresh when it is
+  if (adminDataLoaded[table.flag]) table.load();
+}
+
+function applyAdminChanges(payload) {
+  // the stream and a poll can deliver the same changes; applying them twice is harmless
+  if (payload.seq <= adminSeq && !payload.reset) return;
+  adminSeq = payload.seq;
+  let catalogChanged = payload.reset;
+  if (payload.reset) Object.keys(FEED_TABLES).forEach(reloadAdminTable);
+
+  payload.changes.forEach(change => {
+    if (change.entity === 'catalog' || CATALOG_TABLES.includes(change.entity)) catalogChanged = true;
+    if (change.op === 'reload') {
+      (change.entity === 'catalog' ? CATALOG_TABLES : [change.entity]).forEach(reloadAdminTable);
+      return;
+    }
+    const table = FEED_TABLES[change.entity];
+    if (!table || !adminDataLoaded[table.flag]) return;
+    const tbody = document.getElementById(table.el).querySelector('tbody');
+    const current = tbody && tbody.querySelector(`tr[data-id="${change.id}"]`);
+    if (change.op === 'delete') {
+      if (current) current.remove();
+      return;
+    }
+    if (!tbody) return table.load();   // was showing the empty state
+    // place the row after the one before it in list order, so new and
+    // renamed rows land where a reload would put them
+    const prev = change.prev === null ? null : tbody.querySelector(`tr[data-id="${change.prev}"]`);
+    if (change.prev !== null && !prev) return reloadAdminTable(change.entity);
+    if (current) current.remove();
+    if (prev) prev.insertAdjacentHTML('afterend', table.row(change.row));
+    else tbody.insertAdjacentHTML('afterbegin', table.row(change.row));
+  });
+
+  if (payload.stats) showAdminStats(payload.stats);
+  else if (payload.reset) loadAdminStats();
+  if (catalogChanged) syncCatalog();
+}
+
 /* ===== MODAL HELPERS ===== */
 async function openModal(id) {
   const modal = document.getElementById(id);
@@ -772,6 +973,49 @@ function showToast(message, type = 'info') {
   setTimeout(() => toast.classList.remove('show'), 3500);
 }
 
+function doctorCard(d) {
+  return `
+    <div class="doctor-card">
+      <div class="doc-avatar">${getDoctorEmoji(d.specialization)}</div>
+      <div class="doc-name">${escHtml(d.name)}</div>
+      <div class="doc-spec">${escHtml(d.specialization)}</div>
+      ${d.hospital ? `<div class="doc-hospital">🏥 ${escHtml(d.hospital)}</div>` : ''}
+      ${d.distance_km != null ? `<div class="doc-hospital">📍 ${d.distance_km < 10 ? d.distance_km.toFixed(1) : Math.round(d.distance_km)} km away</div>` : ''}
+      <div class="doc-contacts">
+        ${d.phone ? `<div class="doc-contact-item">📞 <a href="tel:${escHtml(d.phone)}" style="color:var(--primary-light)">${escHtml(d.phone)}</a></div>` : ''}
+        ${d.email ? `<div class="doc-contact-item">📧 <a href="mailto:${escHtml(d.email)}" style="color:var(--primary-light)">${escHtml(d.email)}</a></div>` : ''}
+      </div>
+      ${d.experience_years ? `<span class="doc-exp">${d.experience_years} years experience</span>` : ''}
+    </div>`;
+}
+
+// Swap the most experienced specialists for the nearest ones
+function loadNearbyDoctors(slug, btn) {
+  btn.disabled = true;
+  navigator.geolocation.getCurrentPosition(async pos => {
+    try {
+      const { latitude, longitude } = pos.coords;
+      const res = await fetch(`/api/doctors/nearby?lat=${latitude}&lon=${longitude}&body_part=${encodeURIComponent(slug)}&k=6`);
+      const data = await res.json();
+      if (!data.success) throw new Error(data.message);
+      if (!data.data.length) {
+        showToast(`No specialists found within ${data.radius_km} km`, 'info');
+        btn.disabled = false;
+        return;
+      }
+      document.getElementById('doctors-title').textContent = 'Specialists Near You';
+      document.getElementById('doctors-grid').innerHTML = data.data.map(doctorCard).join('');
+      btn.remove();
+    } catch (err) {
+      showToast('Could not load nearby doctors', 'error');
+      btn.disabled = false;
+    }
+  }, () => {
+    showToast('Location access was denied', 'error');
+    btn.disabled = false;
+  });
+}
+
 function escHtml(str) {
   if (!str) return '';
   return String(str)
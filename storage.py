@@ -0,0 +1,166 @@
+# Where uploaded files live.
+#
+# ImageStore (images.py) addresses everything by '/'-separated keys such as
+# 3f/3f2a.../w480.webp and reads and writes them through one of these
+# backends:
+#
+#   LocalStorage  a directory on this host (default: uploads/media)
+#   S3Storage     an S3-compatible bucket, for hosts without a writable,
+#                 shared disk such as serverless functions
+#
+# open_storage() picks one from UPLOAD_STORAGE: a path or file:// URL for
+# LocalStorage, s3://bucket/prefix for S3Storage. Nothing touches the disk
+# or the network until the first read or write, and boto3 is only imported
+# then, so an unused backend costs nothing at startup.
+
+import mimetypes
+import os
+import shutil
+import threading
+
+
+def _not_found(error):
+    # botocore's ClientError without importing botocore
+    code = str(getattr(error, 'response', {}).get('Error', {}).get('Code', ''))
+    return code in ('404', 'NoSuchKey', 'NotFound')
+
+
+class LocalStorage:
+    def __init__(self, root):
+        self.root = root
+
+    def local_path(self, key):
+        """Filesystem path of `key`, for send_file; None on remote backends."""
+        return os.path.join(self.root, *key.split('/'))
+
+    def read(self, key):
+        try:
+            with open(self.local_path(key), 'rb') as f:
+                return f.read()
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            return None
+
+    def write(self, key, data):
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def exists(self, key):
+        return os.path.isfile(self.local_path(key))
+
+    def list(self, prefix=''):
+        """Names directly under `prefix` that hold further keys."""
+        path = self.local_path(prefix) if prefix else self.root
+        try:
+            return [name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name))]
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+
+    def touch(self, prefix):
+        os.utime(self.local_path(prefix))
+
+    def modified(self, prefix):
+        """Unix time `prefix` was last written to or touched, or None."""
+        try:
+            return os.path.getmtime(self.local_path(prefix))
+        except OSError:
+            return None
+
+    def delete(self, prefix):
+        shutil.rmtree(self.local_path(prefix), ignore_errors=True)
+
+
+class S3Storage:
+    """Keys as objects under `prefix` in `bucket`.
+
+    Credentials and region come from the usual AWS_* environment variables;
+    `endpoint_url` points it at another S3-compatible service (R2, MinIO).
+    A prefix's modified time is its newest object's, and touch() rewrites a
+    marker object to move it.
+    """
+
+    TOUCH_KEY = '.touched'
+
+    def __init__(self, bucket, prefix='', endpoint_url=None):
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.endpoint_url = endpoint_url
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    self._client = boto3.client('s3', endpoint_url=self.endpoint_url)
+        return self._client
+
+    def _key(self, key):
+        return '/'.join(part for part in (self.prefix, key) if part)
+
+    def _objects(self, prefix):
+        pages = self.client.get_paginator('list_objects_v2').paginate(
+            Bucket=self.bucket, Prefix=self._key(prefix) + '/')
+        for page in pages:
+            yield from page.get('Contents', ())
+
+    def local_path(self, key):
+        return None
+
+    def read(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body'].read()
+        except Exception as e:
+            if _not_found(e):
+                return None
+            raise
+
+    def write(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data,
+                               ContentType=mimetypes.guess_type(key)[0] or 'application/octet-stream')
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except Exception as e:
+            if _not_found(e):
+                return False
+            raise
+
+    def list(self, prefix=''):
+        base = self._key(prefix)
+        base = base + '/' if base else ''
+        names = []
+        pages = self.client.get_paginator('list_objects_v2').paginate(
+            Bucket=self.bucket, Prefix=base, Delimiter='/')
+        for page in pages:
+            names.extend(p['Prefix'][len(base):].rstrip('/') for p in page.get('CommonPrefixes', ()))
+        return names
+
+    def touch(self, prefix):
+        self.write(prefix + '/' + self.TOUCH_KEY, b'')
+
+    def modified(self, prefix):
+        times = [obj['LastModified'].timestamp() for obj in self._objects(prefix)]
+        return max(times) if times else None
+
+    def delete(self, prefix):
+        keys = [{'Key': obj['Key']} for obj in self._objects(prefix)]
+        for i in range(0, len(keys), 1000):
+            self.client.delete_objects(Bucket=self.bucket, Delete={'Objects': keys[i:i + 1000], 'Quiet': True})
+
+
+def open_storage(location, endpoint_url=None):
+    """LocalStorage for a path or file:// URL, S3Storage for s3://bucket/prefix."""
+    if location.startswith('s3://'):
+        bucket, _, prefix = location[len('s3://'):].partition('/')
+        return S3Storage(bucket, prefix, endpoint_url=endpoint_url)
+    if location.startswith('file://'):
+        location = location[len('file://'):]
+    return LocalStorage(location)
@@ -0,0 +1,194 @@
+# Multi-symptom scoring ("which conditions match these symptoms").
+#
+# Illness symptoms are normalized into a shared vocabulary and held as a
+# sparse illness x symptom matrix in CSC form (one slice of row indices and
+# IDF weights per symptom column). Scoring a query sums the selected columns
+# with np.bincount, one call per queried symptom, so no Python code ever runs
+# per illness except for the handful of results returned.
+#
+# Admin edits patch the per-illness symptom lists without touching MySQL.
+# The arrays are rebuilt lazily on the next query, because IDF weights shift
+# with every change anyway.
+
+import math
+import re
+import threading
+
+import numpy as np
+
+SEVERITY_WEIGHTS = {'mild': 1.0, 'moderate': 1.15, 'severe': 1.3}
+STOPWORDS = {'a', 'an', 'and', 'at', 'in', 'of', 'on', 'or', 'the', 'to', 'when', 'with'}
+MAX_RESULTS = 10
+
+ILLNESS_SQL = """
+    SELECT i.id, i.name, i.symptoms, i.severity, bp.id AS body_part_id, bp.slug AS body_part
+    FROM illnesses i JOIN body_parts bp ON bp.id = i.body_part_id
+    WHERE i.is_active = 1"""
+
+_paren_re = re.compile(r'\([^)]*\)')
+_token_re = re.compile(r'[a-z0-9]+')
+
+
+def normalize_symptom(text):
+    text = _paren_re.sub(' ', (text or '').lower())
+    return ' '.join(_token_re.findall(text))
+
+
+def tokens(term):
+    return {t for t in term.split() if t not in STOPWORDS}
+
+
+class SymptomEngine:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.vocab = {}          # normalized symptom -> column id
+        self.terms = []          # column id -> normalized symptom
+        self._token_terms = {}   # token -> set of column ids
+        self.illnesses = {}      # illness id -> row dict with 'symptom_ids'
+        self._dirty = True
+
+    # ----- building -----
+
+    def build(self, cursor):
+        cursor.execute(ILLNESS_SQL)
+        rows = cursor.fetchall()
+        with self._lock:
+            self.illnesses = {}
+            for row in rows:
+                self._put(row)
+            self._dirty = True
+
+    def refresh(self, cursor, kind, doc_id):
+        if kind != 'illness':
+            return
+        cursor.execute(ILLNESS_SQL + ' AND i.id = %s', (doc_id,))
+        row = cursor.fetchone()
+        with self._lock:
+            self.illnesses.pop(doc_id, None)
+            if row:
+                self._put(row)
+            self._dirty = True
+
+    def _term_id(self, term):
+        term_id = self.vocab.get(term)
+        if term_id is None:
+            term_id = self.vocab[term] = len(self.terms)
+            self.terms.append(term)
+            for tok in tokens(term):
+                self._token_terms.setdefault(tok, set()).add(term_id)
+        return term_id
+
+    def _put(self, row):
+        ids = set()
+        for raw in (row['symptoms'] or '').split('|'):
+            term = normalize_symptom(raw)
+            if term:
+                ids.add(self._term_id(term))
+        self.illnesses[row['id']] = {
+            'id': row['id'], 'name': row['name'], 'severity': row['severity'] or 'mild',
+            'body_part': row['body_part'], 'body_part_id': row['body_part_id'],
+            'symptom_ids': np.fromiter(sorted(ids), dtype=np.int32, count=len(ids)),
+        }
+
+    def _compile(self):
+        items = list(self.illnesses.values())
+        n_rows, n_cols = len(items), len(self.terms)
+        lengths = np.fromiter((len(it['symptom_ids']) for it in items), dtype=np.int64, count=n_rows)
+        cols = np.concatenate([it['symptom_ids'] for it in items]) if n_rows else np.zeros(0, np.int32)
+        rows = np.repeat(np.arange(n_rows, dtype=np.int32), lengths)
+
+        df = np.bincount(cols, minlength=n_cols)
+        idf = np.log((n_rows + 1.0) / (df + 1.0)) + 1.0
+
+        # CSC layout: indices of column c live in col_rows[col_ptr[c]:col_ptr[c+1]]
+        order = np.argsort(cols, kind='stable')
+        self._col_rows = rows[order]
+        self._col_ptr = np.concatenate(([0], np.cumsum(df)))
+        self._idf = idf
+
+        # Cosine-style normalization by each illness's own IDF mass, scaled
+        # by severity so serious conditions rank above mild look-alikes.
+        sq = np.bincount(rows, weights=idf[cols] ** 2, minlength=n_rows)
+        norms = np.sqrt(np.maximum(sq, 1e-12))
+        severity = np.array([SEVERITY_WEIGHTS.get(it['severity'], 1.0) for it in items])
+        self._row_scale = severity / norms
+        self._row_parts = np.array([it['body_part'] for it in items], dtype=object)
+        self._items = items
+        self._dirty = False
+
+    # ----- querying -----
+
+    def resolve(self, symptom):
+        """Map a user-entered symptom to vocabulary columns.
+
+        Matches the exact (normalized) symptom plus every symptom whose words
+        contain all of the query's words, so "nausea" also finds "nausea and
+        vomiting".
+        """
+        term = normalize_symptom(symptom)
+        want = tokens(term)
+        if not want:
+            return set()
+        sets = sorted((self._token_terms.get(t, set()) for t in want), key=len)
+        found = set.intersection(*sets) if sets[0] else set()
+        if term in self.vocab:
+            found.add(self.vocab[term])
+        return found
+
+    def score(self, symptoms, body_parts=None, limit=MAX_RESULTS):
+        with self._lock:
+            if self._dirty:
+                self._compile()
+            resolved = {}
+            for s in symptoms:
+                resolved[s] = self.resolve(s)
+            query_cols = sorted(set().union(*resolved.values())) if resolved else []
+            unknown = [s for s, cols in resolved.items() if not cols]
+            if not query_cols or not self._items:
+                return {'results': [], 'unknown': unknown}
+
+            # The query is a binary vector with one dimension per user
+            # symptom, so scoring is q . M^T: each symptom adds its IDF weight
+            # to every illness that has it. A symptom that expands to several
+            # vocabulary columns counts at most once per illness.
+            col_ptr, col_rows, idf = self._col_ptr, self._col_rows, self._idf
+            n = len(self._items)
+            scores = np.zeros(n)
+            query_sq = 0.0
+            for cols in resolved.values():
+                if not cols:
+                    continue
+                cols = np.fromiter(cols, dtype=np.int64, count=len(cols))
+                starts, ends = col_ptr[cols], col_ptr[cols + 1]
+                hit_rows = np.concatenate([col_rows[a:b] for a, b in zip(starts, ends)])
+                hit_weights = np.repeat(idf[cols], ends - starts)
+                cap = float(idf[cols].max())
+                scores += np.minimum(np.bincount(hit_rows, weights=hit_weights, minlength=n), cap)
+                query_sq += cap * cap
+            scores *= self._row_scale / math.sqrt(query_sq)
+
+            if body_parts:
+                scores[~np.isin(self._row_parts, list(body_parts))] = 0.0
+
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > limit:
+                top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+                candidates = candidates[top]
+            candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+            query_set = np.array(query_cols, dtype=np.int32)
+            results = []
+            for row in candidates:
+                item = self._items[row]
+                matched = np.intersect1d(item['symptom_ids'], query_set, assume_unique=True)
+                results.append({
+                    'id': item['id'], 'name': item['name'], 'severity': item['severity'],
+                    'body_part': item['body_part'], 'score': round(float(scores[row]), 4),
+                    'matched_symptoms': [self.terms[c] for c in matched],
+                    'total_symptoms': int(len(item['symptom_ids'])),
+                })
+            return {'results': results, 'unknown': unknown}
+
+    def stats(self):
+        with self._lock:
+            return {'illnesses': len(self.illnesses), 'symptoms': len(self.terms)}